@@ -0,0 +1,901 @@
+# === benchmark.py ===
+
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import codegen
+import evaluator
+import io_handler
+import lexer
+import parser
+import tokenizer
+from interpreter import Interpreter
+from symbol_table import SymbolTable, CompactSymbolTable, ConcurrentSymbolTable
+from shared_table import SharedVariables, SharedSymbolTable
+from snapshot import write_snapshot
+
+# Pipeline stages timed by `bench_stages`, in pipeline order
+STAGES = ("commands", "syntax_validation", "varValidation", "tokenize", "compile_expression",
+          "evaluate_int", "evaluate_float", "evaluate_native", "dispatch")
+
+# Stages timed with the compiled tier off, so they measure the interpreter (`evaluator.evaluate_compiled`)
+INTERPRETED_STAGES = ("evaluate_int", "evaluate_float")
+
+# A stage is reported as a regression when it gets slower than this (fraction of the baseline)
+REGRESSION_THRESHOLD = 0.10
+
+# Script fed to a fresh interpreter by `bench_startup`; its output marks the first executed command
+STARTUP_SCRIPT = "x = 6 * 7\nPRINT x\n"
+
+# Directory of the interpreter modules (the working directory of the startup runs)
+SNOL_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def make_expression(index, length):
+    """
+    Build a distinct arithmetic expression over the variables v0..v9.
+
+    Args:
+        index (int): Makes the expression text unique (defeats the caches).
+        length (int): Number of operands in the expression.
+
+    Returns:
+        str: The expression text.
+    """
+    terms = [f"v{(index + i) % 10}" if i % 2 == 0 else str(index + i) for i in range(length)]
+    ops = "+-*+"
+    expr = terms[0]
+    for i, term in enumerate(terms[1:]):
+        expr += f" {ops[i % len(ops)]} ({term} - {i + 1})" if i % 3 == 0 else f" {ops[i % len(ops)]} {term}"
+    return expr
+
+def legacy_front_end(line):
+    """
+    The per-line scanning done before the shared lexer existed.
+
+    Classification, syntax validation, variable validation and postfix
+    conversion each scanned the raw line on their own before the postfix
+    string was built.
+
+    Args:
+        line (str): An arithmetic expression line.
+    """
+    keywords = ["BEG", "PRINT", "EXIT!", "HELP"]
+    is_variable = lambda s: re.fullmatch(r"[a-zA-Z][a-zA-Z0-9]*", s) is not None and s not in keywords
+    is_digit = lambda s: re.fullmatch(r"-?\d+(\.\d+)?", s) is not None
+
+    # commands()
+    if not (line.startswith("BEG") and is_variable(line[3:])):
+        re.fullmatch(r"BEG\s+\S+", line)
+        re.fullmatch(r"PRINT\s+\S+", line)
+        is_variable(line) or is_digit(line)
+        any(op in line for op in "+-*/%")
+
+    # syntax_validation()
+    parenthesis = 0
+    temp = ''
+    for i in range(len(line)):
+        ch = line[i]
+        if ch == '(':
+            parenthesis += 1
+            temp += ch
+        elif ch == ')':
+            parenthesis -= 1
+            temp += ch
+        elif ch in '+-*/%':
+            if ch == '-' and (i == 0 or line[i - 1] in "(-+*/%"):
+                temp += ch
+                continue
+            temp = ''
+        elif ch != ' ':
+            temp += ch
+
+    # varValidation()
+    any(keyword in line for keyword in keywords)
+    for token in re.findall(r'[a-zA-Z][a-zA-Z0-9]*', line):
+        is_variable(token) and tokenizer.symbol_table.variable_exists(token)
+
+    # Postfix conversion: tokenizing and classification
+    tokens = []
+    number = ""
+    i = 0
+    while i < len(line):
+        char = line[i]
+        if char.isspace():
+            if number:
+                tokens.append(number)
+                number = ""
+            i += 1
+            continue
+        if char == '-' and (i == 0 or line[i - 1] in '+-*/('):
+            number += char
+            i += 1
+            continue
+        if char.isdigit() or char == '.':
+            number += char
+            i += 1
+            continue
+        if char.isalpha():
+            while i < len(line) and (line[i].isalnum() or line[i] == '!'):
+                number += line[i]
+                i += 1
+            continue
+        if number:
+            tokens.append(number)
+            number = ""
+        if char in '+-*/()%':
+            tokens.append(char)
+        i += 1
+    if number:
+        tokens.append(number)
+    for token in tokens:
+        token in keywords
+
+    # Postfix conversion: shunting-yard with the values pasted in
+    precedence = {'+': 1, '-': 1, '*': 2, '/': 2, '%': 2}
+    mystack = []
+    postfix = []
+    for token in tokens:
+        if token.lstrip('-').replace('.', '', 1).isdigit():
+            postfix.append(token)
+        elif is_variable(token):
+            postfix.append(str(tokenizer.symbol_table.get_variable(token)))
+        elif token == '(':
+            mystack.append(token)
+        elif token == ')':
+            while mystack and mystack[-1] != '(':
+                postfix.append(mystack.pop())
+            if mystack:
+                mystack.pop()
+        elif token in '+-*/%':
+            while mystack and mystack[-1] != '(' and precedence[token] <= precedence.get(mystack[-1], -1):
+                postfix.append(mystack.pop())
+            mystack.append(token)
+    while mystack:
+        postfix.append(mystack.pop())
+    ' '.join(postfix)
+
+def lexer_front_end(line):
+    """
+    The per-line front end built on the shared token stream.
+
+    Args:
+        line (str): An arithmetic expression line.
+    """
+    type_ = io_handler.commands(line)
+    io_handler.syntax_validation(line, type_)
+    tokenizer.varValidation(line)
+    parser.compile_expression(line, lexer.tokenize(line))
+
+def bench_lexer(lines, length, repeat):
+    """
+    Compare the per-line front-end cost of the legacy scanners and the shared lexer.
+
+    The unique workload defeats the token and compiled-expression caches, so
+    it measures the scanning itself. The repeated workload runs the same
+    lines `repeat` times, as scripts that re-run their expressions do.
+
+    On unique lines the lexer front end is the slower one: besides scanning,
+    it parses the line into a tree and optimizes it, which the legacy path
+    left to every evaluation (it re-parsed the postfix string each time).
+
+    Args:
+        lines (int): Number of distinct expression lines.
+        length (int): Number of operands per expression.
+        repeat (int): How often each line recurs in the repeated workload.
+    """
+    for i in range(10):
+        tokenizer.symbol_table.set_variable(f"v{i}", i + 1)
+    unique = [make_expression(i, length) for i in range(lines)]
+    repeated = [make_expression(i, length) for i in range(lines // repeat)] * repeat
+
+    print(f"{lines} lines, {length} operands per line")
+    for label, workload in (("unique", unique), (f"repeated x{repeat}", repeated)):
+        results = {}
+        for name, front_end in (("legacy", legacy_front_end), ("lexer", lexer_front_end)):
+            lexer.tokenize.cache_clear()
+            parser.clear_cache()
+            start = time.perf_counter()
+            for line in workload:
+                front_end(line)
+            results[name] = (time.perf_counter() - start) / len(workload) * 1e6
+
+        print(f"  {label}")
+        for name, per_line in results.items():
+            print(f"    {name:<8} {per_line:8.2f} us/line")
+        print(f"    speedup  {results['legacy'] / results['lexer']:8.2f}x")
+
+def make_stage_expression(index, length, depth, table_size, prefix, literal):
+    """
+    Build an expression for the stage benchmarks.
+
+    Variables and literals alternate; the last `depth` operations are nested
+    in parentheses, e.g. `v1 + 2 * (v3 - (4 + v5))` for depth 2.
+
+    Args:
+        index (int): Makes the expression text unique (defeats the caches).
+        length (int): Number of operands in the expression.
+        depth (int): Parenthesis nesting depth.
+        table_size (int): Number of variables the expression may read.
+        prefix (str): Variable name prefix ('v' for ints, 'f' for floats).
+        literal (str): Format of the literals, e.g. "{}" or "{}.5".
+
+    Returns:
+        str: The expression text.
+    """
+    terms = [f"{prefix}{(index * 7 + i) % table_size}" if i % 2 == 0 else literal.format(index + i)
+             for i in range(length)]
+    ops = "+-*"
+    expr = terms[-1]
+    for i in range(length - 2, -1, -1):
+        op = ops[i % len(ops)]
+        if length - 1 - i <= depth:
+            expr = f"{terms[i]} {op} ({expr})"
+        else:
+            expr = f"{terms[i]} {op} {expr}"
+    return expr
+
+def stage_workloads(lines, length, depth, table_size):
+    """
+    Prepare the inputs of every pipeline stage for one benchmark case.
+
+    The stages are the steps an expression goes through in
+    `Interpreter.execute`: classification, validation, lexing, parsing
+    (`parser.compile_expression`) and evaluation (`tokenizer.evaluate_expression`,
+    in the interpreter tier for int and float expressions and in the compiled
+    tier for hot ones), then the whole command.
+
+    Args:
+        lines (int): Number of distinct expressions per stage.
+        length (int): Number of operands per expression.
+        depth (int): Parenthesis nesting depth.
+        table_size (int): Number of int and of float variables in the symbol table.
+
+    Returns:
+        tuple: The session to run against and a dict of stage -> (function, inputs).
+    """
+    table = SymbolTable()
+    for i in range(table_size):
+        table.set_variable(f"v{i}", i + 1)
+        table.set_variable(f"f{i}", i + 1.5)
+    session = Interpreter(symbol_table=table)
+
+    int_lines = [make_stage_expression(i, length, depth, table_size, "v", "{}") for i in range(lines)]
+    float_lines = [make_stage_expression(i, length, depth, table_size, "f", "{}.5") for i in range(lines)]
+    lexed = [(line, lexer.tokenize(line)) for line in int_lines]
+    int_compiled = [parser.compile_expression(line) for line in int_lines]
+    float_compiled = [parser.compile_expression(line) for line in float_lines]
+    # Separate compiled expressions, already compiled to Python
+    parser.clear_cache()
+    native_compiled = [parser.compile_expression(line) for line in int_lines]
+    for compiled in native_compiled:
+        compiled.native = codegen.generate(compiled)
+
+    evaluate = lambda compiled: tokenizer.evaluate_expression(compiled, session)
+    workloads = {
+        "commands": (io_handler.commands, int_lines),
+        "syntax_validation": (lambda line: io_handler.syntax_validation(line, 4), int_lines),
+        "varValidation": (lambda line: tokenizer.varValidation(line, session), int_lines),
+        "tokenize": (lexer.tokenize, int_lines),
+        "compile_expression": (lambda pair: parser.compile_expression(*pair), lexed),
+        "evaluate_int": (evaluate, int_compiled),
+        "evaluate_float": (evaluate, float_compiled),
+        "evaluate_native": (evaluate, native_compiled),
+        "dispatch": (session.execute, [f"r = {line}" for line in int_lines]),
+    }
+    return session, workloads
+
+def time_stage(function, inputs, table, rounds):
+    """
+    Time one stage over its inputs, with cold caches in every round.
+
+    Args:
+        function (callable): The stage, called once per input.
+        inputs (list): The inputs of the stage.
+        table (SymbolTable): The symbol table whose result cache is cleared.
+        rounds (int): Number of timed rounds; the fastest one is kept.
+
+    Returns:
+        float: Microseconds per call.
+    """
+    best = float("inf")
+    for _ in range(rounds):
+        lexer.tokenize.cache_clear()
+        parser.clear_cache()
+        table.results.clear()
+        start = time.perf_counter()
+        for item in inputs:
+            function(item)
+        best = min(best, time.perf_counter() - start)
+    return best / len(inputs) * 1e6
+
+def bench_stages(lines, lengths, depths, table_sizes, rounds):
+    """
+    Time every pipeline stage for each combination of the workload parameters.
+
+    Args:
+        lines (int): Number of distinct expressions per stage.
+        lengths (list): Expression lengths (operands) to try.
+        depths (list): Parenthesis nesting depths to try.
+        table_sizes (list): Symbol-table sizes to try.
+        rounds (int): Timed rounds per stage (the fastest one is kept).
+
+    Returns:
+        dict: Run metadata and "stage[length=..,depth=..,table=..]" -> microseconds per call.
+    """
+    results = {}
+    for length in lengths:
+        for depth in depths:
+            for table_size in table_sizes:
+                session, workloads = stage_workloads(lines, length, min(depth, length - 1), table_size)
+                for stage in STAGES:
+                    function, inputs = workloads[stage]
+                    key = f"{stage}[length={length},depth={depth},table={table_size}]"
+                    codegen.TIERED = stage not in INTERPRETED_STAGES
+                    try:
+                        results[key] = time_stage(function, inputs, session.symbol_table, rounds)
+                    finally:
+                        codegen.TIERED = True
+                    print(f"  {key:<72} {results[key]:10.2f} us/call")
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "lines": lines,
+            "rounds": rounds,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+def compare_results(current, baseline, threshold=REGRESSION_THRESHOLD):
+    """
+    Compare a benchmark run with a baseline run and print the changes.
+
+    Args:
+        current (dict): The results of this run (as returned by `bench_stages`).
+        baseline (dict): The results of an earlier run.
+        threshold (float): Slowdown (fraction) above which a stage is a regression.
+
+    Returns:
+        list: The keys of the regressed stages.
+    """
+    regressions = []
+    print(f"{'stage':<72} {'baseline':>10} {'current':>10} {'change':>8}")
+    for key, value in current["results"].items():
+        old = baseline["results"].get(key)
+        if old is None:
+            continue
+        change = value / old - 1 if old > 0 else 0.0
+        flag = ""
+        if change > threshold:
+            regressions.append(key)
+            flag = "  REGRESSION"
+        print(f"{key:<72} {old:10.2f} {value:10.2f} {change:+8.1%}{flag}")
+    return regressions
+
+def random_expression(rng, depth, is_float):
+    """
+    Build a random expression over the variables a, b and c (differential test).
+
+    Args:
+        rng (random.Random): The random generator.
+        depth (int): Maximum nesting depth of the operations.
+        is_float (bool): Use float literals instead of int literals.
+
+    Returns:
+        str: The expression text.
+    """
+    if depth == 0 or rng.random() < 0.2:
+        if rng.random() < 0.5:
+            term = rng.choice("abc")
+        else:
+            value = rng.choice([0, 1, 2, 3, 7, 10, 12345678901])
+            term = f"{value}.5" if is_float and rng.random() < 0.7 else (f"{value}.0" if is_float else str(value))
+        return f"-{term}" if rng.random() < 0.15 else term
+    left = random_expression(rng, depth - 1, is_float)
+    right = random_expression(rng, depth - 1, is_float)
+    expr = f"{left} {rng.choice('+-*/%')} {right}"
+    return f"({expr})" if rng.random() < 0.5 else expr
+
+def check_tiers(expressions, value_sets, seed):
+    """
+    Differential test: compare the generated Python functions with the interpreter.
+
+    For random expressions and variable values, the compiled function must
+    return exactly what `evaluator.evaluate_compiled` returns: the same
+    value and type, or the same error.
+
+    Args:
+        expressions (int): Number of random expressions.
+        value_sets (int): Variable values tried per expression.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        list: (expression, values, reference result, compiled result) for every mismatch.
+    """
+    rng = random.Random(seed)
+    mismatches = []
+    for _ in range(expressions):
+        is_float = rng.random() < 0.5
+        compiled = parser.compile_expression(random_expression(rng, rng.randint(1, 5), is_float))
+        if compiled.error is not None:
+            continue
+        native = codegen.generate(compiled)
+        for _ in range(value_sets):
+            if is_float:
+                values = [rng.choice([0.0, -1.5, 2.25, 1e300, 3.0]) for _ in compiled.names]
+            else:
+                values = [rng.choice([0, -1, 2, 7, -12, 2 ** 70]) for _ in compiled.names]
+            if not evaluator.compiled_error_finder(compiled, values):
+                continue
+            expected = evaluator.evaluate_compiled(compiled, values)
+            actual = native(values)
+            if type(expected) is not type(actual) or repr(expected) != repr(actual):
+                mismatches.append((compiled.source, values, expected, actual))
+    return mismatches
+
+def bench_tiers(length, calls, expressions, value_sets, seed):
+    """
+    Check the compiled tier against the interpreter, then compare their speed.
+
+    Args:
+        length (int): Operands of the timed expression.
+        calls (int): Evaluations timed per tier.
+        expressions (int): Random expressions in the differential test.
+        value_sets (int): Variable values per expression in the differential test.
+        seed (int): Seed of the differential test.
+
+    Returns:
+        int: The number of mismatches found.
+    """
+    mismatches = check_tiers(expressions, value_sets, seed)
+    print(f"differential test: {expressions} expressions x {value_sets} value sets, {len(mismatches)} mismatches")
+    for source, values, expected, actual in mismatches[:10]:
+        print(f"  {source}  values={values}  interpreter={expected!r}  compiled={actual!r}")
+
+    compiled = parser.compile_expression(make_expression(0, length))
+    values = [i + 1 for i in range(len(compiled.names))]
+    native = codegen.generate(compiled)
+    results = {}
+    for name, function in (("interpreted", evaluator.evaluate_compiled), ("compiled", lambda _, v: native(v))):
+        start = time.perf_counter()
+        for _ in range(calls):
+            function(compiled, values)
+        results[name] = (time.perf_counter() - start) / calls * 1e6
+    print(f"{length} operands, {calls} evaluations")
+    for name, per_call in results.items():
+        print(f"  {name:<12} {per_call:8.2f} us/evaluation")
+    print(f"  speedup      {results['interpreted'] / results['compiled']:8.2f}x")
+    return len(mismatches)
+
+def time_first_output(command, script, runs):
+    """
+    Time fresh processes from launch until they write their first line of output.
+
+    Args:
+        command (list): The command that starts the process.
+        script (str): Sent to the standard input of the process, which is then closed.
+        runs (int): Number of processes to start.
+
+    Returns:
+        list: The measured times (milliseconds), sorted.
+    """
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        process = subprocess.Popen(command, cwd=SNOL_DIR, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                   stderr=subprocess.DEVNULL, text=True)
+        process.stdin.write(script)
+        process.stdin.close()
+        process.stdout.readline()
+        times.append((time.perf_counter() - start) * 1e3)
+        process.stdout.read()
+        process.wait()
+    return sorted(times)
+
+def slowest_imports(module, count):
+    """
+    List the modules imported directly by `module` that take the longest to import.
+
+    Args:
+        module (str): The module to import in a fresh process (with -X importtime).
+        count (int): Number of modules to list.
+
+    Returns:
+        list: (milliseconds including nested imports, module name) pairs, slowest first.
+    """
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=SNOL_DIR,
+                             capture_output=True, text=True)
+    imports = []
+    nested = []
+    for line in process.stderr.splitlines():
+        # "import time: <self us> | <cumulative us> | <name indented by nesting>"; a module
+        # is listed after the modules it imports
+        fields = line.split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        name = fields[2][1:]
+        if not name.startswith(" "):
+            if name == module:
+                imports = nested
+            nested = []
+        elif not name.startswith("   "):
+            nested.append((int(fields[1]) / 1e3, name.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+def bench_startup(runs, imports):
+    """
+    Measure the time from launching the interpreter to its first executed command.
+
+    A bare Python process that echoes one line is timed the same way, so the
+    cost of the interpreter itself (imports and setup) can be told apart from
+    the cost of starting Python.
+
+    Args:
+        runs (int): Processes started per measurement (the median is reported).
+        imports (int): Number of slowest imports of main.py to list.
+
+    Returns:
+        dict: Run metadata and "startup[...]" -> milliseconds.
+    """
+    python = time_first_output([sys.executable, "-c", "print(input())"], "1\n", runs)
+    snol = time_first_output([sys.executable, "main.py", "--quiet"], STARTUP_SCRIPT, runs)
+    results = {
+        "startup[python]": python[len(python) // 2],
+        "startup[snol]": snol[len(snol) // 2],
+        "startup[snol-python]": snol[len(snol) // 2] - python[len(python) // 2],
+    }
+    for key, value in results.items():
+        print(f"  {key:<24} {value:8.2f} ms (median of {runs})")
+    if imports:
+        print("slowest imports of main.py:")
+        for milliseconds, name in slowest_imports("main", imports):
+            print(f"  {name:<24} {milliseconds:8.2f} ms")
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "runs": runs,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+def memory_values(count, seed):
+    """
+    Build the values of a large generated model: ints and floats, plus a few big integers.
+
+    Args:
+        count (int): Number of values.
+        seed (int): Seed of the random values.
+
+    Returns:
+        list: The values.
+    """
+    rng = random.Random(seed)
+    values = []
+    for index in range(count):
+        if index % 1000 == 999:
+            values.append(rng.getrandbits(100))
+        elif index % 2:
+            values.append(rng.random() * 1e6)
+        else:
+            values.append(rng.randrange(-10**12, 10**12))
+    return values
+
+def table_bytes(table_type, values):
+    """
+    Measure the memory taken by a symbol table filled with the given variables.
+
+    The names are created while the table is filled, as a parsed command
+    would create them, so they are counted when the table keeps them alive.
+
+    Args:
+        table_type (type): SymbolTable or CompactSymbolTable.
+        values (list): The values of the variables v0, v1, ...
+
+    Returns:
+        int: The bytes allocated while the table was filled and still held.
+    """
+    tracemalloc.start()
+    table = table_type()
+    for index, value in enumerate(values):
+        # A fresh copy of the value, as an evaluated expression would be
+        table.set_variable(f"v{index}", value * 1)
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del table
+    return allocated
+
+def bench_memory(count, seed):
+    """
+    Compare the bytes per variable of the dictionary and the array-backed symbol tables.
+
+    Args:
+        count (int): Number of variables.
+        seed (int): Seed of the random values.
+    """
+    values = memory_values(count, seed)
+    print(f"{count} variables, names included")
+    results = {}
+    for table_type in (SymbolTable, CompactSymbolTable):
+        results[table_type.__name__] = table_bytes(table_type, values) / count
+    for name, per_variable in results.items():
+        print(f"  {name:<20} {per_variable:8.1f} bytes/variable")
+    print(f"  saving               {1 - results['CompactSymbolTable'] / results['SymbolTable']:8.1%}")
+
+def private_memory():
+    """
+    Return the private (anonymous) resident memory of this process.
+
+    Returns:
+        int/None: Bytes, or None where /proc is not available.
+    """
+    try:
+        with open("/proc/self/status", encoding="ascii") as status:
+            for line in status:
+                if line.startswith("RssAnon:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+def reference_worker(source, lookups, shared):
+    """
+    Give one worker process the reference variables, then read some of them.
+
+    Args:
+        source (str): The shared segment name, or the snapshot path when `shared` is False.
+        lookups (int): Number of variables to read.
+        shared (bool): Attach to the shared set instead of loading a private copy.
+
+    Returns:
+        tuple: Seconds to get the variables, and private memory grown (bytes, or None).
+    """
+    before = private_memory()
+    start = time.perf_counter()
+    if shared:
+        variables = SharedVariables.attach(source, worker=True)
+        table = SharedSymbolTable(variables)
+    else:
+        table = SymbolTable()
+        table.load(source)
+    elapsed = time.perf_counter() - start
+    for index in range(lookups):
+        table.get_variable(f"v{index * 7919 % lookups}")
+    after = private_memory()
+    if shared:
+        variables.close()
+    return elapsed, (after - before) if before is not None and after is not None else None
+
+def bench_shared(count, lookups, max_workers):
+    """
+    Compare loading the reference variables into every worker with attaching to a shared set.
+
+    Args:
+        count (int): Number of reference variables.
+        lookups (int): Variables read by each worker.
+        max_workers (int): The largest worker count to try (1, 2, 4, ... up to it).
+    """
+    variables = {f"v{index}": index * 3 if index % 2 else index * 0.5 for index in range(count)}
+    path = os.path.join(tempfile.gettempdir(), f"snol-reference-{os.getpid()}.snol")
+    write_snapshot(path, variables)
+    start = time.perf_counter()
+    shared = SharedVariables.publish(variables)
+    print(f"{count} variables published in {time.perf_counter() - start:.3f}s ({shared.memory.size:,} bytes)")
+    counts = []
+    workers = 1
+    while workers < max_workers:
+        counts.append(workers)
+        workers *= 2
+    counts.append(max_workers)
+    try:
+        print(f"{'workers':>7}  {'mode':<8} {'ms/worker':>10} {'private MB/worker':>18}")
+        for workers in counts:
+            for mode, source in (("private", path), ("shared", shared.name)):
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    results = list(pool.map(reference_worker, [source] * workers, [lookups] * workers,
+                                            [mode == "shared"] * workers))
+                milliseconds = sum(seconds for seconds, _ in results) / workers * 1e3
+                grown = [memory for _, memory in results if memory is not None]
+                memory = f"{sum(grown) / len(grown) / 1e6:18.1f}" if grown else f"{'n/a':>18}"
+                print(f"{workers:7d}  {mode:<8} {milliseconds:10.2f} {memory}")
+    finally:
+        shared.unlink()
+        os.remove(path)
+
+def thread_worker(table, lines, barrier, failures):
+    """
+    Run commands in one thread of the thread stress test.
+
+    Args:
+        table (SymbolTable): The table shared by every thread.
+        lines (list): The commands to run.
+        barrier (threading.Barrier): Starts every thread at the same time.
+        failures (list): Receives the output of every command that failed.
+    """
+    session = Interpreter(symbol_table=table)
+    barrier.wait()
+    for line in lines:
+        result = session.execute(line)
+        if not result.ok:
+            failures.append(result.output)
+
+def bench_threads(max_threads, commands, counters, switch_interval):
+    """
+    Run many threads against one symbol table: throughput and lost updates.
+
+    Every thread increments shared counters (`c3 = c3 + 1`) and writes a
+    private variable from them. After the run each counter must equal the
+    number of increments made to it; a smaller value means that two
+    read-evaluate-write commands interleaved and one update was lost.
+
+    Args:
+        max_threads (int): The largest thread count to try (1, 2, 4, ... up to it).
+        commands (int): Commands run by each thread.
+        counters (int): Shared counters (fewer means more contention).
+        switch_interval (float): Thread switch interval during the run (seconds); a short
+            one makes interleavings more likely.
+    """
+    counts = []
+    threads = 1
+    while threads < max_threads:
+        counts.append(threads)
+        threads *= 2
+    counts.append(max_threads)
+    interval = sys.getswitchinterval()
+    print(f"{'threads':>7}  {'table':<10} {'commands/sec':>13} {'lost updates':>13} {'failed':>7}")
+    try:
+        sys.setswitchinterval(switch_interval)
+        for threads in counts:
+            for name, table_type in (("dict", SymbolTable), ("striped", ConcurrentSymbolTable)):
+                table = table_type()
+                for counter in range(counters):
+                    table.set_variable(f"c{counter}", 0)
+                workloads = []
+                for thread in range(threads):
+                    lines = []
+                    for index in range(commands):
+                        counter = (index * 7 + thread) % counters
+                        if index % 4 == 3:
+                            lines.append(f"t{thread} = c{counter} * 2 + {thread}")
+                        else:
+                            lines.append(f"c{counter} = c{counter} + 1")
+                    workloads.append(lines)
+                expected = sum(line.startswith("c") for lines in workloads for line in lines)
+
+                barrier = threading.Barrier(threads + 1)
+                failures = []
+                workers = [threading.Thread(target=thread_worker, args=(table, lines, barrier, failures))
+                           for lines in workloads]
+                for worker in workers:
+                    worker.start()
+                barrier.wait()
+                start = time.perf_counter()
+                for worker in workers:
+                    worker.join()
+                elapsed = time.perf_counter() - start
+                lost = expected - sum(table.get_variable(f"c{counter}") for counter in range(counters))
+                print(f"{threads:7d}  {name:<10} {threads * commands / elapsed:13,.0f} {lost:13d} {len(failures):7d}")
+    finally:
+        sys.setswitchinterval(interval)
+
+def int_list(text):
+    """
+    Parse a comma-separated list of integers (command-line helper).
+
+    Args:
+        text (str): e.g. "4,16,64".
+
+    Returns:
+        list: The integers.
+    """
+    return [int(item) for item in text.split(",") if item]
+
+def main(argv=None):
+    """
+    Run the benchmark selected on the command line.
+
+    Args:
+        argv (list/None): The command-line arguments (defaults to sys.argv).
+
+    Returns:
+        int: 1 if a stage regressed against the --compare baseline (or startup is over
+            its --budget), 0 otherwise.
+    """
+    arguments = argparse.ArgumentParser(description="SNOL interpreter benchmarks.")
+    subcommands = arguments.add_subparsers(dest="benchmark", required=True)
+
+    lexing = subcommands.add_parser("lexer", help="per-line front-end cost: legacy scanners vs shared lexer")
+    lexing.add_argument("--lines", type=int, default=20000)
+    lexing.add_argument("--length", type=int, default=12)
+    lexing.add_argument("--repeat", type=int, default=100)
+
+    stages = subcommands.add_parser("stages", help="time each pipeline stage on its own")
+    stages.add_argument("--lines", type=int, default=2000, help="distinct expressions per stage")
+    stages.add_argument("--lengths", type=int_list, default=[4, 16, 64], help="operands per expression")
+    stages.add_argument("--depths", type=int_list, default=[0, 8], help="parenthesis nesting depths")
+    stages.add_argument("--table-sizes", type=int_list, default=[10, 10000], help="variables in the symbol table")
+    stages.add_argument("--rounds", type=int, default=3, help="timed rounds per stage (fastest is kept)")
+    stages.add_argument("--output", help="save the results to this JSON file")
+    stages.add_argument("--compare", help="JSON file of an earlier run to compare with")
+    stages.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="slowdown (fraction) reported as a regression")
+
+    tiers = subcommands.add_parser("tiers", help="differential test and speed of compiled expressions")
+    tiers.add_argument("--length", type=int, default=24, help="operands of the timed expression")
+    tiers.add_argument("--calls", type=int, default=20000, help="evaluations timed per tier")
+    tiers.add_argument("--expressions", type=int, default=2000, help="random expressions to check")
+    tiers.add_argument("--value-sets", type=int, default=20, help="variable values per expression")
+    tiers.add_argument("--seed", type=int, default=0)
+
+    startup = subcommands.add_parser("startup", help="time from launch to the first executed command")
+    startup.add_argument("--runs", type=int, default=20, help="processes started per measurement")
+    startup.add_argument("--imports", type=int, default=8, help="slowest imports of main.py to list")
+    startup.add_argument("--budget", type=float, help="fail if the interpreter adds more than this (ms) to Python")
+    startup.add_argument("--output", help="save the results to this JSON file")
+    startup.add_argument("--compare", help="JSON file of an earlier run to compare with")
+    startup.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                         help="slowdown (fraction) reported as a regression")
+
+    memory = subcommands.add_parser("memory", help="bytes per variable of the dictionary and compact symbol tables")
+    memory.add_argument("--variables", type=int, default=1000000)
+    memory.add_argument("--seed", type=int, default=0)
+
+    sharing = subcommands.add_parser("shared", help="reference variables per worker: private copies vs shared memory")
+    sharing.add_argument("--variables", type=int, default=1000000)
+    sharing.add_argument("--lookups", type=int, default=10000, help="variables read by each worker")
+    sharing.add_argument("--workers", type=int, default=4, help="largest worker count to try")
+
+    threading_ = subcommands.add_parser("threads", help="threads sharing one symbol table: throughput and lost updates")
+    threading_.add_argument("--threads", type=int, default=8, help="largest thread count to try")
+    threading_.add_argument("--commands", type=int, default=20000, help="commands run by each thread")
+    threading_.add_argument("--counters", type=int, default=4, help="shared counters (fewer = more contention)")
+    threading_.add_argument("--switch-interval", type=float, default=1e-5,
+                            help="thread switch interval during the run (seconds)")
+
+    args = arguments.parse_args(argv)
+    if args.benchmark == "tiers":
+        return 1 if bench_tiers(args.length, args.calls, args.expressions, args.value_sets, args.seed) else 0
+    if args.benchmark == "lexer":
+        bench_lexer(args.lines, args.length, args.repeat)
+    elif args.benchmark == "memory":
+        bench_memory(args.variables, args.seed)
+    elif args.benchmark == "shared":
+        bench_shared(args.variables, args.lookups, args.workers)
+    elif args.benchmark == "threads":
+        bench_threads(args.threads, args.commands, args.counters, args.switch_interval)
+    else:
+        if args.benchmark == "stages":
+            current = bench_stages(args.lines, args.lengths, args.depths, args.table_sizes, args.rounds)
+        else:
+            current = bench_startup(args.runs, args.imports)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as output:
+                json.dump(current, output, indent=2)
+        if args.compare:
+            with open(args.compare, encoding="utf-8") as baseline:
+                regressions = compare_results(current, json.load(baseline), args.threshold)
+            if regressions:
+                print(f"{len(regressions)} stages regressed by more than {args.threshold:.0%}.")
+                return 1
+        if args.benchmark == "startup" and args.budget is not None:
+            overhead = current["results"]["startup[snol-python]"]
+            if overhead > args.budget:
+                print(f"Startup takes {overhead:.2f}ms more than Python, over the {args.budget:.2f}ms budget.")
+                return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
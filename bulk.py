@@ -0,0 +1,448 @@
+# === bulk.py ===
+
+import argparse
+import csv
+import mmap
+import sys
+import time
+from array import array
+from collections import namedtuple
+from itertools import repeat
+
+from codegen import generate
+from evaluator import EvalError
+from io_handler import commands, syntax_validation, format_value
+from parser import compile_expression
+from snapshot import MAGIC, layout, unpacked, read_snapshot, write_snapshot
+from tokenizer import isDigit, TYPE_ERROR
+
+# Rows evaluated (and written) at a time; memory use depends on this, not on the input size
+CHUNK_ROWS = 65536
+
+# Per-row errors, with the messages the interpreter uses
+INPUT_ERROR = EvalError("Error! Input must be a number.")
+TYPE_MISMATCH = EvalError(TYPE_ERROR)
+
+class BulkResult(namedtuple("BulkResult", ["rows", "errors", "seconds"])):
+    """
+    The outcome of a bulk evaluation.
+
+    Attributes:
+        rows (int): Number of input rows evaluated.
+        errors (int): Number of rows whose result is an error.
+        seconds (float): Time spent reading, evaluating and writing.
+    """
+    __slots__ = ()
+
+    @property
+    def rows_per_sec(self):
+        """float: Throughput of the evaluation."""
+        return self.rows / self.seconds if self.seconds > 0 else float("inf")
+
+def compile_bulk(expression):
+    """
+    Check and compile the expression of a bulk evaluation.
+
+    The expression goes through the same classification, syntax validation
+    and parser as an expression typed in the interpreter.
+
+    Args:
+        expression (str): An arithmetic SNOL expression, or a single variable or literal.
+
+    Returns:
+        CompiledExpression: The valid compiled expression.
+
+    Raises:
+        ValueError: With the interpreter's error message if the expression is not valid.
+    """
+    expression = expression.strip()
+    messages = []
+    type_ = commands(expression)
+    if type_ not in (4, 7):
+        raise ValueError("SNOL> Error! Bulk evaluation needs an arithmetic expression.")
+    # A single variable or literal (7) is already checked by its classification
+    if type_ == 4 and not syntax_validation(expression, 4, messages.append):
+        raise ValueError(messages[-1] if messages else "SNOL> Error! Invalid expression.")
+    compiled = compile_expression(expression)
+    if compiled.error is not None:
+        raise ValueError(f"SNOL> {compiled.error}")
+    return compiled
+
+class SnapshotColumns:
+    """
+    Input columns stored in a SNOL snapshot file, read through a memory map.
+
+    Every vector variable of the snapshot is a column; its int64/float64
+    elements are read in place, a chunk at a time. Scalar variables of the
+    snapshot are constants available to the expression.
+    """
+
+    def __init__(self, path):
+        """
+        Map a snapshot file.
+
+        Args:
+            path (str): The snapshot file.
+
+        Raises:
+            OSError: If the file cannot be read.
+            ValueError: If the file is not a valid snapshot.
+        """
+        self.file = open(path, "rb")
+        self.mapped = self.view = None
+        try:
+            try:
+                self.mapped = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ValueError("Not a SNOL snapshot.") from None
+            self.view = memoryview(self.mapped)
+            names, values, vectors = layout(self.view)
+        except BaseException:
+            # A truncated or corrupt file: release what was opened before giving up
+            if self.view is not None:
+                self.view.release()
+            if self.mapped is not None:
+                self.mapped.close()
+            self.file.close()
+            raise
+        self.constants = dict(zip(names, values))
+        self.columns = dict(zip(names[len(values):], vectors))
+
+    def typed(self):
+        """
+        Tell whether every value of a column has the same type.
+
+        Returns:
+            bool: True (a snapshot column is all int64 or all float64).
+        """
+        return True
+
+    def column_type(self, name):
+        """
+        Return the SNOL type of a column.
+
+        Args:
+            name (str): The column.
+
+        Returns:
+            type: int or float.
+        """
+        return float if self.columns[name][0] == "d" else int
+
+    def chunks(self, names, size):
+        """
+        Read the values of some columns, a chunk of rows at a time.
+
+        Args:
+            names (list): The columns to read.
+            size (int): Rows per chunk.
+
+        Yields:
+            tuple: The number of rows in the chunk, and for each column the list of its values.
+
+        Raises:
+            ValueError: If the columns do not have the same length.
+        """
+        lengths = {len(self.columns[name][1]) // 8 for name in names}
+        if len(lengths) > 1:
+            raise ValueError("SNOL> Error! Vectors must have the same length.")
+        rows = lengths.pop() if lengths else 0
+        for start in range(0, rows, size):
+            end = min(start + size, rows)
+            yield end - start, [unpacked(self.columns[name][1][8 * start:8 * end], self.columns[name][0], end - start)
+                                for name in names]
+
+    def close(self):
+        """Unmap the file."""
+        for _, data in self.columns.values():
+            data.release()
+        self.view.release()
+        self.mapped.close()
+        self.file.close()
+
+class CsvColumns:
+    """
+    Input columns in a CSV file with a header row, read one chunk of rows at a time.
+
+    Values are read like BEG input: a number with a decimal point is a
+    float, one without is an int, and anything else makes the row an error.
+    """
+
+    def __init__(self, path):
+        """
+        Open a CSV file and read its header.
+
+        Args:
+            path (str): The CSV file.
+
+        Raises:
+            OSError: If the file cannot be read.
+            ValueError: If the file has no header row.
+        """
+        self.file = open(path, newline="", encoding="utf-8")
+        self.reader = csv.reader(self.file)
+        header = next(self.reader, None)
+        if not header:
+            self.file.close()
+            raise ValueError("SNOL> Error! The CSV file has no header row.")
+        self.columns = {name.strip(): index for index, name in enumerate(header)}
+        self.constants = {}
+
+    def typed(self):
+        """
+        Tell whether every value of a column has the same type.
+
+        Returns:
+            bool: False (each CSV value has its own type).
+        """
+        return False
+
+    def chunks(self, names, size):
+        """
+        Read the values of some columns, a chunk of rows at a time.
+
+        Args:
+            names (list): The columns to read.
+            size (int): Rows per chunk.
+
+        Yields:
+            tuple: The number of rows in the chunk, and for each column the list of its
+                values (None for a value that is not a number).
+        """
+        indexes = [self.columns[name] for name in names]
+        chunk = [[] for _ in indexes]
+        rows = 0
+        for row in self.reader:
+            if not row:
+                continue
+            for values, index in zip(chunk, indexes):
+                text = row[index].strip() if index < len(row) else ""
+                value = None
+                if isDigit(text):
+                    try:
+                        value = float(text) if '.' in text else int(text)
+                    except ValueError:
+                        pass
+                values.append(value)
+            rows += 1
+            if rows == size:
+                yield rows, chunk
+                chunk = [[] for _ in indexes]
+                rows = 0
+        if rows:
+            yield rows, chunk
+
+    def close(self):
+        """Close the file."""
+        self.file.close()
+
+def open_columns(path):
+    """
+    Open the input of a bulk evaluation: a SNOL snapshot or a CSV file.
+
+    Args:
+        path (str): The input file.
+
+    Returns:
+        SnapshotColumns/CsvColumns: The columns of the file.
+
+    Raises:
+        OSError: If the file cannot be read.
+        ValueError: If the file is not valid.
+    """
+    with open(path, "rb") as probe:
+        is_snapshot = probe.read(len(MAGIC)) == MAGIC
+    return SnapshotColumns(path) if is_snapshot else CsvColumns(path)
+
+def evaluate_chunk(compiled, native, sources, rows, check_rows):
+    """
+    Evaluate the compiled expression for every row of a chunk.
+
+    Args:
+        compiled (CompiledExpression): The expression.
+        native (function): Its compiled Python function (see `codegen.generate`).
+        sources (list): For each variable (in slot order) the list of its values, or
+            a constant value.
+        rows (int): Number of rows in the chunk.
+        check_rows (bool): Check the input and the types of every row (for untyped input).
+
+    Returns:
+        list: The result (int/float) or EvalError of each row.
+    """
+    if not sources:
+        return [native(())] * rows
+    rows_values = zip(*[source if type(source) is list else repeat(source, rows) for source in sources])
+    if not check_rows:
+        return list(map(native, rows_values))
+
+    literal_types = compiled.literal_types
+    results = []
+    for values in rows_values:
+        if None in values:
+            results.append(INPUT_ERROR)
+        elif len(set(map(type, values)) | literal_types) > 1:
+            results.append(TYPE_MISMATCH)
+        else:
+            results.append(native(values))
+    return results
+
+def evaluate_file(expression, source, output, constants=None, chunk_rows=CHUNK_ROWS):
+    """
+    Evaluate one SNOL expression for every row of an input file.
+
+    The variables of the expression are bound to the columns of the same
+    name (or to constants). Rows are read, evaluated and written a chunk at a
+    time, so memory use does not grow with the input. Each output line is
+    the result of one row, or the error the interpreter would print for it.
+
+    Args:
+        expression (str): The arithmetic expression, e.g. "price * qty + fee".
+        source (str): The input: a SNOL snapshot whose vectors are the columns, or a CSV file
+            with a header row.
+        output (str/stream): The output file, or an open text stream.
+        constants (dict/None): Values of variables that are not columns (the scalar
+            variables of a snapshot input are constants too).
+        chunk_rows (int): Rows per chunk.
+
+    Returns:
+        BulkResult: Rows, errors and time taken.
+
+    Raises:
+        OSError: If a file cannot be read or written.
+        ValueError: If the expression or the input is not valid.
+    """
+    start = time.perf_counter()
+    compiled = compile_bulk(expression)
+    native = generate(compiled)
+    columns = open_columns(source)
+    try:
+        bound = dict(columns.constants)
+        bound.update(constants or {})
+        names = [name for name in compiled.names if name in columns.columns]
+        for name in compiled.names:
+            if name not in columns.columns and name not in bound:
+                raise ValueError(f"SNOL> Error! [{name}] is not defined!")
+
+        check_rows = not columns.typed()
+        mismatch = False
+        if not check_rows:
+            # Typed columns: the type rule is checked once for the whole file
+            types = set(compiled.literal_types)
+            for name in compiled.names:
+                types.add(columns.column_type(name) if name in columns.columns else type(bound[name]))
+            mismatch = len(types) > 1
+
+        stream = open(output, "w", encoding="utf-8") if isinstance(output, str) else output
+        rows = 0
+        errors = 0
+        try:
+            for count, chunk in columns.chunks(names, chunk_rows):
+                by_name = dict(zip(names, chunk))
+                sources = [by_name[name] if name in by_name else bound[name] for name in compiled.names]
+                if mismatch:
+                    results = [TYPE_MISMATCH] * count
+                else:
+                    results = evaluate_chunk(compiled, native, sources, count, check_rows)
+                lines = []
+                for result in results:
+                    if type(result) is EvalError:
+                        errors += 1
+                        lines.append(f"SNOL> {result.message}")
+                    else:
+                        lines.append(format_value(result))
+                lines.append("")
+                stream.write("\n".join(lines))
+                rows += count
+        finally:
+            if stream is not output:
+                stream.close()
+    finally:
+        columns.close()
+    return BulkResult(rows, errors, time.perf_counter() - start)
+
+def convert_csv(source, target):
+    """
+    Convert a CSV file with a header row into a snapshot of columns (for memory-mapped input).
+
+    Args:
+        source (str): The CSV file.
+        target (str): The snapshot file to write.
+
+    Returns:
+        int: The number of rows converted.
+
+    Raises:
+        OSError: If a file cannot be read or written.
+        ValueError: If a value is not a number, or a column mixes ints and floats.
+    """
+    columns = CsvColumns(source)
+    try:
+        names = list(columns.columns)
+        arrays = {}
+        rows = 0
+        for count, chunk in columns.chunks(names, CHUNK_ROWS):
+            for name, values in zip(names, chunk):
+                if None in values:
+                    raise ValueError(f"SNOL> Error! Column [{name}] has a value that is not a number.")
+                typecode = "d" if type(values[0]) is float else "q"
+                column = arrays.setdefault(name, array(typecode))
+                if any(type(value) is not type(values[0]) for value in values) or column.typecode != typecode:
+                    raise ValueError(f"SNOL> Error! Column [{name}] mixes int and float values.")
+                try:
+                    column.extend(values)
+                except OverflowError:
+                    raise ValueError(f"SNOL> Error! Column [{name}] has an integer outside 64 bits.") from None
+            rows += count
+    finally:
+        columns.close()
+    write_snapshot(target, arrays)
+    return rows
+
+def main(argv=None):
+    """
+    Command-line entry point: evaluate an expression over a file, or convert a CSV file.
+
+    Args:
+        argv (list/None): The command-line arguments (defaults to sys.argv).
+
+    Returns:
+        int: 0 if every row succeeded, 1 if some rows are errors, 2 if the run failed.
+    """
+    arguments = argparse.ArgumentParser(description="Evaluate one SNOL expression over columnar input.")
+    subcommands = arguments.add_subparsers(dest="mode", required=True)
+    run = subcommands.add_parser("run", help="evaluate an expression for every row of an input file")
+    run.add_argument("expression", help='the expression, e.g. "price * qty + fee"')
+    run.add_argument("input", help="a snapshot of columns (see convert) or a CSV file with a header row")
+    run.add_argument("--output", default="-", help="where the results go, one per line (default: stdout)")
+    run.add_argument("--constants", metavar="SNAPSHOT", help="snapshot whose variables are used as constants")
+    run.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="rows evaluated at a time")
+    run.add_argument("--quiet", action="store_true", help="do not report rows/sec at the end")
+    convert = subcommands.add_parser("convert", help="convert a CSV file into a memory-mappable snapshot")
+    convert.add_argument("csv")
+    convert.add_argument("snapshot")
+    args = arguments.parse_args(argv)
+
+    try:
+        if args.mode == "convert":
+            rows = convert_csv(args.csv, args.snapshot)
+            print(f"SNOL> Converted {rows} rows to [{args.snapshot}].", file=sys.stderr)
+            return 0
+        constants = None
+        if args.constants is not None:
+            constants = read_snapshot(args.constants)
+        output = sys.stdout if args.output == "-" else args.output
+        result = evaluate_file(args.expression, args.input, output, constants, args.chunk_rows)
+    except OSError as error:
+        print(f"SNOL> Error! {error}", file=sys.stderr)
+        return 2
+    except ValueError as error:
+        print(error, file=sys.stderr)
+        return 2
+
+    if not args.quiet:
+        print(f"SNOL> Evaluated {result.rows} rows in {result.seconds:.3f}s ({result.rows_per_sec:,.0f} rows/sec), "
+              f"{result.errors} errors.", file=sys.stderr)
+    return 1 if result.errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
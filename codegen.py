@@ -0,0 +1,156 @@
+# === codegen.py ===
+
+from nodes import Number, Variable, Negate, BinaryOp, Load, Store
+from evaluator import EvalError, evaluate_compiled
+
+# Evaluations in the interpreter before an expression is compiled to Python
+HOT_THRESHOLD = 32
+
+# Set to False to always use the interpreter
+TIERED = True
+
+# The errors the generated code can return (same messages as `evaluate_compiled`)
+DIVISION_ERROR = EvalError("Division by zero is not allowed!")
+MODULO_ZERO_ERROR = EvalError("Modulo by zero is not allowed!")
+MODULO_TYPE_ERROR = EvalError("Modulo only allowed on integers.")
+MODULO_FLOAT_ERROR = EvalError("Error! Invalid token in the expression.")
+OVERFLOW_ERROR = EvalError("Error! Numeric overflow.")
+
+# How often each tier ran, and how many expressions were compiled
+_counts = {"interpreted": 0, "compiled": 0, "compilations": 0}
+
+def generate_source(compiled):
+    """
+    Translate the program of a compiled expression into Python source.
+
+    The result is one straight-line function: each variable is read from its
+    slot once, every operation becomes an assignment, and the zero-division
+    and modulo checks of `evaluate_compiled` are inlined in the same order,
+    so the first error the interpreter would report is the one returned.
+
+    Args:
+        compiled (CompiledExpression): A valid compiled expression.
+
+    Returns:
+        tuple: The function source and the constants it refers to (k0, k1, ...).
+    """
+    lines = ["def snol_expression(values):"]
+    constants = []
+    stack = []
+    temps = {}
+    uses_modulo = any(type(node) is BinaryOp and node.op == '%' for node in compiled.program)
+
+    for slot in range(len(compiled.names)):
+        lines.append(f"    v{slot} = values[{slot}]")
+    if uses_modulo:
+        if float in compiled.literal_types:
+            lines.append("    is_float = True")
+        else:
+            checks = " or ".join(f"type(v{slot}) is float" for slot in range(len(compiled.names)))
+            lines.append(f"    is_float = {checks or 'False'}")
+    lines.append("    try:")
+
+    for node in compiled.program:
+        node_type = type(node)
+        if node_type is Number:
+            stack.append(f"k{len(constants)}")
+            constants.append(node.value)
+        elif node_type is Variable:
+            stack.append(f"v{node.slot}")
+        elif node_type is Load:
+            stack.append(temps[node.index])
+        elif node_type is Store:
+            temps[node.index] = stack[-1]
+        elif node_type is Negate:
+            target = f"t{len(lines)}"
+            lines.append(f"        {target} = -{stack.pop()}")
+            stack.append(target)
+        else:
+            right = stack.pop()
+            left = stack.pop()
+            op = node.op
+            if op == '/':
+                lines.append(f"        if {right} == 0: return DIVISION_ERROR")
+            elif op == '%':
+                lines.append("        if is_float: return MODULO_FLOAT_ERROR")
+                lines.append(f"        if not (isinstance({left}, int) and isinstance({right}, int)): "
+                             f"return MODULO_TYPE_ERROR")
+                lines.append(f"        if {right} == 0: return MODULO_ZERO_ERROR")
+            target = f"t{len(lines)}"
+            lines.append(f"        {target} = {left} {op} {right}")
+            stack.append(target)
+
+    if lines[-1] == "    try:":
+        # A single literal or variable: nothing can fail
+        lines.pop()
+    else:
+        lines.append("    except OverflowError:")
+        lines.append("        return OVERFLOW_ERROR")
+    # Inlined `normalize_result`: whole floats become ints
+    result = stack.pop()
+    lines.append(f"    return {result} if type({result}) is int else (int({result}) if {result}.is_integer() else {result})")
+    return "\n".join(lines), constants
+
+def generate(compiled):
+    """
+    Compile an expression into a Python function of its variable values.
+
+    Args:
+        compiled (CompiledExpression): A valid compiled expression.
+
+    Returns:
+        function: Takes the values in slot order; returns the result or an EvalError.
+    """
+    source, constants = generate_source(compiled)
+    namespace = {
+        "DIVISION_ERROR": DIVISION_ERROR,
+        "MODULO_ZERO_ERROR": MODULO_ZERO_ERROR,
+        "MODULO_TYPE_ERROR": MODULO_TYPE_ERROR,
+        "MODULO_FLOAT_ERROR": MODULO_FLOAT_ERROR,
+        "OVERFLOW_ERROR": OVERFLOW_ERROR,
+    }
+    namespace.update((f"k{index}", value) for index, value in enumerate(constants))
+    exec(compile(source, f"<snol: {compiled.source}>", "exec"), namespace)
+    return namespace["snol_expression"]
+
+def evaluate_tiered(compiled, values):
+    """
+    Evaluate a compiled expression, compiling it to Python once it is hot.
+
+    The first `HOT_THRESHOLD` evaluations run in the interpreter
+    (`evaluate_compiled`); after that the expression is compiled once and
+    every later evaluation calls the generated function.
+
+    Args:
+        compiled (CompiledExpression): The compiled expression to evaluate.
+        values (list): The current (scalar) values of its variables, in slot order.
+
+    Returns:
+        int/float/EvalError: The result of the evaluation or an error.
+    """
+    native = compiled.native
+    if native is not None:
+        _counts["compiled"] += 1
+        return native(values)
+
+    _counts["interpreted"] += 1
+    compiled.runs += 1
+    if TIERED and compiled.runs >= HOT_THRESHOLD:
+        compiled.native = generate(compiled)
+        _counts["compilations"] += 1
+    return evaluate_compiled(compiled, values)
+
+def tier_info():
+    """
+    Report how often each tier ran.
+
+    Returns:
+        dict: Evaluations in the interpreter and in compiled code, the number of
+            compiled expressions and the hotness threshold.
+    """
+    return dict(_counts, threshold=HOT_THRESHOLD)
+
+def reset_tier_counts():
+    """Reset the tier counters (compiled expressions are kept)."""
+    for key in _counts:
+        _counts[key] = 0
\ No newline at end of file
@@ -1,142 +1,266 @@
 # === evaluator.py ===
 
+from collections import namedtuple
+
 import io_handler as io
+from nodes import Number, Variable, Negate, Load, Store
+import vector
+from vector import element_type
+
+# Range of the elements of int vectors
+INT64_MIN = -(1 << 63)
+INT64_MAX = (1 << 63) - 1
+
+class EvalError(namedtuple("EvalError", ["message"])):
+    """
+    The result of an evaluation that failed.
+    
+    Attributes:
+        message (str): The diagnostic to show after the "SNOL> " prefix.
+    """
+    __slots__ = ()
 
-def expression_data_type(postfix: str) -> bool:
+def normalize_result(result):
     """
-    Determine the data type of the expression based on the presence of a decimal point.
+    Return the result as an integer if it is a whole number, otherwise unchanged.
     
     Args:
-        postfix (str): The postfix expression.
+        result (int/float): The value computed by an evaluator.
     
     Returns:
-        bool: True if the expression is integer-only, False if it contains floats.
+        int/float: The normalized value.
     """
-    return '.' not in postfix  # True - integer, False - float
+    return int(result) if io.num_data_type(result) else result
 
-def evaluate_float_expression(postfix: str) -> str:
+def compiled_error_finder(compiled, values) -> bool:
     """
-    Evaluate a postfix expression containing floating-point numbers.
+    Check if all operands of a compiled expression are of the same data type.
     
     Args:
-        postfix (str): The postfix expression to evaluate.
+        compiled (CompiledExpression): The compiled expression.
+        values (list): The current values of its variables, in slot order.
     
     Returns:
-        str: The result of the evaluation or an error message.
+        bool: True if all operands are of the same type, False otherwise.
     """
-    mystack = []  # Stack to hold operands
-    tokens = postfix.split()  # Split the postfix expression into tokens
-
-    for token in tokens:
-        # Check if token is a number (including negative floats)
-        if token.replace('.', '', 1).isdigit() or (token[0] == '-' and token[1:].replace('.', '', 1).isdigit()):
-            # Push numeric tokens onto the stack
-            mystack.append(float(token))
-        elif token in '+-*/':
-            # Perform arithmetic operations
-            if len(mystack) < 2:
-                return "Error! Invalid expression."
-            if len(mystack) < 2:
-                return "Error! Invalid expression."
-            val2 = mystack.pop()
-            val1 = mystack.pop()
-
-            if token == '+':
-                mystack.append(val1 + val2)
-            elif token == '-':
-                mystack.append(val1 - val2)
-            elif token == '*':
-                mystack.append(val1 * val2)
-            elif token == '/':
-                if val2 == 0:
-                    return "Division by zero is not allowed!"
-                mystack.append(val1 / val2)
-        else:
-            # Handle invalid tokens
-            return "Error! Invalid token in the expression."
-
-    # Final result
-    if len(mystack) != 1:
-        # Ensure the stack contains exactly one result
-        return "Error! Invalid expression."
-
-    result = mystack.pop()
-    # Return the result as an integer if applicable, otherwise as a float
-    return str(int(result)) if io.num_data_type(result) else str(result)
+    types = set(compiled.literal_types)
+    for value in values:
+        value_type = type(value)
+        if value_type is vector.VECTOR_TYPE:
+            value_type = element_type(value)
+        types.add(value_type)
+    return len(types) <= 1
 
-def evaluate_int_expression(postfix: str) -> str:
+def evaluate_compiled(compiled, values):
     """
-    Evaluate a postfix expression containing integers.
+    Evaluate a compiled expression tree against the given variable values.
+    
+    Modulo is integer-only (an error in any expression that involves a
+    float), and the result is returned as an integer whenever it is a whole
+    number.
     
     Args:
-        postfix (str): The postfix expression to evaluate.
+        compiled (CompiledExpression): The compiled expression to evaluate.
+        values (list): The current values of its variables, in slot order.
     
     Returns:
-        str: The result of the evaluation or an error message.
+        int/float/EvalError: The result of the evaluation or an error.
     """
+    is_float = float in compiled.literal_types or any(type(value) is float for value in values)
     mystack = []  # Stack to hold operands
-    tokens = postfix.split()  # Split the postfix expression into tokens
-
-    for token in tokens:
-        if token.lstrip('-').isdigit():
-            # Push numeric tokens onto the stack
-            mystack.append(int(token))
-        elif token in '+-*/%':
-            # Perform arithmetic operations
-            if len(mystack) < 2:
-                return "Error! Invalid expression."
-            val2 = mystack.pop()
-            val1 = mystack.pop()
-
-            if token == '+':
-                mystack.append(val1 + val2)
-            elif token == '-':
-                mystack.append(val1 - val2)
-            elif token == '*':
-                mystack.append(val1 * val2)
-            elif token == '/':
-                if val2 == 0:
-                    return "Division by zero is not allowed!"
-                mystack.append(val1 / val2)
-            elif token == '%':
-                # Handle modulo operation
-                if not (isinstance(val1, int) and isinstance(val2, int)):
-                    return "Modulo only allowed on integers."
-                if val2 == 0:
-                    return "Modulo by zero is not allowed!"
-                mystack.append(val1 % val2)
-        else:
-            # Handle invalid tokens
-            return "Error! Invalid token in the expression."
-
-    if len(mystack) != 1:
-        # Ensure the stack contains exactly one result
-        return "Error! Invalid expression."
-
-    result = mystack.pop()
+    temps = [None] * compiled.temps  # Values of repeated sub-expressions
+
+    try:
+        for node in compiled.program:
+            node_type = type(node)
+            if node_type is Number:
+                mystack.append(node.value)
+            elif node_type is Variable:
+                mystack.append(values[node.slot])
+            elif node_type is Negate:
+                mystack.append(-mystack.pop())
+            elif node_type is Load:
+                mystack.append(temps[node.index])
+            elif node_type is Store:
+                temps[node.index] = mystack[-1]
+            else:
+                val2 = mystack.pop()
+                val1 = mystack.pop()
+                op = node.op
+
+                if op == '+':
+                    mystack.append(val1 + val2)
+                elif op == '-':
+                    mystack.append(val1 - val2)
+                elif op == '*':
+                    mystack.append(val1 * val2)
+                elif op == '/':
+                    if val2 == 0:
+                        return EvalError("Division by zero is not allowed!")
+                    mystack.append(val1 / val2)
+                elif op == '%':
+                    if is_float:
+                        return EvalError("Error! Invalid token in the expression.")
+                    if not (isinstance(val1, int) and isinstance(val2, int)):
+                        return EvalError("Modulo only allowed on integers.")
+                    if val2 == 0:
+                        return EvalError("Modulo by zero is not allowed!")
+                    mystack.append(val1 % val2)
+    except OverflowError:
+        return EvalError("Error! Numeric overflow.")
+
     # Return the result as an integer if applicable, otherwise as a float
-    return str(int(result)) if io.num_data_type(result) else str(result)
+    return normalize_result(mystack.pop())
 
-def error_finder(postfix: str) -> bool:
+def normalize_vector(result):
     """
-    Check if all operands in a postfix expression are of the same data type.
+    Return a vector result as an int64 vector if every element is a whole number.
+    
+    This is the vector counterpart of `normalize_result`.
     
     Args:
-        postfix (str): The postfix expression to check.
+        result (ndarray): The vector computed by `evaluate_vector`.
     
     Returns:
-        bool: True if all operands are of the same type, False otherwise.
+        ndarray: The normalized vector.
+    """
+    np = vector.np
+    if result.dtype.kind == 'f' and len(result) and np.isfinite(result).all():
+        if (np.trunc(result) == result).all() and np.abs(result).max() < 2.0 ** 63:
+            return result.astype(np.int64)
+    return result
+
+def int64_bounds(value):
+    """
+    Return the smallest and the largest element of an int vector (or int scalar).
+    
+    Args:
+        value (ndarray/int): The operand.
+    
+    Returns:
+        tuple: The two bounds, as Python ints.
     """
-    tokens = postfix.split()  # Split the postfix expression into tokens
-    prev_type = None  # Track the type of the previous operand
-
-    for token in tokens:
-        is_number = token.lstrip('-').replace('.', '', 1).isdigit()
-        if is_number:
-            # Determine the type of the current operand (1 for integer, 0 for float)
-            curr_type = 1 if '.' not in token else 0
-            if prev_type is not None and curr_type != prev_type:
-                # If types mismatch, return False
-                return False
-            prev_type = curr_type
-    return True  # All operands are of the same type
\ No newline at end of file
+    if vector.is_vector(value):
+        return (int(value.min()), int(value.max())) if len(value) else (0, 0)
+    return int(value), int(value)
+
+def int64_overflow(op, val1, val2, result):
+    """
+    Check if an int64 vector operation wrapped around.
+    
+    NumPy integer arithmetic wraps silently, while the scalar path uses
+    Python ints, which never overflow; a wrapped element would be a wrong
+    result instead of an error. The bounds of the operands settle the common
+    case cheaply; only when they allow an overflow are the elements checked.
+    
+    Args:
+        op (str): '+', '-' or '*'.
+        val1 (ndarray/int): The left operand.
+        val2 (ndarray/int): The right operand.
+        result (ndarray): The (possibly wrapped) result of the operation.
+    
+    Returns:
+        bool: True if some element of the exact result does not fit in int64.
+    """
+    low1, high1 = int64_bounds(val1)
+    low2, high2 = int64_bounds(val2)
+    if op == '+':
+        extremes = (low1 + low2, high1 + high2)
+    elif op == '-':
+        extremes = (low1 - high2, high1 - low2)
+    else:
+        extremes = (low1 * low2, low1 * high2, high1 * low2, high1 * high2)
+    if INT64_MIN <= min(extremes) and max(extremes) <= INT64_MAX:
+        return False
+
+    np = vector.np
+    if op == '+':
+        # The sign of the result differs from the signs of both operands
+        return bool(np.any((val1 ^ result) & (val2 ^ result) < 0))
+    if op == '-':
+        return bool(np.any((val1 ^ val2) & (val1 ^ result) < 0))
+    # The float product is within a few units in the last place of the exact one
+    product = np.abs(np.multiply(val1, val2, dtype=np.float64))
+    if not np.any(product >= 2.0 ** 63 * (1 - 2.0 ** -50)):
+        return False
+    if np.any(product > 2.0 ** 63 * (1 + 2.0 ** -50)):
+        return True
+    # Too close to the limit to tell: multiply the Python ints
+    exact = np.multiply(np.asarray(val1, dtype=object), np.asarray(val2, dtype=object))
+    return bool(np.any((exact < INT64_MIN) | (exact > INT64_MAX)))
+
+def evaluate_vector(compiled, values):
+    """
+    Evaluate a compiled expression element-wise when some variables hold vectors.
+    
+    Every operator runs as one NumPy operation over whole vectors; scalars are
+    broadcast. The scalar rules still apply: modulo is integer-only, division
+    and modulo by zero are errors, and whole-number results become integers.
+    Integer vectors use 64-bit arithmetic; a result that does not fit in 64
+    bits is a numeric overflow error (scalars would have the exact value).
+    
+    Args:
+        compiled (CompiledExpression): The compiled expression to evaluate.
+        values (list): The current values (scalars or vectors) of its variables, in slot order.
+    
+    Returns:
+        ndarray/EvalError: The result of the evaluation or an error.
+    """
+    np = vector.np  # Loaded when the first vector was made
+    is_float = float in compiled.literal_types or any(element_type(value) is float for value in values)
+    mystack = []  # Stack to hold operands
+    temps = [None] * compiled.temps  # Values of repeated sub-expressions
+
+    try:
+        # Float results overflow to inf as scalars do; int64 wrap-around is checked instead
+        with np.errstate(over='ignore'):
+            for node in compiled.program:
+                node_type = type(node)
+                if node_type is Number:
+                    mystack.append(node.value)
+                elif node_type is Variable:
+                    mystack.append(values[node.slot])
+                elif node_type is Negate:
+                    operand = mystack.pop()
+                    result = np.negative(operand)
+                    if result.dtype.kind == 'i' and np.any(np.equal(operand, INT64_MIN)):
+                        return EvalError("Error! Numeric overflow.")
+                    mystack.append(result)
+                elif node_type is Load:
+                    mystack.append(temps[node.index])
+                elif node_type is Store:
+                    temps[node.index] = mystack[-1]
+                else:
+                    val2 = mystack.pop()
+                    val1 = mystack.pop()
+                    op = node.op
+
+                    if op == '+':
+                        result = np.add(val1, val2)
+                    elif op == '-':
+                        result = np.subtract(val1, val2)
+                    elif op == '*':
+                        result = np.multiply(val1, val2)
+                    elif op == '/':
+                        if np.any(np.equal(val2, 0)):
+                            return EvalError("Division by zero is not allowed!")
+                        result = np.true_divide(val1, val2)
+                    elif op == '%':
+                        if is_float:
+                            return EvalError("Error! Invalid token in the expression.")
+                        if not (element_type(val1) is int and element_type(val2) is int):
+                            return EvalError("Modulo only allowed on integers.")
+                        if np.any(np.equal(val2, 0)):
+                            return EvalError("Modulo by zero is not allowed!")
+                        result = np.remainder(val1, val2)
+                    if op in ('+', '-', '*') and result.dtype.kind == 'i' and int64_overflow(op, val1, val2, result):
+                        return EvalError("Error! Numeric overflow.")
+                    mystack.append(result)
+    except OverflowError:
+        # Also raised by NumPy for a Python int that does not fit in int64
+        return EvalError("Error! Numeric overflow.")
+    except ValueError:
+        # Vectors that cannot be broadcast together
+        return EvalError("Error! Vectors must have the same length.")
+
+    return normalize_vector(np.asarray(mystack.pop()))
\ No newline at end of file
@@ -0,0 +1,176 @@
+# === formulas.py ===
+
+from evaluator import EvalError
+
+class Formulas:
+    """
+    The formula variables (`DEF name = expr`) of a symbol table.
+
+    A formula keeps its compiled expression; the table stores its last
+    value like any other variable. The graph of which formulas read which
+    variables is kept in both directions: when a variable is set, the
+    formulas that depend on it (directly or through other formulas) are only
+    marked dirty, and a dirty formula is recomputed when it is read
+    (`refresh`), after the dirty formulas it reads, so each one is evaluated
+    at most once per change. Definitions that would make a cycle are refused.
+
+    Assigning a formula variable with `=` or BEG turns it back into a plain
+    variable.
+    """
+
+    def __init__(self, table, evaluate):
+        """
+        Initialize an empty set of formulas.
+
+        Args:
+            table (SymbolTable): The table that holds the values of the formulas.
+            evaluate (callable): Evaluates a compiled expression against the table; returns
+                the result or an EvalError (see `tokenizer.evaluate_expression`).
+        """
+        self.table = table
+        self.evaluate = evaluate
+        self.compiled = {}    # Formula name -> its compiled expression
+        self.dependents = {}  # Variable name -> the formulas that read it
+        self.dirty = set()    # Formulas whose stored value is out of date
+        self.storing = None   # The formula whose value is being stored (not a plain assignment)
+
+    def __contains__(self, name):
+        return name in self.compiled
+
+    def __len__(self):
+        return len(self.compiled)
+
+    def cycle(self, name, compiled):
+        """
+        Check whether defining a formula would make it depend on itself.
+
+        Args:
+            name (str): The formula variable.
+            compiled (CompiledExpression): Its new expression.
+
+        Returns:
+            list/None: The names along the cycle, from `name` back to `name`, or None.
+        """
+        formulas = self.compiled
+        parents = {}
+        stack = []
+        for dep in compiled.names:
+            if dep == name:
+                return [name, name]
+            if dep not in parents:
+                parents[dep] = name
+                stack.append(dep)
+        while stack:
+            current = stack.pop()
+            if current not in formulas:
+                continue
+            for dep in formulas[current].names:
+                if dep == name:
+                    path = [name, current]
+                    while path[-1] != name:
+                        path.append(parents[path[-1]])
+                    path.reverse()
+                    return path
+                if dep not in parents:
+                    parents[dep] = current
+                    stack.append(dep)
+        return None
+
+    def define(self, name, compiled, value):
+        """
+        Add or replace a formula (which must not make a cycle, see `cycle`).
+
+        Args:
+            name (str): The formula variable.
+            compiled (CompiledExpression): Its expression.
+            value (int/float/ndarray): Its current value.
+        """
+        if name in self.compiled:
+            self.unlink(name)
+        self.compiled[name] = compiled
+        for dep in compiled.names:
+            self.dependents.setdefault(dep, set()).add(name)
+        self.store(name, value)
+
+    def unlink(self, name):
+        """
+        Remove a formula from the graph (its variable keeps its last value).
+
+        Args:
+            name (str): The formula variable.
+        """
+        for dep in self.compiled.pop(name).names:
+            readers = self.dependents[dep]
+            readers.discard(name)
+            if not readers:
+                del self.dependents[dep]
+        self.dirty.discard(name)
+
+    def store(self, name, value):
+        """
+        Set the value of a formula in the table (without turning it into a plain variable).
+
+        Args:
+            name (str): The formula variable.
+            value (int/float/ndarray): Its new value.
+        """
+        self.storing = name
+        try:
+            self.table.set_variable(name, value)
+        finally:
+            self.storing = None
+        self.dirty.discard(name)
+
+    def changed(self, name):
+        """
+        Mark the formulas that depend on a variable as dirty (called by the symbol table).
+
+        Args:
+            name (str): The variable that was set.
+        """
+        if name in self.compiled and name != self.storing:
+            # A plain assignment replaces the formula
+            self.unlink(name)
+        dependents = self.dependents
+        dirty = self.dirty
+        stack = [name]
+        while stack:
+            for reader in dependents.get(stack.pop(), ()):
+                # The dependents of a dirty formula are already dirty
+                if reader not in dirty:
+                    dirty.add(reader)
+                    stack.append(reader)
+
+    def refresh(self, names):
+        """
+        Recompute the dirty formulas among some variables, and the dirty formulas they read first.
+
+        Args:
+            names (iterable): The variables about to be read.
+
+        Returns:
+            EvalError/None: The error of the first formula that cannot be computed
+                (it stays dirty), naming that formula, or None.
+        """
+        dirty = self.dirty
+        formulas = self.compiled
+        for name in names:
+            if name not in dirty:
+                continue
+            # Depth-first, so every formula is computed after the formulas it reads
+            stack = [name]
+            while stack:
+                current = stack[-1]
+                if current not in dirty:
+                    stack.pop()
+                    continue
+                pending = [dep for dep in formulas[current].names if dep in dirty]
+                if pending:
+                    stack.extend(pending)
+                    continue
+                stack.pop()
+                result = self.evaluate(formulas[current])
+                if type(result) is EvalError:
+                    return EvalError(f"{result.message} (formula [{current}])")
+                self.store(current, result)
+        return None
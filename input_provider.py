@@ -0,0 +1,242 @@
+# === input_provider.py ===
+
+from abc import ABC, abstractmethod
+from collections import deque
+
+class InputProvider(ABC):
+    """
+    A source of values for BEG.
+
+    A provider is called like `input`: it takes a prompt and returns one line,
+    and raises EOFError when no value is left. Providers that are not
+    interactive ignore the prompt, so BEG does not wait on a terminal.
+    """
+
+    @abstractmethod
+    def __call__(self, prompt=""):
+        """
+        Return the next value.
+
+        Args:
+            prompt (str): The prompt to show (ignored by non-interactive providers).
+
+        Returns:
+            str: The next value, as text.
+
+        Raises:
+            EOFError: If no value is left.
+        """
+
+    def read_many(self, count):
+        """
+        Return up to `count` values at once (used for bulk ingestion).
+
+        Args:
+            count (int): The number of values wanted.
+
+        Returns:
+            list: The values; shorter than `count` if the provider runs out.
+        """
+        values = []
+        try:
+            for _ in range(count):
+                values.append(self(""))
+        except EOFError:
+            pass
+        return values
+
+class InteractiveInput(InputProvider):
+    """Read each value from the terminal, showing the prompt."""
+
+    def __init__(self, read=input, flush=None):
+        """
+        Initialize the provider.
+
+        Args:
+            read (callable): The function that shows a prompt and reads a line.
+            flush (callable/None): Called before the prompt, so buffered output shows first.
+        """
+        self.read = read
+        self.flush = flush
+
+    def __call__(self, prompt=""):
+        if self.flush is not None:
+            self.flush()
+        return self.read(prompt)
+
+class QueueInput(InputProvider):
+    """Values supplied in advance (or added later with `put`/`extend`), used in order."""
+
+    def __init__(self, values=()):
+        """
+        Initialize the provider.
+
+        Args:
+            values (iterable): The first values of the queue.
+        """
+        self.values = deque(str(value) for value in values)
+
+    def put(self, value):
+        """
+        Add a value at the end of the queue.
+
+        Args:
+            value (str/int/float): The value.
+        """
+        self.values.append(str(value))
+
+    def extend(self, values):
+        """
+        Add values at the end of the queue.
+
+        Args:
+            values (iterable): The values.
+        """
+        self.values.extend(str(value) for value in values)
+
+    def __call__(self, prompt=""):
+        if not self.values:
+            raise EOFError("No input left for BEG.")
+        return self.values.popleft()
+
+    def read_many(self, count):
+        values = self.values
+        count = min(count, len(values))
+        return [values.popleft() for _ in range(count)]
+
+class FileInput(InputProvider):
+    """
+    Values read from a text file: one per line, or several per line separated by commas.
+
+    The file is read lazily, one line at a time; blank entries are skipped.
+    """
+
+    def __init__(self, source):
+        """
+        Initialize the provider.
+
+        Args:
+            source (str/stream): A file path, or an open text stream.
+        """
+        self.stream = open(source, encoding="utf-8") if isinstance(source, str) else source
+        self.pending = deque()
+
+    def __call__(self, prompt=""):
+        pending = self.pending
+        while not pending:
+            line = self.stream.readline()
+            if not line:
+                raise EOFError("No input left for BEG.")
+            pending.extend(value for value in (item.strip() for item in line.split(",")) if value)
+        return pending.popleft()
+
+    def close(self):
+        """Close the underlying file."""
+        self.stream.close()
+
+class ScriptInput(InputProvider):
+    """
+    The lines of a SNOL script, which also supplies the values of its BEG commands.
+
+    The commands come from `lines`; BEG takes the next line of the script as
+    its value. Both skip blank lines and remove surrounding whitespace, so a
+    script behaves the same wherever it runs (main.py, runner.py). Only one
+    line is held in memory at a time, regardless of the script size.
+    """
+
+    def __init__(self, stream):
+        """
+        Initialize the provider.
+
+        Args:
+            stream: A text stream (open file or sys.stdin), or any iterable of lines.
+        """
+        self.stream = iter(stream)
+        self.line_number = 0  # Line of the script read last
+
+    def lines(self):
+        """
+        Lazily yield the commands of the script, one line at a time.
+
+        Yields:
+            tuple: The line number and the command text.
+        """
+        for line in self.stream:
+            self.line_number += 1
+            line = line.strip()
+            if line:
+                yield self.line_number, line
+
+    def __call__(self, prompt=""):
+        for line in self.stream:
+            self.line_number += 1
+            line = line.strip()
+            if line:
+                return line
+        raise EOFError("No input left for BEG.")
+
+def read_lines(stream):
+    """
+    Lazily yield the commands of a SNOL script, one line at a time.
+
+    Blank lines are skipped and surrounding whitespace is removed (see `ScriptInput`).
+
+    Args:
+        stream: A text stream (open file or sys.stdin).
+
+    Returns:
+        generator: (line number, command text) pairs.
+    """
+    return ScriptInput(stream).lines()
+
+class AsyncInput(InputProvider):
+    """
+    Values produced by an asyncio source (an asyncio.Queue or an async iterator).
+
+    Coroutines read with `await provider.aread()`. Synchronous callers, such
+    as an interpreter running in a worker thread, can call the provider
+    directly when the event loop runs in another thread.
+    """
+
+    def __init__(self, source, loop=None):
+        """
+        Initialize the provider.
+
+        Args:
+            source (asyncio.Queue/async iterator): Where the values come from; a
+                queue item of None marks the end of the input.
+            loop (asyncio.AbstractEventLoop/None): The loop that runs the source
+                (needed for synchronous calls).
+        """
+        # asyncio is only imported here: most sessions never use it, and it is slow to import
+        import asyncio
+
+        self.source = source
+        self.loop = loop
+        self.is_queue = isinstance(source, asyncio.Queue)
+        self.submit = asyncio.run_coroutine_threadsafe
+
+    async def aread(self):
+        """
+        Return the next value.
+
+        Returns:
+            str: The next value, as text.
+
+        Raises:
+            EOFError: If the source is exhausted.
+        """
+        if self.is_queue:
+            value = await self.source.get()
+            if value is None:
+                raise EOFError("No input left for BEG.")
+            return str(value)
+        try:
+            return str(await anext(self.source))
+        except StopAsyncIteration:
+            raise EOFError("No input left for BEG.") from None
+
+    def __call__(self, prompt=""):
+        if self.loop is None:
+            raise RuntimeError("AsyncInput needs the event loop to be called synchronously.")
+        return self.submit(self.aread(), self.loop).result()
\ No newline at end of file
@@ -0,0 +1,499 @@
+# === interpreter.py ===
+
+from collections import namedtuple
+from time import perf_counter
+
+from tokenizer import (BEG, PRINT, SAVE, LOAD, DEF, assignmentOp, varValidation, getValue, postfix_conversion,
+                       ingest_values, split_assignment, evaluate_expression)
+from parser import compile_expression
+from evaluator import EvalError
+from io_handler import manual, syntax_validation, commands
+from symbol_table import SymbolTable
+from session import Session
+from stats import Stats
+from input_provider import QueueInput
+
+# Result of executing a single command
+STATUS_OK = 0
+STATUS_ERROR = 1
+STATUS_EXIT = 2
+
+# Kinds of the prepared steps of a REPEAT block
+STEP_ASSIGN = 0
+STEP_LINE = 1
+STEP_BLOCK = 2
+
+class RepeatBlock:
+    """
+    A REPEAT ... END block: the count expression and the body, which holds
+    command lines and nested blocks (with their line numbers, when known).
+    """
+    __slots__ = ("count", "body", "line", "lines")
+
+    def __init__(self, count, line=None):
+        self.count = count
+        self.body = []
+        self.line = line
+        self.lines = []
+
+class CommandResult(namedtuple("CommandResult", ["line", "command_type", "status", "output", "value"])):
+    """
+    The outcome of one command executed by an `Interpreter`.
+
+    Attributes:
+        line (str): The command that was executed.
+        command_type (int): The code returned by `io_handler.commands()`.
+        status (int): STATUS_OK, STATUS_ERROR or STATUS_EXIT.
+        output (tuple): The lines the command printed.
+        value (int/float/None): The value of an expression or assignment, if any.
+    """
+    __slots__ = ()
+
+    @property
+    def ok(self) -> bool:
+        """bool: True unless the command failed."""
+        return self.status != STATUS_ERROR
+
+class Interpreter(Session):
+    """
+    A self-contained SNOL interpreter.
+
+    Every instance owns its symbol table, input provider and output sink, so
+    any number of independent sessions can live in one process.
+
+    Example:
+        interpreter = Interpreter(inputs=["4"])
+        interpreter.execute_many(["BEG x", "y = x * 2", "PRINT y"])[-1].output
+        -> ('SNOL> [y] = 8',)
+    """
+
+    def __init__(self, symbol_table=None, read=None, write=None, inputs=None, interactive=False, stats=False):
+        """
+        Initialize the interpreter.
+
+        Args:
+            symbol_table (SymbolTable/None): The variables to use (a new, empty table by default).
+            read (callable/None): Input provider for BEG (see `input_provider`): takes a
+                prompt and returns a line.
+            write (callable/None): Output sink that also receives every output line.
+            inputs (iterable/None): Values for BEG when no `read` is given (a `QueueInput`).
+            interactive (bool): True if HELP should wait for ENTER.
+            stats (bool): True to record runtime statistics (see `stats.Stats`).
+        """
+        self.inputs = QueueInput(inputs if inputs is not None else ())
+        if read is None:
+            read = self.inputs
+        super().__init__(symbol_table if symbol_table is not None else SymbolTable(), read, self._capture)
+        self.sink = write
+        self.interactive = interactive
+        self.output = []
+        self.blocks = []  # REPEAT blocks whose END has not been given yet
+        self.line_number = None  # Script line of the current command, if known
+        # Set (a threading.Event) by another thread to stop a running REPEAT block
+        self.cancel = None
+        if stats:
+            self.stats = Stats()
+
+    def _capture(self, text):
+        # Output of the current command is kept for its result and forwarded to the sink
+        self.output.append(text)
+        if self.sink is not None:
+            self.sink(text)
+
+    def dispatch(self, input_str, command_type=None):
+        """
+        Determine the command type of one line and execute the appropriate functionality.
+
+        Args:
+            input_str (str): The command to execute.
+            command_type (int/None): Its code from `io_handler.commands()`, if already known.
+
+        Returns:
+            tuple: The command type, the status and the value (if any).
+        """
+        # Determine the type of command
+        if command_type is None:
+            command_type = commands(input_str)
+        write = self.write
+
+        if self.blocks:
+            # Inside a REPEAT block: collect the line until the block ends
+            return self.collect(input_str, command_type)
+
+        if command_type == 0:
+            # Invalid command
+            write("SNOL> Unknown command! Does not match any valid command of the language.")
+        elif command_type == 1:  # BEG command
+            # Handle variable initialization
+            try:
+                if self.validate(input_str, 1) and BEG(input_str, self):
+                    return command_type, STATUS_OK, None
+            except EOFError:
+                write("SNOL> Error! No input left for BEG.")
+        elif command_type == 2:  # PRINT command
+            # Handle printing of variables or literals
+            if self.validate(input_str, 2) and PRINT(input_str, self):
+                return command_type, STATUS_OK, None
+        elif command_type == 3:  # EXIT! command
+            # Exit the interpreter
+            write("Interpreter is now terminated...")
+            return command_type, STATUS_EXIT, None
+        elif command_type == 4:  # Expression
+            # Handle arithmetic expressions
+            if self.validate(input_str, 4):
+                # Doesnt print anything here
+                value = postfix_conversion(getValue(input_str), session=self)
+                if value is not None:
+                    return command_type, STATUS_OK, value
+        elif command_type == 5:  # Assignment
+            # Handle variable assignment
+            if self.validate(input_str, 5) and assignmentOp(input_str, self):
+                name = input_str.split('=', 1)[0].strip()
+                return command_type, STATUS_OK, self.symbol_table.get_variable(name)
+        elif command_type == 6:  # HELP command
+            # Display the help manual
+            manual(pause=self.interactive, write=write, read=self.read)
+            return command_type, STATUS_OK, None
+        elif command_type == 7:  # Simple expression (variable or literal)
+            # Handle simple expressions (e.g., variable or literal evaluation)
+            if self.validate(input_str, 7):
+                # Doesnt print anything here
+                return command_type, STATUS_OK, None
+        elif command_type == 8:  # SAVE command
+            # Write the variables to a snapshot file
+            if SAVE(input_str, self):
+                return command_type, STATUS_OK, None
+        elif command_type == 9:  # LOAD command
+            # Restore the variables of a snapshot file
+            if LOAD(input_str, self):
+                return command_type, STATUS_OK, None
+        elif command_type == 11:  # REPEAT command
+            # Start collecting a loop body
+            self.blocks.append(RepeatBlock(input_str.strip()[6:].strip(), self.line_number))
+            return command_type, STATUS_OK, None
+        elif command_type == 12:  # END command
+            write("SNOL> Error! END without REPEAT.")
+        elif command_type == 13:  # DEF command
+            # Define a formula variable
+            if self.validate(input_str, 13) and DEF(input_str, self):
+                name = input_str.strip()[3:].split('=', 1)[0].strip()
+                return command_type, STATUS_OK, self.symbol_table.get_variable(name)
+        elif command_type == 10:  # STATS command
+            # Display the runtime statistics
+            if self.stats is None:
+                write("SNOL> Statistics are off (start the interpreter with --stats).")
+            else:
+                for line in self.stats.report():
+                    write(line)
+            return command_type, STATUS_OK, None
+        return command_type, STATUS_ERROR, None
+
+    def validate(self, input_str, command_type):
+        """
+        Check a command before it runs: its syntax, and for expressions that their variables are defined.
+
+        Args:
+            input_str (str): The command.
+            command_type (int): Its code from `io_handler.commands()`.
+
+        Returns:
+            bool: True if the command can run (otherwise the error was written).
+        """
+        stats = self.stats
+        if stats is not None:
+            start = perf_counter()
+        if command_type == 7:
+            valid = varValidation(input_str, self)
+        elif command_type == 4:
+            valid = syntax_validation(input_str, 4, self.write) and varValidation(input_str, self)
+        else:
+            valid = syntax_validation(input_str, command_type, self.write)
+        if stats is not None:
+            stats.record_stage("validate", perf_counter() - start)
+        return valid
+
+    def collect(self, input_str, command_type):
+        """
+        Add a line to the REPEAT block being collected, running the block when it ends.
+
+        Args:
+            input_str (str): The command.
+            command_type (int): Its code from `io_handler.commands()`.
+
+        Returns:
+            tuple: The command type, the status and the value (always None).
+        """
+        if command_type == 11:
+            self.blocks.append(RepeatBlock(input_str.strip()[6:].strip(), self.line_number))
+        elif command_type == 12:
+            block = self.blocks.pop()
+            if not self.blocks:
+                return command_type, self.run_block(block), None
+            self.blocks[-1].body.append(block)
+            self.blocks[-1].lines.append(block.line)
+        else:
+            self.blocks[-1].body.append(input_str)
+            self.blocks[-1].lines.append(self.line_number)
+        return command_type, STATUS_OK, None
+
+    def prepare(self, block):
+        """
+        Validate and compile a REPEAT block once, before it runs.
+
+        Assignments are reduced to their target and compiled expression; other
+        commands are kept as lines (with their command type) and dispatched on
+        every iteration. An assignment that reads its own target (`x = x + 1`)
+        skips the result cache, since its result could never be looked up again.
+        Every step keeps its line number and text for the statistics.
+
+        Args:
+            block (RepeatBlock): The block to prepare.
+
+        Returns:
+            tuple/None: The compiled count and the steps of the body, or None
+                (after writing the error) if the block is invalid.
+        """
+        count = compile_expression(block.count)
+        if count.error is not None:
+            self.write(f"SNOL> {count.error}")
+            return None
+
+        steps = []
+        for item, line_number in zip(block.body, block.lines):
+            if type(item) is RepeatBlock:
+                prepared = self.prepare(item)
+                if prepared is None:
+                    return None
+                steps.append((STEP_BLOCK, prepared, None, False, 11, (line_number, f"REPEAT {item.count}")))
+                continue
+
+            command_type = commands(item)
+            if command_type == 0:
+                self.write("SNOL> Unknown command! Does not match any valid command of the language.")
+                return None
+            if command_type != 5:
+                steps.append((STEP_LINE, item, None, False, command_type, (line_number, item)))
+                continue
+            if not syntax_validation(item, 5, self.write):
+                return None
+            parts = split_assignment(item, self)
+            if parts is None:
+                return None
+            var_name, expression, expression_tokens = parts
+            compiled = compile_expression(expression, expression_tokens)
+            if compiled.error is not None:
+                self.write(f"SNOL> {compiled.error}")
+                return None
+            steps.append((STEP_ASSIGN, var_name, compiled, var_name not in compiled.names, 5, (line_number, item)))
+        return count, steps
+
+    def run_block(self, block):
+        """
+        Prepare a REPEAT block and run it.
+
+        Args:
+            block (RepeatBlock): The outermost block that just ended.
+
+        Returns:
+            int: STATUS_OK, STATUS_ERROR or STATUS_EXIT.
+        """
+        stats = self.stats
+        if stats is None:
+            prepared = self.prepare(block)
+            return self.run_prepared(*prepared) if prepared is not None else STATUS_ERROR
+
+        # The block is recorded as one REPEAT command, with its steps inside it
+        stats.begin_command(f"REPEAT {block.count}", block.line)
+        start = perf_counter()
+        prepared = self.prepare(block)
+        status = self.run_prepared(*prepared) if prepared is not None else STATUS_ERROR
+        error = self.output[-1] if status == STATUS_ERROR and self.output else None
+        stats.record_command(11, perf_counter() - start, error)
+        return status
+
+    def run_prepared(self, count, steps):
+        """
+        Run the steps of a prepared block `count` times.
+
+        The first failing command stops the loop (its error is written once), and
+        so does `cancel` once it is set (checked before every iteration).
+
+        Args:
+            count (CompiledExpression): The number of iterations.
+            steps (list): The prepared steps of the body.
+
+        Returns:
+            int: STATUS_OK, STATUS_ERROR or STATUS_EXIT.
+        """
+        write = self.write
+        iterations = evaluate_expression(count, self)
+        if type(iterations) is EvalError:
+            write(f"SNOL> {iterations.message}")
+            return STATUS_ERROR
+        if type(iterations) is not int or iterations < 0:
+            write("SNOL> Error! REPEAT count must be a non-negative integer.")
+            return STATUS_ERROR
+
+        table = self.symbol_table
+        set_variable = table.set_variable
+        # Tables shared between threads hold the variables of each assignment (see `SymbolTable.locked`)
+        locked = table.locked if table.concurrent else None
+        stats = self.stats
+        cancel = self.cancel
+        for _ in range(iterations):
+            if cancel is not None and cancel.is_set():
+                write("SNOL> Error! REPEAT was cancelled.")
+                return STATUS_ERROR
+            for kind, target, compiled, cache, command_type, source in steps:
+                if stats is not None:
+                    stats.begin_command(source[1], source[0])
+                    start = perf_counter()
+                if kind == STEP_ASSIGN:
+                    if locked is not None:
+                        with locked((target,) + compiled.names):
+                            result = evaluate_expression(compiled, self, cache)
+                            if type(result) is not EvalError:
+                                set_variable(target, result)
+                    else:
+                        result = evaluate_expression(compiled, self, cache)
+                        if type(result) is not EvalError:
+                            set_variable(target, result)
+                    if type(result) is EvalError:
+                        write(f"SNOL> {result.message}")
+                        status = STATUS_ERROR
+                    else:
+                        status = STATUS_OK
+                elif kind == STEP_LINE:
+                    status = self.dispatch(target, command_type)[1]
+                else:
+                    status = self.run_prepared(*target)
+                if stats is not None:
+                    # The error is counted once, by the command that ran the block
+                    stats.record_command(command_type, perf_counter() - start)
+                if status != STATUS_OK:
+                    return status
+        return STATUS_OK
+
+    def execute(self, line, line_number=None):
+        """
+        Execute a single command.
+
+        Args:
+            line (str): The command to execute.
+            line_number (int/None): Its line in the script, if known (for the statistics).
+
+        Returns:
+            CommandResult: The outcome of the command, including its output.
+        """
+        self.output = []
+        self.line_number = line_number
+        stats = self.stats
+        if stats is None:
+            command_type, status, value = self.dispatch(line)
+        else:
+            start = perf_counter()
+            command_type = commands(line)
+            classified = perf_counter()
+            if self.blocks or command_type == 11:
+                # Lines of a REPEAT block are recorded when the block runs (see `run_block`)
+                command_type, status, value = self.dispatch(line, command_type)
+            else:
+                stats.begin_command(line, line_number)
+                stats.record_stage("classify", classified - start)
+                command_type, status, value = self.dispatch(line, command_type)
+                error = self.output[-1] if status == STATUS_ERROR and self.output else None
+                stats.record_command(command_type, perf_counter() - start, error)
+        if not self.commit_journal() and status != STATUS_EXIT:
+            status = STATUS_ERROR
+        return CommandResult(line, command_type, status, tuple(self.output), value)
+
+    def commit_journal(self):
+        """
+        Commit the journal of the symbol table, if it has one (see `journal.Journal.commit`).
+
+        A journal that cannot be written (a full disk, a failed background
+        fsync or compaction) is reported as an error of the command.
+
+        Returns:
+            bool: False if the journal failed.
+        """
+        journal = self.symbol_table.journal
+        if journal is None:
+            return True
+        try:
+            journal.commit()
+        except OSError as error:
+            self.write(f"SNOL> Error! Journal: {error}")
+            return False
+        return True
+
+    def finish(self):
+        """
+        End the input of the session: a REPEAT block still open is an error and is dropped.
+
+        Call this when there are no more commands (end of a script or stream).
+
+        Returns:
+            CommandResult/None: The error for the open block, or None if every block was closed.
+        """
+        if not self.blocks:
+            return None
+        block = self.blocks[0]
+        self.blocks.clear()
+        self.output = []
+        self.write("SNOL> Error! REPEAT without END.")
+        if self.stats is not None:
+            self.stats.record_command(11, 0.0, self.output[-1])
+        return CommandResult(f"REPEAT {block.count}", 11, STATUS_ERROR, tuple(self.output), None)
+
+    def ingest(self, names, provider=None):
+        """
+        Set many variables from an input provider at once, as a batch of BEG
+        commands would, but without a prompt per value.
+
+        Args:
+            names (list): The variables to set, in order.
+            provider (InputProvider/None): Where the values come from (the BEG provider by default).
+
+        Returns:
+            int: The number of variables set.
+        """
+        provider = provider if provider is not None else self.read
+        self.output = []
+        if hasattr(provider, "read_many"):
+            values = provider.read_many(len(names))
+        else:
+            values = []
+            try:
+                for _ in names:
+                    values.append(provider(""))
+            except EOFError:
+                pass
+        count = ingest_values(names, values, self)
+        self.commit_journal()
+        return count
+
+    def execute_many(self, lines):
+        """
+        Execute commands in order, stopping after EXIT!.
+
+        A REPEAT block left open when the commands run out is reported as one
+        more failed result (see `finish`).
+
+        Args:
+            lines (iterable): The commands to execute.
+
+        Returns:
+            list: The CommandResult of every executed command.
+        """
+        results = []
+        for line in lines:
+            result = self.execute(line)
+            results.append(result)
+            if result.status == STATUS_EXIT:
+                break
+        else:
+            result = self.finish()
+            if result is not None:
+                results.append(result)
+        return results
\ No newline at end of file
@@ -1,72 +1,63 @@
-import re
-from tokenizer import isVariable, isDigit, is_operator
+import os
+from functools import lru_cache
+
+from lexer import tokenize, is_variable_name, single_operand, operand_list, NUMBER, NAME, KEYWORD, OPERATOR, LPAREN, RPAREN, ASSIGN
+
+# Names of the command codes returned by `commands()`
+COMMAND_NAMES = {
+    0: "unknown",
+    1: "BEG",
+    2: "PRINT",
+    3: "EXIT!",
+    4: "expression",
+    5: "assignment",
+    6: "HELP",
+    7: "simple",
+    8: "SAVE",
+    9: "LOAD",
+    10: "STATS",
+    11: "REPEAT",
+    12: "END",
+    13: "DEF",
+}
+
+# Integers with more digits than this are converted to text piece by piece
+# (Python refuses to convert them with a single str() call)
+MAX_STR_DIGITS = 4000
+
+# The text of the help manual (read on first use, see `manual_lines`)
+MANUAL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "manual.txt")
+
+@lru_cache(maxsize=1)
+def manual_lines() -> tuple:
+    """
+    Read the lines of the help manual, once.
+    
+    Returns:
+        tuple: The lines of the manual, without line endings.
+    """
+    with open(MANUAL_PATH, encoding="utf-8") as text:
+        return tuple(text.read().splitlines())
 
-def manual():
+def manual(pause=True, write=print, read=input):
     """
     Displays the SNOL (Simple Number-Only Language) Help Manual.
     
     This manual provides detailed information about SNOL syntax, supported data types, 
     how expressions and variables work, available commands, and reserved keywords. 
-    It pauses execution until the user confirms to proceed.
+    It pauses execution until the user confirms to proceed. The text is kept
+    in manual.txt and only read the first time the manual is shown.
+    
+    Args:
+        pause (bool): Wait for ENTER after the manual (disabled in script mode).
+        write (callable): Receives each line of the manual.
+        read (callable): Reads the ENTER confirmation.
     """
-    print()
-    print("=====================================================================================")
-    print(" CMSC 124 Final Requirement: SNOL (Simple Number-Only Language) Help Manual")
-    print("=====================================================================================")
-
-    # Section 1: Formatting rules and case sensitivity.
-    print("1. FORMATTING")
-    print("   Tokens may be separated by spaces but it is not required.")
-    print("   Commands can have no spaces. Identifiers and keywords are case-sensitive.")
-    print("     Examples:")
-    print("       var = 17         -> one space between tokens")
-    print("       var, VaR, VAR    -> different identifiers based on case")
-    print("-------------------------------------------------------------------------------------")
-
-    # Section 2: Supported data types (only integers and floats).
-    print("2. DATA TYPE")
-    print("   Two data types only: integer and float. No declarations needed.")
-    print("   Data type is inferred from your input values.")
-    print("     Examples:")
-    print("       num = 5 + 5       -> int")
-    print("       num = 5.5 + 5.5   -> float")
-    print("       num = 5 + 5.5     -> INVALID (mixed types)")
-    print("-------------------------------------------------------------------------------------")
-
-    # Section 3: Rules for arithmetic operations.
-    print("3. ARITHMETIC OPERATIONS")
-    print("   All operands (numbers/values) must have the same data type.")
-    print("   Infix notation is the expected format of user input.")
-    print("   C-like precedence and associativity rules will be followed.")
-    print("-------------------------------------------------------------------------------------")
-
-    # Section 4: Variable usage and restrictions.
-    print("4. VARIABLES")
-    print("   Variable names cannot be keywords. They may include letters and digits,")
-    print("   and must be defined before use. Variables hold evaluated expressions.")
-    print("-------------------------------------------------------------------------------------")
-
-    # Section 5: Valid input expressions and reserved command behavior.
-    print("5. COMMANDS")
-    print("   Any valid literal, variable, or operation is a command except")
-    print("   reserved keywords that trigger special behavior in the program.")
-    print("-------------------------------------------------------------------------------------")
-
-    # Section 6: Keywords with special behavior in the interpreter.
-    print("6. SPECIAL KEYWORDS")
-    print("   > PRINT - Display a variable or literal.")
-    print("       Example:")
-    print("         num = 8")
-    print("         PRINT num\n")
-    print("   > BEG - Prompt the user for input into a variable.")
-    print("       Example:")
-    print("         BEG var")
-    print("         (user enters value for 'var')\n")
-    print("   > HELP - Shows this SNOL Help manual.\n")
-    print("   > EXIT! - Terminate the program.\n")
-    print("=====================================================================================\n")
-
-    input("Press ENTER to continue...")
+    for line in manual_lines():
+        write(line)
+
+    if pause:
+        read("Press ENTER to continue...")
 
 def commands(input_str: str) -> int:
     """
@@ -84,28 +75,53 @@ def commands(input_str: str) -> int:
              5 = Assignment (with '=')
              6 = HELP request
              7 = Simple literal or variable
+             8 = SAVE to a snapshot file
+             9 = LOAD from a snapshot file
+             10 = STATS report
+             11 = REPEAT (start of a counted loop)
+             12 = END (end of a counted loop)
+             13 = DEF (formula variable)
              0 = Unknown/invalid command
     """
-    # Handle BEG with or without space (e.g., BEGvar or BEG var)
-    if input_str.startswith("BEG") and len(input_str) > 3 and isVariable(input_str[3:]):
+    tokens = tokenize(input_str)
+    if not tokens:
+        return 0
+    first = tokens[0]
+
+    if first.kind == KEYWORD:
+        if first.text == "BEG" and len(tokens) > 1:
+            return 1
+        elif first.text == "PRINT" and len(tokens) > 1:
+            return 2
+        elif first.text == "EXIT!" and len(tokens) == 1:
+            return 3
+        elif first.text == "HELP" and len(tokens) == 1:
+            return 6
+        elif first.text == "SAVE" and len(tokens) > 1:
+            return 8
+        elif first.text == "LOAD" and len(tokens) > 1:
+            return 9
+        elif first.text == "STATS" and len(tokens) == 1:
+            return 10
+        elif first.text == "REPEAT" and len(tokens) > 1:
+            return 11
+        elif first.text == "END" and len(tokens) == 1:
+            return 12
+        elif first.text == "DEF" and len(tokens) > 1:
+            return 13
+        return 0
+    # Handle BEG without space (e.g., BEGvar)
+    elif len(tokens) == 1 and first.text.startswith("BEG") and is_variable_name(first.text[3:]):
         return 1
-    elif re.fullmatch(r"BEG\s+\S+", input_str):
-        return 1
-    elif re.fullmatch(r"PRINT\s+\S+", input_str):
-        return 2
-    elif input_str == "EXIT!":
-        return 3
-    elif input_str == "HELP":
-        return 6
-    elif isVariable(input_str) or isDigit(input_str):
+    elif single_operand(tokens) is not None:
         return 7
-    elif '=' in input_str:
+    elif any(token.kind == ASSIGN for token in tokens):
         return 5
-    elif any(op in input_str for op in "+-*/%") or '(' in input_str or ')' in input_str:
+    elif any(token.kind in (OPERATOR, LPAREN, RPAREN) for token in tokens):
         return 4
     return 0
 
-def syntax_validation(input_str: str, type_: int) -> bool:
+def syntax_validation(input_str: str, type_: int, write=print) -> bool:
     """
     Validates whether the provided input string conforms to the rules 
     of its corresponding SNOL command type.
@@ -113,105 +129,124 @@ def syntax_validation(input_str: str, type_: int) -> bool:
     Args:
         input_str (str): The raw user input string.
         type_ (int): The command type (as returned by `commands()`).
+        write (callable): Receives the error message, if any.
     
     Returns:
         bool: True if valid syntax, otherwise False.
     """
-    parenthesis = 0
-    temp = ''
+    tokens = tokenize(input_str)
 
     # Validate BEG command syntax
     if type_ == 1:
-        temp = input_str[3:].strip() if input_str.startswith("BEG") else input_str[4:].strip()
-        if re.fullmatch(r"[A-Za-z][A-Za-z0-9]*", temp):
+        if len(tokens) == 1:
+            # BEGvar form, already checked by `commands()`
             return True
-        print(f"SNOL> [{temp}] is not a valid variable name!")
+        if len(tokens) == 2 and tokens[1].kind == NAME:
+            return True
+        temp = input_str[tokens[1].pos:].strip()
+        write(f"SNOL> [{temp}] is not a valid variable name!")
         return False
 
-    # Validate PRINT command argument (must be variable or literal)
+    # Validate PRINT command arguments (each must be a variable or literal)
     elif type_ == 2:
-        temp = input_str[6:].strip()
-        if isVariable(temp) or isDigit(temp):
+        if operand_list(tokens[1:]) is not None:
             return True
-        print("SNOL> Unknown command! Does not match any valid command of the language.")
+        write("SNOL> Unknown command! Does not match any valid command of the language.")
         return False
 
     # Validate arithmetic expression for balance and invalid cases
     elif type_ == 4:
-        for i in range(len(input_str)):
-            ch = input_str[i]
-            if ch == '(':
-                parenthesis += 1
-                temp += ch
-            elif ch == ')':
-                parenthesis -= 1
-                if parenthesis < 0:
-                    print("SNOL> Missing parenthesis pair!")
-                    return False
-                temp += ch
-            elif is_operator(ch):
-                # Allow unary minus (e.g., -5 or (-3))
-                if ch == '-' and (i == 0 or input_str[i-1] in "(-+*/%"):
-                    temp += ch
-                    continue
-                if len(temp.strip()) == 0 and ch != '-':
-                    print("SNOL> Unknown command! Does not match any valid command of the language.")
+        previous = None
+        for index, token in enumerate(tokens):
+            if token.kind == OPERATOR:
+                # Allow unary minus (e.g., -5 or (-3)), but no other operator without a left operand
+                if token.text != '-' and (previous is None or previous.kind == OPERATOR):
+                    write("SNOL> Unknown command! Does not match any valid command of the language.")
                     return False
-                if ch == '/' and i + 1 < len(input_str) and input_str[i + 1] == '0':
-                    print("SNOL> Division by zero is not allowed!")
+                if (token.text == '/' and index + 1 < len(tokens) and tokens[index + 1].kind == NUMBER
+                        and float(tokens[index + 1].text) == 0):
+                    write("SNOL> Division by zero is not allowed!")
                     return False
-                temp = ''
-            elif ch != ' ':
-                temp += ch
-
-        if parenthesis != 0:
-            print("SNOL> Missing parenthesis pair!")
-            return False
-        return True
+            previous = token
+        return balanced_parentheses(tokens, write)
 
     # Validate assignment expression (variable = expression)
     elif type_ == 5:
-        parts = input_str.split('=', 1)
-        if len(parts) != 2:
-            print("SNOL> Invalid assignment expression!")
-            return False
-
-        left_side = parts[0].strip()
-        right_side = parts[1].strip()
+        index = next(i for i, token in enumerate(tokens) if token.kind == ASSIGN)
 
         # Left side must be a valid variable
-        if not isVariable(left_side):
-            print("SNOL> Error! Invalid variable name syntax.")
+        if index != 1 or tokens[0].kind != NAME:
+            write("SNOL> Error! Invalid variable name syntax.")
             return False
 
         # Validate that parentheses in expression are balanced
-        for ch in right_side:
-            if ch == '(':
-                parenthesis += 1
-            elif ch == ')':
-                parenthesis -= 1
-                if parenthesis < 0:
-                    print("SNOL> Missing parenthesis pair!")
-                    return False
+        return balanced_parentheses(tokens[index + 1:], write)
 
-        if parenthesis != 0:
-            print("SNOL> Missing parenthesis pair!")
+    # Validate formula definition (DEF variable = expression)
+    elif type_ == 13:
+        if len(tokens) < 4 or tokens[1].kind != NAME or tokens[2].kind != ASSIGN:
+            write("SNOL> Error! Invalid formula syntax (expected DEF name = expression).")
             return False
-
-        return True
+        return balanced_parentheses(tokens[3:], write)
 
     # Catch-all for unsupported/unknown types
     else:
         return False
 
+def balanced_parentheses(tokens, write=print) -> bool:
+    """
+    Check that every parenthesis in a token stream has a matching pair.
+    
+    Args:
+        tokens (tuple): The tokens to check.
+        write (callable): Receives the error message, if any.
+    
+    Returns:
+        bool: True if balanced, otherwise False (after printing the error).
+    """
+    parenthesis = 0
+    for token in tokens:
+        if token.kind == LPAREN:
+            parenthesis += 1
+        elif token.kind == RPAREN:
+            parenthesis -= 1
+            if parenthesis < 0:
+                write("SNOL> Missing parenthesis pair!")
+                return False
+
+    if parenthesis != 0:
+        write("SNOL> Missing parenthesis pair!")
+        return False
+    return True
+
 def num_data_type(num):
     """
     Determines whether the number is an integer or a float.
     
     Args:
-        num (float): A numeric value to check.
+        num (int/float): A numeric value to check.
+    
+    Returns:
+        bool: True if `num` is a whole number, otherwise False (also for inf and nan).
+    """
+    return isinstance(num, int) or num.is_integer()
+
+def format_value(value) -> str:
+    """
+    Formats a number for output, including integers too large for a single str() call.
+    
+    Args:
+        value (int/float): The number to format.
     
     Returns:
-        bool: True if `num` is an integer, otherwise False.
+        str: The decimal text of the number.
     """
-    return num == int(num)
+    if type(value) is not int or value.bit_length() < MAX_STR_DIGITS * 3:
+        return str(value)
+    if value < 0:
+        return '-' + format_value(-value)
+
+    # Split the number in two halves of decimal digits and format them separately
+    half = int(value.bit_length() * 0.30103) // 2
+    high, low = divmod(value, 10 ** half)
+    return format_value(high) + format_value(low).zfill(half)
@@ -0,0 +1,454 @@
+# === journal.py ===
+
+import os
+import threading
+import time
+
+import vector
+from snapshot import read_snapshot, write_snapshot, sync_directory, INT64_MIN, INT64_MAX
+
+# When the journal is forced to disk (fsync)
+SYNC_COMMAND = "command"    # after every command that changed a variable
+SYNC_INTERVAL = "interval"  # by a background thread, at most once per interval
+SYNC_OFF = "off"            # never (records still reach the OS after every command)
+SYNC_POLICIES = (SYNC_COMMAND, SYNC_INTERVAL, SYNC_OFF)
+
+# Default interval of SYNC_INTERVAL (seconds)
+SYNC_INTERVAL_SECONDS = 0.05
+
+# Records in the live segments after which they are compacted into a snapshot
+COMPACT_RECORDS = 100000
+
+# Records held in memory before they are written out, even in the middle of a command
+PENDING_LIMIT = 4096
+
+# Files of a journal directory: segments are replayed in order, on top of the
+# newest snapshot; a snapshot holds everything up to the segment in its name
+SEGMENT_PREFIX = "journal."
+SEGMENT_SUFFIX = ".log"
+SNAPSHOT_PREFIX = "snapshot."
+SNAPSHOT_SUFFIX = ".snol"
+
+def encode_record(name, value):
+    """
+    Encode one assignment as a journal line.
+
+    A line is a kind, the variable name and the value, separated by spaces:
+    "i" (decimal int64), "x" (hexadecimal integer, any size), "f" (float, as
+    repr) or "q"/"d" (int/float vector, comma-separated elements).
+
+    Args:
+        name (str): The variable name.
+        value (int/float/ndarray): The value it was set to.
+
+    Returns:
+        str: The line, with its newline.
+    """
+    value_type = type(value)
+    if value_type is int:
+        if INT64_MIN <= value <= INT64_MAX:
+            return f"i {name} {value}\n"
+        return f"x {name} {value:x}\n"
+    if value_type is float:
+        return f"f {name} {value!r}\n"
+    if value_type is vector.VECTOR_TYPE:
+        kind = "d" if value.dtype.kind == 'f' else "q"
+        return f"{kind} {name} {','.join(map(repr, value.tolist()))}\n"
+    raise ValueError(f"Cannot journal [{name}]: unsupported value type {value_type.__name__}.")
+
+def decode_record(line):
+    """
+    Decode a journal line written by `encode_record`.
+
+    Args:
+        line (str): The line, without its newline.
+
+    Returns:
+        tuple: The variable name and its value.
+
+    Raises:
+        ValueError: If the line is not a valid record.
+    """
+    kind, name, text = line.split(" ", 2)
+    if kind == "i":
+        return name, int(text)
+    if kind == "f":
+        return name, float(text)
+    if kind == "x":
+        return name, int(text, 16)
+    if kind in ("q", "d"):
+        elements = text.split(",") if text else []
+        if kind == "d":
+            return name, vector.as_vector([float(element) for element in elements])
+        return name, vector.as_vector([int(element) for element in elements])
+    raise ValueError(f"Unknown journal record kind [{kind}].")
+
+def file_number(filename, prefix, suffix):
+    """
+    Return the sequence number of a journal segment or snapshot file name.
+
+    Args:
+        filename (str): The file name.
+        prefix (str): SEGMENT_PREFIX or SNAPSHOT_PREFIX.
+        suffix (str): SEGMENT_SUFFIX or SNAPSHOT_SUFFIX.
+
+    Returns:
+        int/None: The number, or None if the file is not of that kind.
+    """
+    if filename.startswith(prefix) and filename.endswith(suffix):
+        number = filename[len(prefix):len(filename) - len(suffix)]
+        if number.isdigit():
+            return int(number)
+    return None
+
+class Journal:
+    """
+    Write-ahead journal of the variables of a symbol table.
+
+    Once attached (`open`), every value set in the table is recorded (name
+    and value, so replay never re-evaluates an expression, and BEG values are
+    recorded as they were entered). Records are collected during a command and
+    written when it ends (`commit`, a group commit), then forced to disk as
+    the sync policy says: with SYNC_INTERVAL a flusher thread forces them
+    out once the interval has passed, so the last commands before the
+    session goes idle are not left unsynced.
+
+    The journal is a directory of numbered segments and snapshots. When the
+    live segments hold `compact_after` records, a new segment is started and a
+    background thread folds the closed segments into a snapshot that replaces
+    them. Recovery loads the newest snapshot and replays the segments written
+    after it; a torn last record (from a crash in the middle of a write) is
+    ignored.
+
+    A failed background fsync or compaction is kept in `error` and raised as
+    an OSError by the next `commit` or by `close`, so the caller can tell the
+    user that the journal may not be durable.
+    """
+
+    def __init__(self, directory, sync=SYNC_COMMAND, interval=SYNC_INTERVAL_SECONDS, compact_after=COMPACT_RECORDS):
+        """
+        Initialize the journal (nothing is read or written before `open`).
+
+        Args:
+            directory (str): The journal directory (created if needed).
+            sync (str): SYNC_COMMAND, SYNC_INTERVAL or SYNC_OFF.
+            interval (float): Seconds between two fsyncs with SYNC_INTERVAL.
+            compact_after (int): Records in the live segments that trigger a compaction
+                (0 disables compaction).
+
+        Raises:
+            ValueError: If the sync policy is unknown.
+        """
+        if sync not in SYNC_POLICIES:
+            raise ValueError(f"Unknown sync policy [{sync}] (expected one of {', '.join(SYNC_POLICIES)}).")
+        self.directory = directory
+        self.sync = sync
+        self.interval = interval
+        self.compact_after = compact_after
+        self.table = None
+        self.stream = None
+        self.segment = 0
+        self.pending = []
+        self.records = 0  # Records in the live segments
+        self.unsynced = False
+        self.last_sync = time.monotonic()
+        # Guards the stream between the command thread and the flusher
+        self.lock = threading.Condition()
+        self.flusher = None  # The SYNC_INTERVAL flusher thread, if any
+        self.compaction = None  # The running compaction thread, if any
+        self.error = None  # The error of the last failed compaction or background fsync, if any
+
+    def files(self, prefix, suffix):
+        """
+        List the segments or snapshots of the directory.
+
+        Args:
+            prefix (str): SEGMENT_PREFIX or SNAPSHOT_PREFIX.
+            suffix (str): SEGMENT_SUFFIX or SNAPSHOT_SUFFIX.
+
+        Returns:
+            list: (number, path) pairs, in increasing order.
+        """
+        found = []
+        for filename in os.listdir(self.directory):
+            number = file_number(filename, prefix, suffix)
+            if number is not None:
+                found.append((number, os.path.join(self.directory, filename)))
+        return sorted(found)
+
+    def segment_path(self, number):
+        """Return the path of journal segment `number`."""
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{number:08d}{SEGMENT_SUFFIX}")
+
+    def snapshot_path(self, number):
+        """Return the path of the snapshot that includes the segments up to `number`."""
+        return os.path.join(self.directory, f"{SNAPSHOT_PREFIX}{number:08d}{SNAPSHOT_SUFFIX}")
+
+    def open(self, table):
+        """
+        Recover the variables of the journal into a table and start journaling it.
+
+        Args:
+            table (SymbolTable): The table to restore and record (usually empty).
+
+        Returns:
+            int: The number of variables restored.
+
+        Raises:
+            OSError: If the directory or its files cannot be used.
+            ValueError: If the newest snapshot is not valid.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        snapshots = self.files(SNAPSHOT_PREFIX, SNAPSHOT_SUFFIX)
+        covered = 0
+        if snapshots:
+            covered, path = snapshots[-1]
+            table.load(path)
+
+        # Only the last value of each variable matters: apply each one once
+        latest = {}
+        segments = self.files(SEGMENT_PREFIX, SEGMENT_SUFFIX)
+        for number, path in segments:
+            if number > covered:
+                self.records += self.replay(path, latest)
+        for name, value in latest.items():
+            table.set_variable(name, value)
+
+        self.segment = max([covered] + [number for number, _ in segments]) + 1
+        self.stream = open(self.segment_path(self.segment), "a", encoding="utf-8")
+        sync_directory(self.segment_path(self.segment))
+        self.table = table
+        table.journal = self
+        if self.sync == SYNC_INTERVAL:
+            self.flusher = threading.Thread(target=self.flush_loop, name="snol-journal-flusher", daemon=True)
+            self.flusher.start()
+        return len(table.variables)
+
+    @staticmethod
+    def replay(path, latest):
+        """
+        Read the records of one segment.
+
+        Args:
+            path (str): The segment file.
+            latest (dict): Receives the last value of every variable in the segment.
+
+        Returns:
+            int: The number of records read.
+        """
+        with open(path, encoding="utf-8") as segment:
+            lines = segment.read().split("\n")
+        # The text after the last newline is a record whose write was cut short
+        lines.pop()
+        for line in lines:
+            name, value = decode_record(line)
+            latest[name] = value
+        return len(lines)
+
+    def record(self, name, value):
+        """
+        Record that a variable was set (called by the symbol table).
+
+        Args:
+            name (str): The variable name.
+            value (int/float/ndarray): Its new value.
+        """
+        pending = self.pending
+        pending.append(encode_record(name, value))
+        if len(pending) >= PENDING_LIMIT:
+            with self.lock:
+                self.write_pending()
+
+    def write_pending(self):
+        """Write the pending records to the current segment, without fsync (the caller holds `lock`)."""
+        self.stream.write("".join(self.pending))
+        self.records += len(self.pending)
+        self.pending = []
+        if not self.unsynced:
+            self.unsynced = True
+            # Wake the flusher: it sleeps while there is nothing to force to disk
+            self.lock.notify()
+
+    def commit(self):
+        """
+        End a command: write its records and force them to disk as the sync policy says.
+
+        Starts a compaction when the live segments have grown past `compact_after` records.
+
+        Raises:
+            OSError: If the records cannot be written, or a background fsync or
+                compaction failed since the last commit.
+        """
+        with self.lock:
+            if self.pending:
+                self.write_pending()
+            if self.unsynced:
+                self.stream.flush()
+                if self.sync == SYNC_COMMAND:
+                    self.fsync()
+        if self.compact_after and self.records >= self.compact_after and not self.compacting():
+            self.compact()
+        self.raise_error()
+
+    def raise_error(self):
+        """
+        Raise the error of a failed background fsync or compaction, once.
+
+        Raises:
+            OSError: The error, if there was one.
+        """
+        error = self.error
+        if error is not None:
+            self.error = None
+            raise error
+
+    def flush_loop(self):
+        """
+        Force the written records to disk at most once per interval (runs in a thread).
+
+        The fsync itself runs on a duplicate of the segment's descriptor
+        without holding `lock`, so commands never wait for the disk.
+        """
+        lock = self.lock
+        while True:
+            with lock:
+                while self.stream is not None and not self.unsynced:
+                    lock.wait()
+                if self.stream is None:
+                    return
+                delay = self.last_sync + self.interval - time.monotonic()
+                if delay > 0:
+                    lock.wait(delay)
+                    continue
+                try:
+                    self.stream.flush()
+                    descriptor = os.dup(self.stream.fileno())
+                except OSError as error:
+                    self.error = OSError(f"background fsync failed: {error}")
+                    descriptor = None
+                self.unsynced = False
+                self.last_sync = time.monotonic()
+            if descriptor is not None:
+                try:
+                    os.fsync(descriptor)
+                except OSError as error:
+                    self.error = OSError(f"background fsync failed: {error}")
+                finally:
+                    os.close(descriptor)
+
+    def compacting(self):
+        """
+        Check if a compaction is running.
+
+        Returns:
+            bool: True while the background snapshot is being written.
+        """
+        return self.compaction is not None and self.compaction.is_alive()
+
+    def fsync(self):
+        """Force the current segment to disk (the caller holds `lock`)."""
+        os.fsync(self.stream.fileno())
+        self.unsynced = False
+        self.last_sync = time.monotonic()
+
+    def compact(self, wait=False):
+        """
+        Replace the live segments by a snapshot, in a background thread.
+
+        The current segment is closed and a new one started; the thread folds
+        the closed segments into the newest snapshot (the same replay as
+        recovery), then deletes the segments and snapshots it makes obsolete.
+        The table itself is never read, so nothing is copied between two
+        commands. Until the snapshot is complete, recovery still uses the
+        older files.
+
+        Args:
+            wait (bool): Wait for the snapshot to be written.
+        """
+        self.wait()
+        with self.lock:
+            if self.pending:
+                self.write_pending()
+            self.stream.flush()
+            os.fsync(self.stream.fileno())
+            self.stream.close()
+            covered = self.segment
+            self.segment += 1
+            self.stream = open(self.segment_path(self.segment), "a", encoding="utf-8")
+            sync_directory(self.segment_path(self.segment))
+            self.records = 0
+            self.unsynced = False
+
+        self.compaction = threading.Thread(target=self.write_compaction, args=(covered,),
+                                           name="snol-journal-compaction", daemon=True)
+        self.compaction.start()
+        if wait:
+            self.wait()
+
+    def write_compaction(self, covered):
+        """
+        Write the snapshot of a compaction and delete the files it replaces (runs in a thread).
+
+        Args:
+            covered (int): The last segment whose records the snapshot includes.
+        """
+        try:
+            variables = {}
+            base = 0
+            snapshots = [(number, path) for number, path in self.files(SNAPSHOT_PREFIX, SNAPSHOT_SUFFIX)
+                         if number < covered]
+            if snapshots:
+                base, path = snapshots[-1]
+                variables = read_snapshot(path)
+            for number, path in self.files(SEGMENT_PREFIX, SEGMENT_SUFFIX):
+                if base < number <= covered:
+                    self.replay(path, variables)
+            # The snapshot is on disk (file and directory) before any segment it replaces is removed
+            write_snapshot(self.snapshot_path(covered), variables)
+            for number, path in self.files(SEGMENT_PREFIX, SEGMENT_SUFFIX):
+                if number <= covered:
+                    os.remove(path)
+            for number, path in self.files(SNAPSHOT_PREFIX, SNAPSHOT_SUFFIX):
+                if number < covered:
+                    os.remove(path)
+        except (OSError, ValueError) as error:
+            # The older files are still there, so nothing is lost; the next compaction retries
+            self.error = OSError(f"compaction failed: {error}")
+
+    def wait(self):
+        """Wait for a running compaction to finish."""
+        if self.compaction is not None:
+            self.compaction.join()
+            self.compaction = None
+
+    def close(self):
+        """
+        Write the pending records, force them to disk (unless sync is off) and stop journaling.
+
+        Raises:
+            OSError: If the records cannot be written, or a background fsync or
+                compaction failed (journaling is stopped either way).
+        """
+        with self.lock:
+            if self.stream is None:
+                return
+            stream = self.stream
+            self.stream = None
+            self.lock.notify_all()
+        try:
+            with stream:
+                stream.write("".join(self.pending))
+                self.pending = []
+                stream.flush()
+                if self.sync != SYNC_OFF:
+                    os.fsync(stream.fileno())
+        finally:
+            # The flusher sees that the stream is gone and stops
+            if self.flusher is not None:
+                self.flusher.join()
+                self.flusher = None
+            self.wait()
+            if self.table is not None:
+                self.table.journal = None
+                self.table = None
+        self.raise_error()
@@ -0,0 +1,136 @@
+# === lexer.py ===
+
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+# Define keywords for the SNOL language
+KEYWORDS = frozenset(["BEG", "PRINT", "EXIT!", "HELP", "SAVE", "LOAD", "STATS", "REPEAT", "END", "DEF"])
+
+# Token kinds
+NUMBER = "NUMBER"        # 12, 3.5
+NAME = "NAME"            # Variable names
+KEYWORD = "KEYWORD"      # BEG, PRINT, EXIT!, HELP, SAVE, LOAD, STATS, REPEAT, END, DEF
+OPERATOR = "OPERATOR"    # + - * / %
+LPAREN = "LPAREN"        # (
+RPAREN = "RPAREN"        # )
+ASSIGN = "ASSIGN"        # =
+INVALID = "INVALID"      # Any other character
+
+# Number of lines whose token streams are kept in the cache
+CACHE_SIZE = 4096
+
+# Optional whitespace followed by one token: number, name/keyword or a single character
+TOKEN_REGEX = re.compile(r"(\s*)(\d+(?:\.\d+)?|EXIT!|[A-Za-z][A-Za-z0-9]*|\S)")
+
+VARIABLE_REGEX = re.compile(r"[a-zA-Z][a-zA-Z0-9]*")
+
+# The kind of a token is decided by its first character
+FIRST_CHAR_KIND = {'(': LPAREN, ')': RPAREN, '=': ASSIGN}
+FIRST_CHAR_KIND.update(dict.fromkeys("+-*/%", OPERATOR))
+FIRST_CHAR_KIND.update(dict.fromkeys("0123456789", NUMBER))
+FIRST_CHAR_KIND.update(dict.fromkeys("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ", NAME))
+
+class Token(namedtuple("Token", ["kind", "text", "pos"])):
+    """
+    A single lexical unit of a SNOL line.
+
+    Attributes:
+        kind (str): One of NUMBER, NAME, KEYWORD, OPERATOR, LPAREN, RPAREN, ASSIGN or INVALID.
+        text (str): The characters of the token.
+        pos (int): The column where the token starts.
+    """
+    __slots__ = ()
+
+@lru_cache(maxsize=CACHE_SIZE)
+def tokenize(line: str) -> tuple:
+    """
+    Split a line into a typed token stream in a single pass.
+
+    Whitespace is dropped. Repeated lines are served from a cache, so every
+    stage of the interpreter can ask for the tokens of the same line without
+    scanning it again.
+
+    Args:
+        line (str): The raw input line.
+
+    Returns:
+        tuple: The tokens of the line, in order.
+    """
+    tokens = []
+    append = tokens.append
+    kind_of = FIRST_CHAR_KIND.get
+    new_token = tuple.__new__  # Skips the argument handling of the namedtuple constructor
+    position = 0
+    for space, text in TOKEN_REGEX.findall(line):
+        position += len(space)
+        kind = kind_of(text[0], INVALID)
+        if kind is NAME and text in KEYWORDS:
+            kind = KEYWORD
+        append(new_token(Token, (kind, text, position)))
+        position += len(text)
+    return tuple(tokens)
+
+def is_variable_name(text: str) -> bool:
+    """
+    Check if a string is a valid variable name and not a keyword.
+
+    Args:
+        text (str): The string to check.
+
+    Returns:
+        bool: True if the string is a valid variable name, False otherwise.
+    """
+    return VARIABLE_REGEX.fullmatch(text) is not None and text not in KEYWORDS
+
+def is_unary_minus(tokens, index) -> bool:
+    """
+    Check if the '-' at `index` is a sign rather than a subtraction.
+
+    Args:
+        tokens (tuple): The token stream.
+        index (int): The position of the '-' token in the stream.
+
+    Returns:
+        bool: True if the minus starts an operand, False otherwise.
+    """
+    return index == 0 or tokens[index - 1].kind in (OPERATOR, LPAREN, ASSIGN)
+
+def single_operand(tokens):
+    """
+    Return the operand if a token stream is one variable or one (signed) number.
+
+    Args:
+        tokens (tuple): The token stream to check.
+
+    Returns:
+        Token/None: A NAME or NUMBER token (the sign folded into its text), or None.
+    """
+    if len(tokens) == 1 and tokens[0].kind in (NAME, NUMBER):
+        return tokens[0]
+    if (len(tokens) == 2 and tokens[0].text == '-' and tokens[1].kind == NUMBER
+            and tokens[1].pos == tokens[0].pos + 1):
+        return Token(NUMBER, '-' + tokens[1].text, tokens[0].pos)
+    return None
+
+def operand_list(tokens):
+    """
+    Split a token stream into variables and (signed) numbers, e.g. for `PRINT a b -3`.
+
+    Args:
+        tokens (tuple): The token stream to split.
+
+    Returns:
+        list/None: The operand tokens (signs folded into their text), or None if
+            the stream holds anything else or is empty.
+    """
+    operands = []
+    index = 0
+    while index < len(tokens):
+        width = 2 if tokens[index].text == '-' else 1
+        operand = single_operand(tokens[index:index + width])
+        if operand is None:
+            return None
+        operands.append(operand)
+        index += width
+    return operands or None
\ No newline at end of file
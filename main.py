@@ -1,58 +1,214 @@
-from tokenizer import BEG, PRINT, assignmentOp, varValidation, getValue, postfix_conversion
-from io_handler import manual, syntax_validation, commands
-from symbol_table import SymbolTable  # Used by tokenizer module
+import argparse
+import sys
+import time
+
+import tokenizer
+from interpreter import Interpreter, STATUS_ERROR, STATUS_EXIT
+from stats import Stats
+from profiler import Profiler
+from input_provider import InteractiveInput, FileInput, ScriptInput, read_lines
+from output_buffer import OutputBuffer
+from symbol_table import CompactSymbolTable
+from journal import Journal, SYNC_POLICIES, SYNC_COMMAND
+
+# Size of the output buffer used in script mode (bytes)
+OUTPUT_BUFFER_SIZE = 1 << 16
+
+# All interpreter output goes through this buffer; it is flushed before
+# every prompt, at the end of a script and on EXIT!
+output = OutputBuffer(limit=OUTPUT_BUFFER_SIZE)
+
+# Interpreter bound to the global symbol table, stdin and stdout
+console = Interpreter(symbol_table=tokenizer.symbol_table, read=InteractiveInput(flush=output.flush),
+                      write=output, interactive=True)
+
+def execute(input_str, interactive=True, line_number=None):
+    """
+    Determine the command type of one line and execute the appropriate functionality.
+
+    Args:
+        input_str (str): The command to execute.
+        interactive (bool): False in script mode (HELP does not wait for ENTER).
+        line_number (int/None): The line of the command in its script, if any.
+
+    Returns:
+        int: STATUS_OK, STATUS_ERROR, or STATUS_EXIT when EXIT! was given.
+    """
+    console.interactive = interactive
+    return console.execute(input_str, line_number).status
 
 def main():
     """
     Entry point for the SNOL interpreter.
     Handles user input, determines the command type, and executes the appropriate functionality.
+
+    Returns:
+        int: The exit code of the interpreter.
     """
     print("The SNOL environment is now active, you may proceed with giving your commands.")
-    
+
     while True:
-        # Prompt the user for input
-        input_str = input("Command: ")
-        
-        # Determine the type of command
-        command_type = commands(input_str)
-        
-        if command_type == 0:
-            # Invalid command
-            print("SNOL> Unknown command! Does not match any valid command of the language.")
-            
-        elif command_type == 1:  # BEG command
-            # Handle variable initialization
-            if syntax_validation(input_str, 1):
-                BEG(input_str)
-        elif command_type == 2:  # PRINT command
-            # Handle printing of variables or literals
-            if syntax_validation(input_str, 2):
-                PRINT(input_str)
-        elif command_type == 3:  # EXIT! command
-            # Exit the interpreter
-            print("Interpreter is now terminated...")
+        # Show the output of the previous command, then prompt the user for input
+        output.flush()
+        try:
+            input_str = input("Command: ")
+        except EOFError:
+            console.finish()
+            break
+
+        if execute(input_str) == STATUS_EXIT:
             break
-        elif command_type == 4:  # Expression
-            # Handle arithmetic expressions
-            if not syntax_validation(input_str, 4):
-                continue
-            if varValidation(input_str):
-                value = getValue(input_str)
-                postfix_conversion(value)
-                # Doesnt print anything here
-        elif command_type == 5:  # Assignment
-            # Handle variable assignment
-            if syntax_validation(input_str, 5):
-                assignmentOp(input_str)
-        elif command_type == 6:  # HELP command
-            # Display the help manual
-            manual()
-        elif command_type == 7:  # Simple expression (variable or literal)
-            # Handle simple expressions (e.g., variable or literal evaluation)
-            if varValidation(input_str):
-                # Doesnt print anything here
-                pass
+    output.flush()
+    return 0
+
+def run_script(lines, report=sys.stderr):
+    """
+    Execute a stream of commands without prompts, buffering the output.
+
+    Output is collected in a large buffer and written in batches instead of
+    once per line (it is also flushed before BEG reads a value). A
+    throughput summary is written to `report` at the end.
+
+    Args:
+        lines (iterable): (line number, command) pairs, e.g. from `read_lines`.
+        report: Stream for the throughput summary, or None to disable it.
+
+    Returns:
+        int: 0 if every command succeeded, 1 otherwise.
+    """
+    errors = 0
+    executed = 0
+    start = time.perf_counter()
+
+    try:
+        for line_number, input_str in lines:
+            executed += 1
+            status = execute(input_str, interactive=False, line_number=line_number)
+            if status == STATUS_EXIT:
+                break
+            if status == STATUS_ERROR:
+                errors += 1
+        else:
+            # The script ended inside a REPEAT block
+            if console.finish() is not None:
+                errors += 1
+    finally:
+        output.flush()
+
+    elapsed = time.perf_counter() - start
+    if report is not None:
+        rate = executed / elapsed if elapsed > 0 else float("inf")
+        print(f"SNOL> Executed {executed} lines in {elapsed:.3f}s ({rate:,.0f} lines/sec), {errors} errors.",
+              file=report)
+    return 1 if errors else 0
+
+def parse_arguments(argv=None):
+    """
+    Parse the command-line arguments of the interpreter.
+
+    Args:
+        argv (list/None): The arguments to parse (defaults to sys.argv).
+
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description="SNOL (Simple Number-Only Language) interpreter.")
+    parser.add_argument("script", nargs="?", help="SNOL script to run; reads stdin when it is not a terminal")
+    parser.add_argument("--quiet", action="store_true", help="do not report lines/sec at the end of a script")
+    parser.add_argument("--inputs", metavar="FILE",
+                        help="read BEG values from FILE (one per line or comma-separated) instead of stdin")
+    parser.add_argument("--stats", action="store_true",
+                        help="record command latencies and errors (see the STATS command)")
+    parser.add_argument("--profile", action="store_true",
+                        help="report the time and hits of every script line, split into pipeline phases")
+    parser.add_argument("--flamegraph", metavar="FILE",
+                        help="with --profile, write the profile as collapsed stacks (flamegraph.pl, speedscope)")
+    parser.add_argument("--compact", action="store_true",
+                        help="keep variables in typed arrays (less memory for very many variables)")
+    parser.add_argument("--journal", metavar="DIR",
+                        help="journal every assignment to DIR and restore the variables found there on start")
+    parser.add_argument("--sync", choices=SYNC_POLICIES, default=SYNC_COMMAND,
+                        help="when the journal is forced to disk: after every command, every --sync-interval, or never")
+    parser.add_argument("--sync-interval", type=float, default=50, metavar="MS",
+                        help="milliseconds between two forced writes with --sync interval")
+    return parser.parse_args(argv)
+
+def run(argv=None):
+    """
+    Run the interpreter interactively or in script mode, depending on the arguments.
+
+    Args:
+        argv (list/None): The command-line arguments (defaults to sys.argv).
+
+    Returns:
+        int: The exit code of the interpreter.
+    """
+    args = parse_arguments(argv)
+    report = None if args.quiet else sys.stderr
+    if args.profile:
+        console.stats = Profiler()
+    elif args.stats:
+        console.stats = Stats()
+    if args.compact:
+        console.symbol_table = CompactSymbolTable()
+    if args.inputs is not None:
+        try:
+            console.read = FileInput(args.inputs)
+        except OSError as error:
+            print(f"SNOL> Error! Cannot open inputs: {error}", file=sys.stderr)
+            return 2
+    journal = None
+    if args.journal is not None:
+        journal = Journal(args.journal, args.sync, args.sync_interval / 1e3)
+        try:
+            restored = journal.open(console.symbol_table)
+        except (OSError, ValueError) as error:
+            print(f"SNOL> Error! Cannot open journal: {error}", file=sys.stderr)
+            return 2
+        if restored and report is not None:
+            print(f"SNOL> Restored {restored} variables from [{args.journal}].", file=sys.stderr)
+
+    try:
+        if args.script is not None:
+            try:
+                script = open(args.script, encoding="utf-8")
+            except OSError as error:
+                print(f"SNOL> Error! Cannot open script: {error}", file=sys.stderr)
+                return 2
+            with script:
+                status = run_script(read_lines(script), report)
+        elif not sys.stdin.isatty():
+            script = ScriptInput(sys.stdin)
+            if args.inputs is None:
+                # BEG reads its value from the next line of the script, as in runner.py
+                console.read = script
+            status = run_script(script.lines(), report)
+        else:
+            status = main()
+    finally:
+        if journal is not None:
+            try:
+                journal.close()
+            except OSError as error:
+                print(f"SNOL> Error! Journal: {error}", file=sys.stderr)
+                status = 1
+
+    if args.stats:
+        # Report the statistics once the script or the session is done
+        for line in console.stats.report():
+            print(line, file=sys.stderr)
+    if args.profile:
+        for line in console.stats.profile_report():
+            print(line, file=sys.stderr)
+        if args.flamegraph is not None:
+            try:
+                count = console.stats.write_collapsed(args.flamegraph)
+            except OSError as error:
+                print(f"SNOL> Error! Cannot write the flame graph: {error}", file=sys.stderr)
+                return 2
+            print(f"SNOL> Wrote {count} stacks to [{args.flamegraph}].", file=sys.stderr)
+    return status
 
 if __name__ == "__main__":
-    # Run the main function when the script is executed
-    main()
\ No newline at end of file
+    # Run the interpreter when the script is executed
+    sys.exit(run())
\ No newline at end of file
@@ -0,0 +1,88 @@
+# === nodes.py ===
+
+class Number:
+    """A numeric literal (int or float)."""
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+class Variable:
+    """
+    A reference to a variable.
+
+    The value is not stored in the node; `slot` indexes the list of
+    values fetched from the symbol table when the expression is evaluated.
+    """
+    __slots__ = ("name", "slot")
+
+    def __init__(self, name, slot):
+        self.name = name
+        self.slot = slot
+
+class Negate:
+    """Unary minus applied to a variable or parenthesized expression."""
+    __slots__ = ("operand",)
+
+    def __init__(self, operand):
+        self.operand = operand
+
+class BinaryOp:
+    """An arithmetic operation (+, -, *, /, %) between two sub-expressions."""
+    __slots__ = ("op", "left", "right")
+
+    def __init__(self, op, left, right):
+        self.op = op
+        self.left = left
+        self.right = right
+
+class Load:
+    """
+    Program instruction: push the saved value of a repeated sub-expression.
+
+    Emitted by the optimizer in place of the second and later occurrences.
+    """
+    __slots__ = ("index",)
+
+    def __init__(self, index):
+        self.index = index
+
+class Store:
+    """
+    Program instruction: save the value on top of the stack (without popping it)
+    so later occurrences of the same sub-expression can `Load` it.
+    """
+    __slots__ = ("index",)
+
+    def __init__(self, index):
+        self.index = index
+
+class CompiledExpression:
+    """
+    The parsed form of an expression, independent of any variable values.
+
+    Attributes:
+        source (str): The normalized source text.
+        root: The root node of the expression tree (None on error).
+        program (tuple): The nodes of the tree in evaluation (postfix) order.
+        names (tuple): Variable names in slot order (order of first use).
+        literal_types (frozenset): The types (int/float) of the literals in the source,
+            kept even when the optimizer folds literals away.
+        temps (int): Number of saved sub-expression values the program uses.
+        error (str/None): The diagnostic message if the expression is invalid.
+        runs (int): Number of times the interpreter evaluated the expression.
+        native (function/None): The expression compiled to Python once it became
+            hot (see `codegen`).
+    """
+    __slots__ = ("source", "root", "program", "names", "literal_types", "temps", "error", "runs", "native")
+
+    def __init__(self, source, root=None, program=(), names=(), literal_types=frozenset(), temps=0, error=None):
+        self.source = source
+        self.root = root
+        self.program = program
+        self.names = names
+        self.literal_types = literal_types
+        self.temps = temps
+        self.error = error
+        self.runs = 0
+        self.native = None
\ No newline at end of file
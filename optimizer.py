@@ -0,0 +1,277 @@
+# === optimizer.py ===
+
+from nodes import Number, Variable, Negate, BinaryOp, Load, Store, CompiledExpression
+
+def fold_constants(left, op, right, is_float):
+    """
+    Compute `left op right` for two literals, if it cannot fail at run time.
+
+    Operations that would produce a diagnostic (division or modulo by zero,
+    modulo on floats, overflow) are not folded, so the evaluator still
+    reports them exactly as before.
+
+    Args:
+        left (int/float): The left literal.
+        op (str): The operator.
+        right (int/float): The right literal.
+        is_float (bool): True if the expression is evaluated in float mode.
+
+    Returns:
+        int/float/None: The folded value, or None if the operation must stay.
+    """
+    try:
+        if op == '+':
+            return left + right
+        elif op == '-':
+            return left - right
+        elif op == '*':
+            return left * right
+        elif op == '/':
+            if right == 0:
+                return None
+            return left / right
+        elif op == '%':
+            if is_float or type(left) is not int or type(right) is not int or right == 0:
+                return None
+            return left % right
+    except OverflowError:
+        return None
+    return None
+
+def is_literal(node, value) -> bool:
+    """
+    Check if a node is a literal equal to `value` (e.g. 0 or 1, either type).
+
+    Args:
+        node: The node to check.
+        value (int): The value to compare with.
+
+    Returns:
+        bool: True if the node is that literal.
+    """
+    return type(node) is Number and node.value == value
+
+def simplify(node, is_float, can_fold):
+    """
+    Apply constant folding and safe algebraic identities to one node whose
+    operands are already simplified.
+
+    The identities (x * 1, 1 * x, x + 0, 0 + x, x - 0 and - -x) keep the
+    value and its type unchanged. Division by one is left alone: in integer
+    mode it turns an int into a float, which changes what `%` reports.
+
+    Args:
+        node (Negate/BinaryOp): The node to simplify.
+        is_float (bool): True if the expression is evaluated in float mode.
+        can_fold (bool): False when the literals mix int and float, which the
+            type check will reject anyway.
+
+    Returns:
+        The simplified node (possibly the node itself).
+    """
+    if type(node) is Negate:
+        operand = node.operand
+        if type(operand) is Negate:
+            return operand.operand
+        if type(operand) is Number:
+            return Number(-operand.value)
+        return node
+
+    left, op, right = node.left, node.op, node.right
+    if can_fold and type(left) is Number and type(right) is Number:
+        value = fold_constants(left.value, op, right.value, is_float)
+        if value is not None:
+            return Number(value)
+    if op == '*':
+        if is_literal(right, 1):
+            return left
+        if is_literal(left, 1):
+            return right
+    elif op == '+':
+        if is_literal(right, 0):
+            return left
+        if is_literal(left, 0):
+            return right
+    elif op == '-':
+        if is_literal(right, 0):
+            return left
+    return node
+
+def node_key(node, keys):
+    """
+    Build the structural key of a node from the numbers of its children.
+
+    Two sub-expressions with equal keys always compute the same value. The
+    key refers to its children by number (see `optimize`), so it stays flat
+    and hashing it does not walk the whole sub-tree.
+
+    Args:
+        node: The node.
+        keys (dict): id(node) -> number for the children that are already numbered.
+
+    Returns:
+        tuple: The key of the node.
+    """
+    node_type = type(node)
+    if node_type is Number:
+        return ('n', type(node.value).__name__, repr(node.value))
+    if node_type is Variable:
+        return ('v', node.slot)
+    if node_type is Negate:
+        return ('neg', keys[id(node.operand)])
+    return (node.op, keys[id(node.left)], keys[id(node.right)])
+
+def children(node):
+    """
+    Return the operands of a node, left to right.
+
+    Args:
+        node: The node.
+
+    Returns:
+        tuple: The child nodes (empty for literals and variables).
+    """
+    node_type = type(node)
+    if node_type is BinaryOp:
+        return (node.left, node.right)
+    if node_type is Negate:
+        return (node.operand,)
+    return ()
+
+def postfix(root):
+    """
+    Lay out the evaluation program of a tree that has no repeated sub-expression.
+
+    Args:
+        root: The root of the (simplified) tree.
+
+    Returns:
+        tuple: The nodes in postfix order.
+    """
+    # Visiting node, right, left and reversing gives left, right, node
+    reverse = []
+    pending = [root]
+    while pending:
+        node = pending.pop()
+        reverse.append(node)
+        node_type = type(node)
+        if node_type is BinaryOp:
+            pending.append(node.left)
+            pending.append(node.right)
+        elif node_type is Negate:
+            pending.append(node.operand)
+    reverse.reverse()
+    return tuple(reverse)
+
+def schedule(root, keys):
+    """
+    Lay out the evaluation program of a tree, evaluating repeated
+    sub-expressions only once (common-subexpression elimination).
+
+    The first occurrence of a repeated sub-expression is followed by a
+    `Store`; later occurrences become a `Load` of the saved value.
+
+    Args:
+        root: The root of the (simplified) tree.
+        keys (dict): id(node) -> structure number for every node of the tree.
+
+    Returns:
+        tuple: The program (nodes in postfix order) and the number of saved values.
+    """
+    # Count the occurrences of each operation, without looking inside
+    # occurrences that will be loaded instead of evaluated
+    seen = {}
+    pending = [root]
+    while pending:
+        node = pending.pop()
+        if type(node) in (Number, Variable):
+            continue
+        key = keys[id(node)]
+        seen[key] = seen.get(key, 0) + 1
+        if seen[key] == 1:
+            pending.extend(children(node))
+    repeated = {key for key, count in seen.items() if count > 1}
+
+    program = []
+    temps = {}
+    pending = [(root, False)]
+    while pending:
+        node, expanded = pending.pop()
+        key = keys[id(node)]
+        if expanded:
+            program.append(node)
+            if key in repeated:
+                temps[key] = len(temps)
+                program.append(Store(temps[key]))
+            continue
+        if key in temps:
+            program.append(Load(temps[key]))
+            continue
+        pending.append((node, True))
+        pending.extend((child, False) for child in reversed(children(node)))
+    return tuple(program), len(temps)
+
+def optimize(compiled):
+    """
+    Optimize a parsed expression: fold literal sub-expressions, apply safe
+    identities and evaluate repeated sub-expressions only once.
+
+    Every diagnostic of the unoptimized expression is kept: the variable
+    names and literal types used by the type check are not changed, and
+    operations that would fail are never folded.
+
+    Args:
+        compiled (CompiledExpression): The expression as produced by the parser.
+
+    Returns:
+        CompiledExpression: The optimized expression (the input itself if it has an error).
+    """
+    if compiled.error is not None:
+        return compiled
+
+    is_float = float in compiled.literal_types
+    can_fold = len(compiled.literal_types) == 1
+    keys = {}     # id(node) -> structure number: equal numbers, equal sub-trees
+    numbers = {}  # structural key -> structure number
+    repeats = False
+    operands = []
+    for node in compiled.program:
+        node_type = type(node)
+        if node_type is Negate:
+            operand = operands.pop()
+            # Keep the parser's node while its operand is unchanged (most expressions need no rewrite)
+            node = simplify(node if operand is node.operand else Negate(operand), is_float, can_fold)
+        elif node_type is BinaryOp:
+            right = operands.pop()
+            left = operands.pop()
+            if left is not node.left or right is not node.right:
+                node = BinaryOp(node.op, left, right)
+            # Folding and every identity need a literal operand
+            if type(left) is Number or type(right) is Number:
+                node = simplify(node, is_float, can_fold)
+        key = node_key(node, keys)
+        number = numbers.get(key)
+        if number is None:
+            number = numbers[key] = len(numbers)
+        elif type(node) is not Number and type(node) is not Variable:
+            repeats = True
+        # Always (re)assign: the id of a node dropped by folding may be reused
+        keys[id(node)] = number
+        operands.append(node)
+
+    root = operands.pop()
+    if not repeats:
+        if root is compiled.root:
+            # Nothing to fold, simplify or share: the parsed program is already optimal
+            return compiled
+        program, temps = postfix(root), 0
+    else:
+        program, temps = schedule(root, keys)
+    return CompiledExpression(
+        compiled.source,
+        root=root,
+        program=program,
+        names=compiled.names,
+        literal_types=compiled.literal_types,
+        temps=temps,
+    )
@@ -0,0 +1,53 @@
+# === output_buffer.py ===
+
+import sys
+
+# Output is written to the stream once this many characters are pending
+BUFFER_SIZE = 1 << 16
+
+class OutputBuffer:
+    """
+    Collects output lines and writes them to a stream in large batches.
+
+    An `OutputBuffer` is a drop-in output sink (it is called with one line,
+    like `print`). Pending output is written when the buffer is full and
+    whenever `flush` is called: the interpreter flushes at the end of a batch
+    of commands, before it shows an input prompt and on EXIT!.
+    """
+
+    def __init__(self, stream=None, limit=BUFFER_SIZE):
+        """
+        Initialize an empty buffer.
+
+        Args:
+            stream: The text stream to write to (the current sys.stdout by default).
+            limit (int): Number of pending characters that triggers a write.
+        """
+        self.stream = stream
+        self.limit = limit
+        self.lines = []
+        self.size = 0
+
+    def __call__(self, text=""):
+        """
+        Add one line of output.
+
+        Args:
+            text (str): The line, without its newline.
+        """
+        self.lines.append(text)
+        self.size += len(text) + 1
+        if self.size >= self.limit:
+            self.flush()
+
+    def flush(self):
+        """Write the pending output to the stream."""
+        if self.lines:
+            stream = self.stream if self.stream is not None else sys.stdout
+            self.lines.append("")
+            stream.write("\n".join(self.lines))
+            self.lines = []
+            self.size = 0
+            stream.flush()
+        elif self.stream is None:
+            sys.stdout.flush()
\ No newline at end of file
@@ -0,0 +1,199 @@
+# === parser.py ===
+
+from collections import OrderedDict
+from lexer import tokenize, NUMBER, NAME, KEYWORD, OPERATOR, LPAREN, RPAREN
+from nodes import Number, Variable, Negate, BinaryOp, CompiledExpression
+from optimizer import optimize
+
+# Number of compiled expressions kept in the cache
+CACHE_SIZE = 1024
+
+# Run the optimizer on newly compiled expressions
+OPTIMIZE = True
+
+PRECEDENCE = {'+': 1, '-': 1, '*': 2, '/': 2, '%': 2, 'neg': 3}
+
+KEYWORD_ERROR = "Unknown command! Does not match any valid command of the language."
+TOKEN_ERROR = "Error! Invalid token in the expression."
+EXPRESSION_ERROR = "Error! Invalid expression."
+PARENTHESIS_ERROR = "Missing parenthesis pair!"
+
+def normalize(source: str) -> str:
+    """
+    Normalize expression text so that spacing differences share a cache entry.
+
+    Args:
+        source (str): The raw expression text.
+
+    Returns:
+        str: The text with surrounding whitespace removed and inner runs collapsed.
+    """
+    return ' '.join(source.split())
+
+def parse(source: str, tokens) -> CompiledExpression:
+    """
+    Parse the token stream of an infix expression into an expression tree
+    using the shunting-yard algorithm.
+
+    Args:
+        source (str): The (normalized) expression text.
+        tokens (tuple): The tokens of the expression, as produced by `lexer.tokenize`.
+
+    Returns:
+        CompiledExpression: The parsed expression, or one carrying an error message.
+    """
+    operands = []    # Stack of completed sub-trees
+    operators = []   # Stack of pending operators and '('
+    program = []     # Nodes in postfix order
+    slots = {}       # Variable name -> slot index
+    literal_types = set()
+    expect_operand = True
+
+    def reduce(op):
+        # Combine the top operand(s) with an operator into a new node
+        if op == 'neg':
+            operand = operands.pop()
+            if type(operand) is Number:
+                node = Number(-operand.value)
+                program[-1] = node
+            else:
+                node = Negate(operand)
+                program.append(node)
+        else:
+            right = operands.pop()
+            left = operands.pop()
+            node = BinaryOp(op, left, right)
+            program.append(node)
+        operands.append(node)
+
+    for token in tokens:
+        kind = token.kind
+
+        if expect_operand:
+            if kind == NUMBER:
+                value = float(token.text) if '.' in token.text else int(token.text)
+                literal_types.add(type(value))
+                node = Number(value)
+            elif kind == NAME:
+                if token.text not in slots:
+                    slots[token.text] = len(slots)
+                node = Variable(token.text, slots[token.text])
+            elif kind == LPAREN:
+                operators.append('(')
+                continue
+            elif token.text == '-':
+                # Unary minus
+                operators.append('neg')
+                continue
+            elif kind == KEYWORD:
+                return CompiledExpression(source, error=KEYWORD_ERROR)
+            elif kind in (OPERATOR, RPAREN):
+                return CompiledExpression(source, error=EXPRESSION_ERROR)
+            else:
+                return CompiledExpression(source, error=TOKEN_ERROR)
+
+            operands.append(node)
+            program.append(node)
+            expect_operand = False
+        else:
+            if kind == OPERATOR:
+                # Pop operators with greater or equal precedence (left associative)
+                precedence = PRECEDENCE[token.text]
+                while operators and operators[-1] != '(' and PRECEDENCE[operators[-1]] >= precedence:
+                    reduce(operators.pop())
+                operators.append(token.text)
+                expect_operand = True
+            elif kind == RPAREN:
+                while operators and operators[-1] != '(':
+                    reduce(operators.pop())
+                if not operators:
+                    return CompiledExpression(source, error=PARENTHESIS_ERROR)
+                operators.pop()
+            elif kind == KEYWORD:
+                return CompiledExpression(source, error=KEYWORD_ERROR)
+            elif kind in (NUMBER, NAME, LPAREN):
+                # Two operands in a row, e.g. "1 2" or "a (b)"
+                return CompiledExpression(source, error=EXPRESSION_ERROR)
+            else:
+                return CompiledExpression(source, error=TOKEN_ERROR)
+
+    if expect_operand:
+        # Empty expression or a dangling operator
+        return CompiledExpression(source, error=EXPRESSION_ERROR)
+
+    while operators:
+        op = operators.pop()
+        if op == '(':
+            return CompiledExpression(source, error=PARENTHESIS_ERROR)
+        reduce(op)
+
+    return CompiledExpression(
+        source,
+        root=operands[-1],
+        program=tuple(program),
+        names=tuple(slots),
+        literal_types=frozenset(literal_types),
+    )
+
+# Normalized source -> CompiledExpression, least recently used first
+_cache = OrderedDict()
+_hits = 0
+_misses = 0
+
+def compile_expression(source: str, tokens=None) -> CompiledExpression:
+    """
+    Return the compiled form of an expression, parsing it only on the first use.
+
+    Compiled expressions hold variable slots rather than values, so a cached
+    entry stays valid no matter how the symbol table changes. New entries
+    are optimized once (see `optimizer.optimize`) before being cached.
+
+    Args:
+        source (str): The infix expression.
+        tokens (tuple/None): The already lexed tokens of `source`, if available.
+
+    Returns:
+        CompiledExpression: The (possibly cached) compiled expression.
+    """
+    global _hits, _misses
+    key = normalize(source)
+    compiled = _cache.get(key)
+    if compiled is not None:
+        _hits += 1
+        try:
+            _cache.move_to_end(key)
+        except KeyError:
+            # Evicted by another thread in the meantime; the entry is still valid
+            pass
+        return compiled
+
+    _misses += 1
+    if tokens is None:
+        tokens = tokenize(key)
+    compiled = parse(key, tokens)
+    if OPTIMIZE:
+        compiled = optimize(compiled)
+    _cache[key] = compiled
+    if len(_cache) > CACHE_SIZE:
+        try:
+            _cache.popitem(last=False)
+        except KeyError:
+            # Emptied by another thread (see `clear_cache`)
+            pass
+    return compiled
+
+def cache_info():
+    """
+    Report statistics of the compiled-expression cache.
+
+    Returns:
+        dict: The number of hits, misses and cached expressions.
+    """
+    return {"hits": _hits, "misses": _misses, "size": len(_cache), "maxsize": CACHE_SIZE}
+
+def clear_cache():
+    """Drop every compiled expression and reset the cache statistics."""
+    global _hits, _misses
+    _cache.clear()
+    _hits = 0
+    _misses = 0
\ No newline at end of file
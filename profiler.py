@@ -0,0 +1,162 @@
+# === profiler.py ===
+
+from io_handler import COMMAND_NAMES
+from stats import Stats
+
+# Pipeline stages recorded by the interpreter -> phases of the profile, in pipeline order
+PHASES = {"classify": "classify", "validate": "validate", "compile": "parse", "evaluate": "evaluate"}
+
+# Lines shown by `Profiler.profile_report` (the most expensive ones)
+REPORT_LINES = 20
+
+class LineProfile:
+    """
+    Time and hit count of one SNOL source line.
+    """
+
+    __slots__ = ("hits", "command_type", "total", "own", "phases")
+
+    def __init__(self, command_type):
+        """
+        Initialize an empty line profile.
+
+        Args:
+            command_type (int): The code returned by `io_handler.commands()` for the line.
+        """
+        self.hits = 0
+        self.command_type = command_type
+        self.total = 0.0  # Including the lines it ran (the body of a REPEAT block)
+        self.own = 0.0    # Excluding them
+        self.phases = dict.fromkeys(PHASES.values(), 0.0)
+
+class Profiler(Stats):
+    """
+    Runtime statistics that also attribute time to the lines of a SNOL script.
+
+    Every executed command is a frame, opened by `begin_command` and closed
+    by `record_command`; the commands run by a REPEAT block are frames
+    inside the frame of that block. The time of each frame is split into the
+    pipeline phases recorded while it is open (classify, validate, parse,
+    evaluate) and the rest of the command ("other"). A `Profiler` is attached
+    like `Stats` (`interpreter.stats = Profiler()`), so STATS keeps working.
+    """
+
+    def __init__(self):
+        """Initialize an empty profile."""
+        super().__init__()
+        self.lines = {}   # (line number, text) -> LineProfile
+        self.stacks = {}  # Collapsed stack -> seconds spent in it (not in its children)
+        self.frames = []  # Open frames: [key, label, time in children, time in phases]
+
+    def begin_command(self, text, line_number=None):
+        """
+        Open the frame of a command.
+
+        Args:
+            text (str): The command.
+            line_number (int/None): Its line in the script, if known.
+        """
+        label = text.replace(";", ",")
+        if line_number is not None:
+            label = f"{line_number}: {label}"
+        if self.frames:
+            label = f"{self.frames[-1][1]};{label}"
+        self.frames.append([(line_number, text), label, 0.0, {}])
+
+    def record_command(self, command_type, seconds, error=None):
+        super().record_command(command_type, seconds, error)
+        if not self.frames:
+            return
+        key, label, children, phases = self.frames.pop()
+        if self.frames:
+            self.frames[-1][2] += seconds
+
+        line = self.lines.get(key)
+        if line is None:
+            line = self.lines[key] = LineProfile(command_type)
+        line.hits += 1
+        line.total += seconds
+        line.own += seconds - children
+        stacks = self.stacks
+        other = seconds - children
+        for phase, spent in phases.items():
+            line.phases[phase] += spent
+            stacks[f"{label};{phase}"] = stacks.get(f"{label};{phase}", 0.0) + spent
+            other -= spent
+        stacks[label] = stacks.get(label, 0.0) + max(other, 0.0)
+
+    def record_stage(self, stage, seconds):
+        super().record_stage(stage, seconds)
+        if self.frames:
+            phases = self.frames[-1][3]
+            phase = PHASES.get(stage, stage)
+            phases[phase] = phases.get(phase, 0.0) + seconds
+
+    def profile_report(self, count=REPORT_LINES):
+        """
+        Format the most expensive lines and the time per command type.
+
+        Args:
+            count (int): Number of lines to show.
+
+        Returns:
+            list: The lines of the report.
+        """
+        lines = sorted(self.lines.items(), key=lambda item: -item[1].own)
+        total = sum(line.own for _, line in lines)
+        report = [f"SNOL> Profile: {sum(line.hits for _, line in lines)} commands, {total * 1e3:.3f}ms, "
+                  f"most expensive lines first (ms)",
+                  f"{'line':>6} {'hits':>9} {'total':>10} {'self':>10} {'self%':>6} "
+                  + " ".join(f"{phase:>9}" for phase in PHASES.values()) + f" {'other':>9}  command"]
+        for (line_number, text), line in lines[:count]:
+            other = line.own - sum(line.phases.values())
+            share = line.own / total * 100 if total > 0 else 0.0
+            report.append(f"{line_number if line_number is not None else '-':>6} {line.hits:9d} "
+                          f"{line.total * 1e3:10.3f} {line.own * 1e3:10.3f} {share:5.1f}% "
+                          + " ".join(f"{spent * 1e3:9.3f}" for spent in line.phases.values())
+                          + f" {max(other, 0.0) * 1e3:9.3f}  {text}")
+        if len(lines) > count:
+            report.append(f"{'':>6} ... {len(lines) - count} more lines")
+
+        by_type = {}
+        for _, line in lines:
+            hits, spent = by_type.get(line.command_type, (0, 0.0))
+            by_type[line.command_type] = (hits + line.hits, spent + line.own)
+        report.append("SNOL> Time by command type (ms, excluding the commands they ran)")
+        for command_type, (hits, spent) in sorted(by_type.items(), key=lambda item: -item[1][1]):
+            report.append(f"{COMMAND_NAMES.get(command_type, str(command_type)):>12} {hits:9d} {spent * 1e3:10.3f}")
+        return report
+
+    def collapsed_stacks(self):
+        """
+        Return the profile in the collapsed-stack format of flame graph tools.
+
+        Each line is the frames of a stack separated by ';' (a command, the
+        commands it ran, then a phase) and the time spent there in microseconds.
+
+        Returns:
+            list: The lines, most expensive stacks first.
+        """
+        stacks = sorted(self.stacks.items(), key=lambda item: -item[1])
+        return [f"{stack} {round(seconds * 1e6)}" for stack, seconds in stacks if round(seconds * 1e6) > 0]
+
+    def write_collapsed(self, path):
+        """
+        Write the collapsed stacks to a file (e.g. for flamegraph.pl or speedscope).
+
+        Args:
+            path (str): The file to write.
+
+        Returns:
+            int: The number of stacks written.
+        """
+        lines = self.collapsed_stacks()
+        with open(path, "w", encoding="utf-8") as output:
+            output.writelines(f"{line}\n" for line in lines)
+        return len(lines)
+
+    def reset(self):
+        super().reset()
+        self.lines.clear()
+        self.stacks.clear()
+        self.frames.clear()
@@ -0,0 +1,98 @@
+# === result_cache.py ===
+
+from collections import OrderedDict
+
+# Number of expressions whose result is kept per symbol table
+CACHE_SIZE = 1024
+
+class ResultCache:
+    """
+    A bounded LRU cache of expression results.
+
+    Results are looked up by the expression together with the versions of
+    the variables it reads (see `SymbolTable.version`). Versions only grow,
+    so a result computed for older versions can never be used again: the
+    cache keeps one result per expression, and storing a new one replaces
+    the stale one instead of letting it age out. Vector results are not
+    cached (see `tokenizer.evaluate_expression`).
+
+    A table shared between threads shares its cache: every operation is a
+    single step on the underlying dictionary, and an entry that another
+    thread evicts in the meantime is simply missed (the hit and miss counters
+    may drop an update under contention).
+    """
+
+    def __init__(self, maxsize=CACHE_SIZE):
+        """
+        Initialize an empty cache.
+
+        Args:
+            maxsize (int): The number of expressions to keep a result for (0 disables the cache).
+        """
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Look up a result.
+
+        Args:
+            key (tuple): The expression and the versions of its variables.
+
+        Returns:
+            The cached result, or None if there is none.
+        """
+        source, versions = key
+        entry = self.entries.get(source)
+        if entry is None or entry[0] != versions:
+            self.misses += 1
+            return None
+        self.hits += 1
+        try:
+            self.entries.move_to_end(source)
+        except KeyError:
+            # Evicted by another thread since it was read
+            pass
+        return entry[1]
+
+    def put(self, key, result):
+        """
+        Store a result, replacing the one of the same expression for older versions
+        and evicting the least recently used one if the cache is full.
+
+        Args:
+            key (tuple): The expression and the versions of its variables.
+            result: The value (or EvalError) the expression evaluated to.
+        """
+        if self.maxsize <= 0:
+            return
+        source, versions = key
+        self.entries[source] = (versions, result)
+        try:
+            self.entries.move_to_end(source)
+        except KeyError:
+            # Evicted by another thread in the meantime
+            pass
+        if len(self.entries) > self.maxsize:
+            try:
+                self.entries.popitem(last=False)
+            except KeyError:
+                # Emptied by another thread in the meantime
+                pass
+
+    def info(self):
+        """
+        Report statistics of the cache.
+
+        Returns:
+            dict: The number of hits, misses and cached results.
+        """
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.entries), "maxsize": self.maxsize}
+
+    def clear(self):
+        """Drop every cached result and reset the statistics."""
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
\ No newline at end of file
@@ -0,0 +1,240 @@
+# === runner.py ===
+
+import argparse
+import os
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from interpreter import Interpreter, STATUS_ERROR, STATUS_EXIT
+from input_provider import ScriptInput
+from shared_table import SharedVariables, SharedSymbolTable
+from snapshot import read_snapshot
+
+# Reference variables shared by every script of this process (see `attach_shared`)
+shared_variables = None
+
+class ScriptResult(namedtuple("ScriptResult", ["path", "exit_code", "output", "lines", "errors", "seconds"])):
+    """
+    The outcome of one script run by the bulk runner.
+
+    Attributes:
+        path (str): The script that was run.
+        exit_code (int): 0 if every command succeeded, 1 if some failed, 2 if the script could not be read.
+        output (str): Everything the script printed, in order.
+        lines (int): Number of commands executed.
+        errors (int): Number of commands that failed.
+        seconds (float): Time spent running the script in the worker.
+    """
+    __slots__ = ()
+
+def run_script_file(path):
+    """
+    Run one SNOL script in a fresh interpreter session.
+
+    As with a script piped through main.py, BEG reads its value from the
+    next line of the script (see `input_provider.ScriptInput`).
+
+    Args:
+        path (str): The script to run.
+
+    Returns:
+        ScriptResult: The outcome of the script.
+    """
+    start = time.perf_counter()
+    output = []
+    executed = 0
+    errors = 0
+    try:
+        with open(path, encoding="utf-8") as stream:
+            script = ScriptInput(stream)
+            table = SharedSymbolTable(shared_variables) if shared_variables is not None else None
+            interpreter = Interpreter(symbol_table=table, read=script)
+            for _, line in script.lines():
+                executed += 1
+                result = interpreter.execute(line)
+                output.extend(result.output)
+                if result.status == STATUS_EXIT:
+                    break
+                if result.status == STATUS_ERROR:
+                    errors += 1
+            else:
+                result = interpreter.finish()
+                if result is not None:
+                    output.extend(result.output)
+                    errors += 1
+    except (OSError, UnicodeDecodeError) as error:
+        output.append(f"SNOL> Error! Cannot read script: {error}")
+        return ScriptResult(path, 2, "\n".join(output), executed, errors + 1, time.perf_counter() - start)
+
+    exit_code = 1 if errors else 0
+    return ScriptResult(path, exit_code, "\n".join(output), executed, errors, time.perf_counter() - start)
+
+def attach_shared(name):
+    """
+    Attach a worker process to the shared reference variables (pool initializer).
+
+    Args:
+        name (str): The shared memory segment published by the parent.
+    """
+    global shared_variables
+    shared_variables = SharedVariables.attach(name, worker=True)
+
+def run_scripts(paths, workers=None, chunksize=None, shared=None):
+    """
+    Run many independent scripts in parallel on a pool of worker processes.
+
+    The workers are started once and reused for every script; scripts are
+    handed out in chunks to keep inter-process traffic low. Results come back
+    in the order of `paths`, whatever order the workers finish in.
+
+    Args:
+        paths (list): The scripts to run.
+        workers (int/None): Number of worker processes (defaults to the CPU count).
+        chunksize (int/None): Scripts sent to a worker at a time (chosen automatically by default).
+        shared (SharedVariables/None): Reference variables every script starts with; the
+            workers attach to them instead of copying them.
+
+    Yields:
+        ScriptResult: The outcome of each script, in input order.
+    """
+    workers = workers or os.cpu_count() or 1
+    if chunksize is None:
+        chunksize = max(1, len(paths) // (workers * 8))
+    global shared_variables
+    if workers == 1:
+        # No pool needed; avoids the process start-up cost
+        shared_variables = shared
+        try:
+            yield from map(run_script_file, paths)
+        finally:
+            shared_variables = None
+        return
+    initializer, initargs = (attach_shared, (shared.name,)) if shared is not None else (None, ())
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as pool:
+        yield from pool.map(run_script_file, paths, chunksize=chunksize)
+
+def summarize(results, seconds):
+    """
+    Aggregate the results of a bulk run.
+
+    Args:
+        results (list): The ScriptResult of every script.
+        seconds (float): Wall time of the whole run.
+
+    Returns:
+        dict: Script, line and error counts, failed scripts and throughput.
+    """
+    lines = sum(result.lines for result in results)
+    return {
+        "scripts": len(results),
+        "failed": [result.path for result in results if result.exit_code != 0],
+        "lines": lines,
+        "errors": sum(result.errors for result in results),
+        "seconds": seconds,
+        "scripts_per_sec": len(results) / seconds if seconds > 0 else float("inf"),
+        "lines_per_sec": lines / seconds if seconds > 0 else float("inf"),
+    }
+
+def measure_scaling(paths, max_workers, shared=None):
+    """
+    Run the same scripts with 1, 2, 4, ... workers and report the throughput of each.
+
+    Args:
+        paths (list): The scripts to run.
+        max_workers (int): The largest worker count to try.
+        shared (SharedVariables/None): Reference variables every script starts with.
+
+    Returns:
+        list: (workers, summary) pairs.
+    """
+    counts = []
+    workers = 1
+    while workers < max_workers:
+        counts.append(workers)
+        workers *= 2
+    counts.append(max_workers)
+
+    measurements = []
+    for workers in counts:
+        start = time.perf_counter()
+        results = list(run_scripts(paths, workers, shared=shared))
+        measurements.append((workers, summarize(results, time.perf_counter() - start)))
+    return measurements
+
+def main(argv=None):
+    """
+    Command-line entry point of the bulk runner.
+
+    Args:
+        argv (list/None): The command-line arguments (defaults to sys.argv).
+
+    Returns:
+        int: 0 if every script succeeded, 1 otherwise.
+    """
+    arguments = argparse.ArgumentParser(description="Run many SNOL scripts in parallel.")
+    arguments.add_argument("scripts", nargs="+", help="SNOL scripts to run")
+    arguments.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    arguments.add_argument("--chunksize", type=int, default=None, help="scripts handed to a worker at a time")
+    arguments.add_argument("--quiet", action="store_true", help="do not print the output of the scripts")
+    arguments.add_argument("--shared", metavar="SNAPSHOT",
+                           help="start every script with the variables of SNAPSHOT, shared by the workers")
+    arguments.add_argument("--scaling", action="store_true",
+                           help="measure throughput for 1, 2, 4, ... up to --workers workers")
+    args = arguments.parse_args(argv)
+    workers = args.workers or os.cpu_count() or 1
+
+    shared = None
+    if args.shared is not None:
+        try:
+            shared = SharedVariables.publish(read_snapshot(args.shared))
+        except (OSError, ValueError) as error:
+            print(f"SNOL> Error! Cannot share [{args.shared}]: {error}", file=sys.stderr)
+            return 2
+    try:
+        return run_selected(args, workers, shared)
+    finally:
+        if shared is not None:
+            shared.unlink()
+
+def run_selected(args, workers, shared):
+    """
+    Run the scripts (or the scaling measurement) selected on the command line.
+
+    Args:
+        args (argparse.Namespace): The parsed arguments.
+        workers (int): Number of worker processes.
+        shared (SharedVariables/None): Reference variables every script starts with.
+
+    Returns:
+        int: 0 if every script succeeded, 1 otherwise.
+    """
+    if args.scaling:
+        baseline = None
+        print("workers  scripts/sec    lines/sec  speedup")
+        for count, summary in measure_scaling(args.scripts, workers, shared):
+            baseline = baseline or summary["scripts_per_sec"]
+            print(f"{count:7d}  {summary['scripts_per_sec']:11,.1f}  {summary['lines_per_sec']:11,.0f}"
+                  f"  {summary['scripts_per_sec'] / baseline:6.2f}x")
+        return 0
+
+    start = time.perf_counter()
+    results = []
+    for result in run_scripts(args.scripts, workers, args.chunksize, shared):
+        results.append(result._replace(output=""))
+        if not args.quiet:
+            print(f"==> {result.path} <==")
+            if result.output:
+                print(result.output)
+    summary = summarize(results, time.perf_counter() - start)
+
+    for path in summary["failed"]:
+        print(f"SNOL> Failed: {path}", file=sys.stderr)
+    print(f"SNOL> Ran {summary['scripts']} scripts ({summary['lines']} lines) with {workers} workers "
+          f"in {summary['seconds']:.3f}s ({summary['scripts_per_sec']:,.1f} scripts/sec, "
+          f"{summary['lines_per_sec']:,.0f} lines/sec), {summary['errors']} errors.", file=sys.stderr)
+    return 1 if summary["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
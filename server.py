@@ -0,0 +1,504 @@
+# === server.py ===
+
+import argparse
+import asyncio
+import functools
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from interpreter import Interpreter, STATUS_EXIT
+from io_handler import commands, syntax_validation
+from tokenizer import begin_input, store_input
+
+BANNER = "The SNOL environment is now active, you may proceed with giving your commands."
+
+# Prompts end every response, so a client knows when the output of a command is complete
+COMMAND_PROMPT = "Command: "
+INPUT_PROMPT = "Input: "
+
+# Longest command line accepted from a client (bytes)
+LINE_LIMIT = 1 << 16
+
+# SAVE and LOAD would give clients access to the server's files
+FILE_COMMANDS = (8, 9)
+
+# Threads that run the commands of all connections (sized like the default executor)
+COMMAND_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+# Seconds a command may run before its REPEAT loop is cancelled
+COMMAND_TIMEOUT = 10.0
+
+# Seconds between two checks that the client of a running command is still connected
+DISCONNECT_POLL = 0.1
+
+# Tasks of the connections being served by this process
+active_connections = set()
+
+# Watchdog tasks of the command pools of the running servers (see `CommandPool.watch`)
+watchdogs = set()
+
+class CommandPool:
+    """
+    The threads that run the commands of a server's connections.
+
+    A watchdog on the event loop looks at the running commands every
+    `DISCONNECT_POLL` seconds and cancels the REPEAT loop of one that has
+    outlived the time limit or whose client has disconnected (see
+    `Interpreter.cancel`), so no client can hold a thread forever.
+    """
+
+    def __init__(self, workers=COMMAND_WORKERS, timeout=COMMAND_TIMEOUT):
+        """
+        Initialize the pool (its threads start on demand).
+
+        Args:
+            workers (int): Threads that run commands.
+            timeout (float): Seconds a command may run before its REPEAT loop is cancelled.
+        """
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="snol-command")
+        self.timeout = timeout
+        self.running = {}  # Connection -> deadline (event loop time) of its running command
+
+    async def run(self, connection, line):
+        """
+        Execute a command of a connection on the pool.
+
+        Args:
+            connection (Connection): The connection that sent the command.
+            line (str): The command.
+
+        Returns:
+            CommandResult: The outcome of the command.
+        """
+        loop = asyncio.get_running_loop()
+        interpreter = connection.interpreter
+        interpreter.cancel.clear()
+        self.running[connection] = loop.time() + self.timeout
+        try:
+            return await loop.run_in_executor(self.executor, interpreter.execute, line)
+        finally:
+            del self.running[connection]
+            # Also stops the command if the connection's task is cancelled (server shutdown)
+            interpreter.cancel.set()
+
+    async def watch(self, server):
+        """
+        Cancel the commands that run too long or lost their client, until the
+        server is closed; then stop the threads.
+
+        Args:
+            server (asyncio.Server): The server whose connections use the pool.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            while server.is_serving():
+                await asyncio.sleep(DISCONNECT_POLL)
+                now = loop.time()
+                for connection, deadline in list(self.running.items()):
+                    if now >= deadline or connection.disconnected():
+                        connection.interpreter.cancel.set()
+        finally:
+            for connection in list(self.running):
+                connection.interpreter.cancel.set()
+            self.executor.shutdown(wait=False)
+
+class Connection:
+    """
+    One client of the server: its own interpreter (and symbol table) plus the
+    stream it talks over.
+
+    The protocol is the REPL itself: the server sends the banner and
+    `COMMAND_PROMPT`; the client sends one command per line and receives its
+    output followed by the next prompt. BEG sends `INPUT_PROMPT` and waits
+    for the value on the next line, without blocking other connections; it is
+    refused inside a REPEAT block, whose body runs without the client. Every
+    other command runs on the server's `CommandPool`, one at a time per
+    connection, so a slow command only delays its own client.
+    """
+
+    def __init__(self, reader, writer, pool):
+        """
+        Initialize the connection.
+
+        Args:
+            reader (asyncio.StreamReader): The incoming side of the connection.
+            writer (asyncio.StreamWriter): The outgoing side of the connection.
+            pool (CommandPool): The threads that run the commands.
+        """
+        self.reader = reader
+        self.writer = writer
+        self.pool = pool
+        self.interpreter = Interpreter(read=self.no_input)
+        # Set by the pool to stop the REPEAT loop of the running command
+        self.interpreter.cancel = threading.Event()
+
+    @staticmethod
+    def no_input(prompt):
+        # BEG is handled by `run_beg`; nothing else reads input
+        raise EOFError("No input left for BEG.")
+
+    def send(self, lines, prompt=None):
+        """
+        Queue output lines (and optionally a prompt) for the client.
+
+        Args:
+            lines (iterable): The lines to send.
+            prompt (str/None): A prompt to send after the lines, without a newline.
+        """
+        text = "".join(f"{line}\n" for line in lines)
+        if prompt is not None:
+            text += prompt
+        if text:
+            self.writer.write(text.encode("utf-8"))
+
+    async def readline(self):
+        """
+        Read one line from the client.
+
+        Returns:
+            str/None: The line without its line ending, or None if the client is gone.
+        """
+        try:
+            line = await self.reader.readline()
+        except (asyncio.LimitOverrunError, ValueError):
+            self.send(["SNOL> Error! Line too long."])
+            return None
+        except ConnectionError:
+            return None
+        if not line:
+            return None
+        return line.decode("utf-8", errors="replace").rstrip("\r\n")
+
+    async def run_beg(self, line):
+        """
+        Execute a BEG command, reading its value from the client.
+
+        Args:
+            line (str): The BEG command.
+
+        Returns:
+            bool: False if the client disconnected while the value was awaited.
+        """
+        interpreter = self.interpreter
+        interpreter.output = []
+        var_name = None
+        if syntax_validation(line, 1, interpreter.write):
+            var_name = begin_input(line, interpreter)
+        if var_name is None:
+            self.send(interpreter.output, COMMAND_PROMPT)
+            return True
+
+        self.send(interpreter.output, INPUT_PROMPT)
+        await self.writer.drain()
+        value = await self.readline()
+        if value is None:
+            return False
+        interpreter.output = []
+        store_input(var_name, value.strip(), interpreter)
+        self.send(interpreter.output, COMMAND_PROMPT)
+        return True
+
+    def disconnected(self):
+        """
+        Check if the client is gone.
+
+        Returns:
+            bool: True once the client closed its side of the connection.
+        """
+        return self.reader.at_eof() or self.writer.is_closing()
+
+    async def serve(self):
+        """Run the session until the client sends EXIT! or disconnects."""
+        self.send([BANNER], COMMAND_PROMPT)
+        try:
+            while True:
+                await self.writer.drain()
+                line = await self.readline()
+                if line is None:
+                    break
+                line = line.strip()
+                if not line:
+                    self.send([], COMMAND_PROMPT)
+                    continue
+
+                command_type = commands(line)
+                if command_type == 1 and self.interpreter.blocks:
+                    # The loop body runs in one go, without waiting for the client between commands
+                    self.send(["SNOL> Error! BEG is not available inside a REPEAT block over the network."],
+                              COMMAND_PROMPT)
+                    continue
+                if command_type == 1:
+                    if not await self.run_beg(line):
+                        break
+                    continue
+                if command_type in FILE_COMMANDS:
+                    self.send(["SNOL> Error! SAVE and LOAD are not available over the network."], COMMAND_PROMPT)
+                    continue
+
+                # A long command (a REPEAT block, a big vector) runs on a command thread, so
+                # the event loop keeps serving the other connections meanwhile
+                result = await self.pool.run(self, line)
+                if result.status == STATUS_EXIT:
+                    self.send(result.output)
+                    await self.writer.drain()
+                    break
+                self.send(result.output, COMMAND_PROMPT)
+        except ConnectionError:
+            pass
+        finally:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except ConnectionError:
+                pass
+
+async def handle_connection(reader, writer, pool):
+    """
+    asyncio callback for a new client connection.
+
+    Args:
+        reader (asyncio.StreamReader): The incoming side of the connection.
+        writer (asyncio.StreamWriter): The outgoing side of the connection.
+        pool (CommandPool): The threads that run the commands.
+    """
+    task = asyncio.current_task()
+    active_connections.add(task)
+    try:
+        await Connection(reader, writer, pool).serve()
+    finally:
+        active_connections.discard(task)
+
+async def start_server(host="127.0.0.1", port=7777, unix_path=None, workers=COMMAND_WORKERS,
+                       timeout=COMMAND_TIMEOUT):
+    """
+    Start listening for SNOL clients.
+
+    The commands of every connection run on a `CommandPool`, which is shut
+    down when the server is closed.
+
+    Args:
+        host (str): The address to listen on (TCP).
+        port (int): The port to listen on (TCP).
+        unix_path (str/None): Listen on this Unix socket instead of TCP.
+        workers (int): Threads that run commands.
+        timeout (float): Seconds a command may run before its REPEAT loop is cancelled.
+
+    Returns:
+        asyncio.Server: The running server.
+    """
+    pool = CommandPool(workers, timeout)
+    handler = functools.partial(handle_connection, pool=pool)
+    if unix_path is not None:
+        server = await asyncio.start_unix_server(handler, unix_path, limit=LINE_LIMIT, backlog=4096)
+    else:
+        server = await asyncio.start_server(handler, host, port, limit=LINE_LIMIT, backlog=4096)
+    watchdog = asyncio.get_running_loop().create_task(pool.watch(server))
+    watchdogs.add(watchdog)
+    watchdog.add_done_callback(watchdogs.discard)
+    return server
+
+async def open_client(host, port, unix_path):
+    """
+    Connect to a SNOL server.
+
+    Args:
+        host (str): The server address (TCP).
+        port (int): The server port (TCP).
+        unix_path (str/None): Connect to this Unix socket instead of TCP.
+
+    Returns:
+        tuple: The reader and writer of the connection.
+    """
+    if unix_path is not None:
+        return await asyncio.open_unix_connection(unix_path, limit=LINE_LIMIT)
+    return await asyncio.open_connection(host, port, limit=LINE_LIMIT)
+
+async def client_session(host, port, unix_path, script, latencies):
+    """
+    Run one scripted session against the server (load generator).
+
+    Args:
+        host (str): The server address (TCP).
+        port (int): The server port (TCP).
+        unix_path (str/None): Unix socket of the server, if any.
+        script (list): The commands to send; a BEG command is followed by its value.
+        latencies (list): Receives the latency (seconds) of every command.
+    """
+    reader, writer = await open_client(host, port, unix_path)
+    try:
+        await reader.readuntil(COMMAND_PROMPT.encode())
+        index = 0
+        while index < len(script):
+            line = script[index]
+            start = time.perf_counter()
+            writer.write(f"{line}\n".encode())
+            if line.startswith("BEG"):
+                await reader.readuntil(INPUT_PROMPT.encode())
+                index += 1
+                writer.write(f"{script[index]}\n".encode())
+            await reader.readuntil(COMMAND_PROMPT.encode())
+            latencies.append(time.perf_counter() - start)
+            index += 1
+        writer.write(b"EXIT!\n")
+        await reader.read()
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+async def open_idle_session(host, port, unix_path):
+    """
+    Open a session that sends no commands (load generator).
+
+    Args:
+        host (str): The server address (TCP).
+        port (int): The server port (TCP).
+        unix_path (str/None): Unix socket of the server, if any.
+
+    Returns:
+        asyncio.StreamWriter: The connection, to be closed by the caller.
+    """
+    reader, writer = await open_client(host, port, unix_path)
+    await reader.readuntil(COMMAND_PROMPT.encode())
+    return writer
+
+# Commands sent by every load-generator session (a BEG command is followed by its value)
+LOAD_SCRIPT = ["BEG x", "5", "y = x * 2 + 1", "z = (x + y) * (x - y) % 7", "PRINT z", "x + y * 3"]
+
+async def generate_load(host, port, unix_path, sessions, concurrency, idle):
+    """
+    Open many client sessions against a server and measure its throughput.
+
+    Args:
+        host (str): The server address (TCP).
+        port (int): The server port (TCP).
+        unix_path (str/None): Unix socket of the server, if any.
+        sessions (int): Number of scripted sessions to run.
+        concurrency (int): Scripted sessions running at the same time.
+        idle (int): Connections kept open and idle during the run.
+
+    Returns:
+        dict: Sessions, commands, elapsed seconds, sessions/sec and latency percentiles.
+    """
+    idlers = await asyncio.gather(*(open_idle_session(host, port, unix_path) for _ in range(idle)))
+
+    latencies = []
+    limit = asyncio.Semaphore(concurrency)
+
+    async def limited():
+        async with limit:
+            await client_session(host, port, unix_path, LOAD_SCRIPT, latencies)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(limited() for _ in range(sessions)))
+    elapsed = time.perf_counter() - start
+
+    for writer in idlers:
+        writer.close()
+    await asyncio.gather(*(writer.wait_closed() for writer in idlers), return_exceptions=True)
+
+    latencies.sort()
+    def percentile(fraction):
+        return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] if latencies else 0.0
+
+    return {
+        "sessions": sessions,
+        "idle": idle,
+        "commands": len(latencies),
+        "seconds": elapsed,
+        "sessions_per_sec": sessions / elapsed if elapsed > 0 else float("inf"),
+        "p50": percentile(0.50),
+        "p99": percentile(0.99),
+    }
+
+async def serve_forever(host, port, unix_path, workers=COMMAND_WORKERS, timeout=COMMAND_TIMEOUT):
+    """
+    Run the server until it is interrupted.
+
+    Args:
+        host (str): The address to listen on (TCP).
+        port (int): The port to listen on (TCP).
+        unix_path (str/None): Listen on this Unix socket instead of TCP.
+        workers (int): Threads that run commands.
+        timeout (float): Seconds a command may run before its REPEAT loop is cancelled.
+    """
+    server = await start_server(host, port, unix_path, workers, timeout)
+    where = unix_path or f"{host}:{port}"
+    print(f"SNOL> Serving on {where}", file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+async def run_load(host, port, unix_path, sessions, concurrency, idle, local):
+    """
+    Run the load generator, optionally against a server started in this process.
+
+    Args:
+        host (str): The server address (TCP).
+        port (int): The server port (TCP).
+        unix_path (str/None): Unix socket of the server, if any.
+        sessions (int): Number of scripted sessions to run.
+        concurrency (int): Scripted sessions running at the same time.
+        idle (int): Connections kept open and idle during the run.
+        local (bool): Start a server in this process first.
+
+    Returns:
+        dict: The measurements (see `generate_load`).
+    """
+    server = await start_server(host, port, unix_path) if local else None
+    try:
+        return await generate_load(host, port, unix_path, sessions, concurrency, idle)
+    finally:
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+            # Let the sessions that are still closing finish before the loop stops
+            if active_connections:
+                await asyncio.wait(set(active_connections), timeout=5)
+
+def main(argv=None):
+    """
+    Command-line entry point: run the server or the load generator.
+
+    Args:
+        argv (list/None): The command-line arguments (defaults to sys.argv).
+
+    Returns:
+        int: The exit code.
+    """
+    arguments = argparse.ArgumentParser(description="SNOL network server and load generator.")
+    subcommands = arguments.add_subparsers(dest="mode", required=True)
+    for name, help_text in (("serve", "serve SNOL sessions over TCP or a Unix socket"),
+                            ("load", "measure sessions/sec and command latency of a server")):
+        mode = subcommands.add_parser(name, help=help_text)
+        mode.add_argument("--host", default="127.0.0.1")
+        mode.add_argument("--port", type=int, default=7777)
+        mode.add_argument("--unix", default=None, help="Unix socket path (instead of TCP)")
+        if name == "serve":
+            mode.add_argument("--workers", type=int, default=COMMAND_WORKERS, help="threads that run commands")
+            mode.add_argument("--timeout", type=float, default=COMMAND_TIMEOUT,
+                              help="seconds a command may run before its REPEAT loop is cancelled")
+        if name == "load":
+            mode.add_argument("--sessions", type=int, default=2000, help="scripted sessions to run")
+            mode.add_argument("--concurrency", type=int, default=200, help="scripted sessions at a time")
+            mode.add_argument("--idle", type=int, default=0, help="idle connections held open during the run")
+            mode.add_argument("--local", action="store_true", help="start a server in this process")
+    args = arguments.parse_args(argv)
+
+    if args.mode == "serve":
+        try:
+            asyncio.run(serve_forever(args.host, args.port, args.unix, args.workers, args.timeout))
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    result = asyncio.run(run_load(args.host, args.port, args.unix, args.sessions, args.concurrency,
+                                  args.idle, args.local))
+    print(f"SNOL> {result['sessions']} sessions ({result['commands']} commands, {result['idle']} idle connections) "
+          f"in {result['seconds']:.3f}s: {result['sessions_per_sec']:,.1f} sessions/sec, "
+          f"p50 {result['p50'] * 1e3:.2f}ms, p99 {result['p99'] * 1e3:.2f}ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
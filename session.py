@@ -0,0 +1,25 @@
+# === session.py ===
+
+class Session:
+    """
+    The state a SNOL program runs against: its variables, its input and its output.
+
+    The command handlers in `tokenizer` receive a session instead of using
+    globals, so several sessions can run in one process without sharing state.
+    """
+
+    def __init__(self, symbol_table, read=input, write=print):
+        """
+        Initialize the session.
+
+        Args:
+            symbol_table (SymbolTable): The variables of the session.
+            read (callable): Returns one line of input for a prompt (used by BEG);
+                raises EOFError when no input is left.
+            write (callable): Receives each line of output.
+        """
+        self.symbol_table = symbol_table
+        self.read = read
+        self.write = write
+        # Runtime statistics (a `stats.Stats`), or None when they are off
+        self.stats = None
\ No newline at end of file
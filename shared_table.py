@@ -0,0 +1,356 @@
+# === shared_table.py ===
+
+import os
+import struct
+import zlib
+from array import array
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+from io_handler import format_value
+from symbol_table import SymbolTable
+from snapshot import write_snapshot, padding, INT64_MIN, INT64_MAX
+
+# Layout of a shared variable set (native byte order, every section 8-byte aligned):
+#   header   magic, format version, variable count, hash slots, size of the names
+#   slots    the name index: one int64 per slot, the variable index or -1 (open addressing)
+#   offsets  count + 1 int64 offsets of each name in the names section
+#   cells    one 8-byte cell per variable, read as int64 or float64 depending on its kind
+#   kinds    one byte per variable: 'q' (int64) or 'd' (float64)
+#   names    the variable names, back to back (ASCII)
+MAGIC = b"SNOS"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("=4sHxxQQQ")
+INT_KIND = ord("q")
+FLOAT_KIND = ord("d")
+
+def name_hash(key):
+    """
+    Hash a variable name the same way in every process.
+
+    (`hash()` of a str is salted per process, so it cannot index shared data.)
+
+    Args:
+        key (bytes): The ASCII name.
+
+    Returns:
+        int: The hash.
+    """
+    return zlib.crc32(key)
+
+class SharedVariables:
+    """
+    An immutable set of int64/float64 variables in shared memory.
+
+    One process publishes the set (`publish`); any number of processes
+    attach to it by name (`attach`) and read the values in place: attaching
+    maps the segment and reads its header, whatever the number of variables,
+    and the pages are shared by every process instead of being copied.
+    Names are found through a hash index stored in the segment itself.
+    """
+
+    def __init__(self, memory, owner=False):
+        """
+        Wrap an open shared memory segment (use `publish` or `attach`).
+
+        Args:
+            memory (SharedMemory): The segment.
+            owner (bool): True in the process that published it (and unlinks it).
+
+        Raises:
+            ValueError: If the segment does not hold a SNOL variable set.
+        """
+        self.memory = memory
+        self.owner = owner
+        view = memory.buf
+        if len(view) < HEADER.size:
+            raise ValueError("Not a SNOL shared variable set.")
+        magic, version, self.count, self.slot_count, names_size = HEADER.unpack_from(view)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("Not a SNOL shared variable set.")
+
+        offset = HEADER.size
+        self.slots = view[offset:offset + 8 * self.slot_count].cast("q")
+        offset += 8 * self.slot_count
+        self.offsets = view[offset:offset + 8 * (self.count + 1)].cast("q")
+        offset += 8 * (self.count + 1)
+        cells = view[offset:offset + 8 * self.count]
+        self.ints = cells.cast("q")
+        self.floats = cells.cast("d")
+        offset += 8 * self.count
+        self.kinds = view[offset:offset + self.count]
+        offset += self.count + len(padding(self.count))
+        self.names = view[offset:offset + names_size]
+        self.mask = self.slot_count - 1
+
+    @property
+    def name(self):
+        """str: The name of the shared memory segment (what `attach` needs)."""
+        return self.memory.name
+
+    @classmethod
+    def publish(cls, variables, name=None):
+        """
+        Copy variables into a new shared memory segment.
+
+        Args:
+            variables (dict): Variable names and their values (ints that fit in 64 bits, or floats).
+            name (str/None): The segment name (a unique one is chosen by default).
+
+        Returns:
+            SharedVariables: The published set; call `unlink` when no process needs it anymore.
+
+        Raises:
+            ValueError: If a value is not an int64 or a float.
+        """
+        count = len(variables)
+        keys = []
+        cells = bytearray(8 * count)
+        kinds = bytearray(count)
+        with memoryview(cells) as view, view.cast("q") as ints, view.cast("d") as floats:
+            for index, (variable, value) in enumerate(variables.items()):
+                value_type = type(value)
+                if value_type is int and INT64_MIN <= value <= INT64_MAX:
+                    ints[index] = value
+                    kinds[index] = INT_KIND
+                elif value_type is float:
+                    floats[index] = value
+                    kinds[index] = FLOAT_KIND
+                else:
+                    raise ValueError(f"Cannot share [{variable}]: only int64 and float values can be shared.")
+                keys.append(variable.encode("ascii"))
+
+        slot_count = 1
+        while slot_count < 2 * count:
+            slot_count *= 2
+        mask = slot_count - 1
+        slots = array("q", [-1]) * slot_count
+        offsets = array("q", [0])
+        for index, key in enumerate(keys):
+            slot = name_hash(key) & mask
+            while slots[slot] != -1:
+                slot = (slot + 1) & mask
+            slots[slot] = index
+            offsets.append(offsets[-1] + len(key))
+        names = b"".join(keys)
+
+        sections = [HEADER.pack(MAGIC, FORMAT_VERSION, count, slot_count, len(names)),
+                    slots.tobytes(), offsets.tobytes(), cells, kinds + padding(count), names]
+        size = sum(len(section) for section in sections)
+        memory = SharedMemory(name=name, create=True, size=max(size, 1))
+        offset = 0
+        for section in sections:
+            memory.buf[offset:offset + len(section)] = section
+            offset += len(section)
+        return cls(memory, owner=True)
+
+    @classmethod
+    def attach(cls, name, worker=False):
+        """
+        Open a variable set published by another process.
+
+        Args:
+            name (str): The segment name (`SharedVariables.name` in the publisher).
+            worker (bool): The caller is a worker started by the publisher through
+                `multiprocessing`, and so shares its resource tracker.
+
+        Returns:
+            SharedVariables: The attached, read-only set.
+
+        Raises:
+            FileNotFoundError: If no segment has that name.
+            ValueError: If the segment does not hold a SNOL variable set.
+        """
+        try:
+            memory = SharedMemory(name=name, track=False)
+        except TypeError:
+            # Before Python 3.13 (no `track`) every attach is registered with the
+            # resource tracker, which unlinks the segment when the attaching process
+            # exits (CPython gh-82300, bpo-38119). A worker shares the publisher's
+            # tracker, where the registration is harmless and the publisher's
+            # `unlink` withdraws it; any other process withdraws its own. The
+            # tracker knows the segment by its POSIX name.
+            memory = SharedMemory(name=name)
+            if not worker and os.name == "posix":
+                resource_tracker.unregister(f"/{memory.name}", "shared_memory")
+        return cls(memory)
+
+    def index(self, variable):
+        """
+        Find a variable in the name index.
+
+        Args:
+            variable (str): The variable name.
+
+        Returns:
+            int: Its index, or -1 if it is not in the set.
+        """
+        if not self.count:
+            return -1
+        try:
+            key = variable.encode("ascii")
+        except UnicodeEncodeError:
+            return -1
+        slots = self.slots
+        offsets = self.offsets
+        mask = self.mask
+        slot = name_hash(key) & mask
+        while True:
+            index = slots[slot]
+            if index == -1:
+                return -1
+            if self.names[offsets[index]:offsets[index + 1]] == key:
+                return index
+            slot = (slot + 1) & mask
+
+    def value(self, index):
+        """
+        Read the value of a variable in place.
+
+        Args:
+            index (int): The index returned by `index`.
+
+        Returns:
+            int/float: The value.
+        """
+        if self.kinds[index] == INT_KIND:
+            return self.ints[index]
+        return self.floats[index]
+
+    def get(self, variable, default=None):
+        """
+        Read the value of a variable by name.
+
+        Args:
+            variable (str): The variable name.
+            default: Returned if the variable is not in the set.
+
+        Returns:
+            int/float: The value, or `default`.
+        """
+        index = self.index(variable)
+        return self.value(index) if index != -1 else default
+
+    def __len__(self):
+        return self.count
+
+    def items(self):
+        """
+        Iterate over the variables of the set, in publication order.
+
+        Yields:
+            tuple: The name and value of each variable.
+        """
+        names = self.names
+        offsets = self.offsets
+        for index in range(self.count):
+            yield bytes(names[offsets[index]:offsets[index + 1]]).decode("ascii"), self.value(index)
+
+    def close(self):
+        """Detach from the segment (the data stays available to other processes)."""
+        for view in (self.slots, self.offsets, self.ints, self.floats, self.kinds, self.names):
+            view.release()
+        self.memory.close()
+
+    def unlink(self):
+        """Detach and destroy the segment (publisher only)."""
+        self.close()
+        if self.owner:
+            self.memory.unlink()
+
+class SharedSymbolTable(SymbolTable):
+    """
+    A symbol table on top of a shared, read-only variable set.
+
+    Variables are read from the shared set until the session assigns them:
+    assignments go to private overrides (`variables`, as in `SymbolTable`),
+    which hide the shared value in this table only. Shared variables have
+    version 0, so results computed from them stay valid in the result cache.
+
+    Creating a table is cheap: many sessions in one worker can use the same
+    attached set, each with its own overrides.
+    """
+
+    __slots__ = ("shared", "resolved")
+
+    def __init__(self, shared):
+        """
+        Initialize a table with no overrides.
+
+        Args:
+            shared (SharedVariables): The attached variable set.
+        """
+        super().__init__()
+        self.shared = shared
+        # Index (or -1) of the shared names this table has looked up
+        self.resolved = {}
+
+    def shared_index(self, name):
+        """
+        Find a shared variable, remembering the answer for the next lookup.
+
+        Args:
+            name (str): The variable name.
+
+        Returns:
+            int: Its index in the shared set, or -1.
+        """
+        index = self.resolved.get(name)
+        if index is None:
+            index = self.resolved[name] = self.shared.index(name)
+        return index
+
+    def get_variable(self, name):
+        if name in self.variables:
+            return self.variables[name]
+        index = self.shared_index(name)
+        return self.shared.value(index) if index != -1 else None
+
+    def lookup(self, names):
+        variables = self.variables
+        versions = self.versions
+        try:
+            return [variables[name] for name in names], tuple([versions[name] for name in names])
+        except KeyError:
+            pass
+        values = []
+        found = []
+        for name in names:
+            if name in variables:
+                values.append(variables[name])
+                found.append(versions[name])
+                continue
+            index = self.shared_index(name)
+            if index == -1:
+                raise KeyError(name)
+            values.append(self.shared.value(index))
+            found.append(0)
+        return values, tuple(found)
+
+    def version(self, name):
+        return self.versions.get(name, 0)
+
+    def variable_exists(self, name):
+        return name in self.variables or self.shared_index(name) != -1
+
+    def merged(self):
+        """
+        Return every variable of the table: the shared set with the overrides applied.
+
+        Returns:
+            dict: Variable names and their values.
+        """
+        merged = dict(self.shared.items())
+        merged.update(self.variables)
+        return merged
+
+    def save(self, path):
+        return write_snapshot(path, self.merged())
+
+    def print_all(self, write=print):
+        variables = self.variables
+        for name, value in self.shared.items():
+            if name not in variables:
+                write(f"{name} = {format_value(value)}")
+        for name, value in variables.items():
+            write(f"{name} = {format_value(value)}")
@@ -0,0 +1,272 @@
+# === snapshot.py ===
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+import vector
+
+# File layout (all numbers little-endian, every section 8-byte aligned):
+#   header   magic, format version, variable counts per column, size of the name index
+#   names    every variable name, newline separated: int64 names, float64 names, bigint names, vector names
+#   int64    one packed signed 64-bit integer per int variable
+#   float64  one packed double per float variable
+#   bigints  for each: byte count, then the two's complement bytes of the value
+#   vectors  for each: element type ('q' or 'd'), length, then the packed elements
+MAGIC = b"SNOL"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHxxQQQQQ")
+RECORD = struct.Struct("<Q")
+VECTOR_RECORD = struct.Struct("<c7xQ")
+
+INT64_MIN = -(1 << 63)
+INT64_MAX = (1 << 63) - 1
+
+def padding(size):
+    """
+    Return the zero bytes that align a section of `size` bytes to 8 bytes.
+
+    Args:
+        size (int): The size of the section.
+
+    Returns:
+        bytes: The padding.
+    """
+    return bytes(-size % 8)
+
+def packed(typecode, values):
+    """
+    Pack numbers into a little-endian array.
+
+    Args:
+        typecode (str): 'q' for int64 or 'd' for float64.
+        values (list): The numbers to pack.
+
+    Returns:
+        array: The packed numbers.
+    """
+    column = array(typecode, values)
+    if sys.byteorder != "little":
+        column.byteswap()
+    return column
+
+def unpacked(view, typecode, count):
+    """
+    Read `count` packed numbers from a memory view.
+
+    Args:
+        view (memoryview): The bytes of the column.
+        typecode (str): 'q' for int64 or 'd' for float64.
+        count (int): The number of values.
+
+    Returns:
+        list: The numbers as Python ints or floats.
+    """
+    if count == 0:
+        return []
+    if sys.byteorder == "little":
+        return view.cast(typecode).tolist()
+    column = array(typecode, view)
+    column.byteswap()
+    return column.tolist()
+
+def write_snapshot(path, variables):
+    """
+    Write variables to a snapshot file.
+
+    The file is written next to `path` first, forced to disk and then renamed
+    over it (the directory is forced to disk too), so neither an interrupted
+    save nor a power loss right after it leaves a half-written snapshot behind.
+
+    Args:
+        path (str): The file to write.
+        variables (dict): Variable names and their values (int, float or vector). A
+            typed `array` ('q' or 'd') is written as a vector, so columns can be
+            saved without NumPy.
+
+    Returns:
+        int: The number of variables written.
+    """
+    ints, floats, bigints, vectors = {}, {}, {}, {}
+    for name, value in variables.items():
+        value_type = type(value)
+        if value_type is int:
+            if INT64_MIN <= value <= INT64_MAX:
+                ints[name] = value
+            else:
+                bigints[name] = value
+        elif value_type is float:
+            floats[name] = value
+        elif value_type is vector.VECTOR_TYPE or (value_type is array and value.typecode in ("q", "d")):
+            vectors[name] = value
+        else:
+            raise ValueError(f"Cannot save [{name}]: unsupported value type {value_type.__name__}.")
+
+    names = "\n".join([*ints, *floats, *bigints, *vectors]).encode("ascii")
+    temporary = f"{path}.tmp"
+    try:
+        with open(temporary, "wb") as snapshot:
+            snapshot.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(ints), len(floats), len(bigints),
+                                       len(vectors), len(names)))
+            snapshot.write(names)
+            snapshot.write(padding(len(names)))
+            packed("q", ints.values()).tofile(snapshot)
+            packed("d", floats.values()).tofile(snapshot)
+            for value in bigints.values():
+                data = value.to_bytes(value.bit_length() // 8 + 1, "little", signed=True)
+                snapshot.write(RECORD.pack(len(data)))
+                snapshot.write(data)
+                snapshot.write(padding(len(data)))
+            for value in vectors.values():
+                if type(value) is array:
+                    snapshot.write(VECTOR_RECORD.pack(value.typecode.encode("ascii"), len(value)))
+                    packed(value.typecode, value).tofile(snapshot)
+                    continue
+                typecode = "d" if value.dtype.kind == "f" else "q"
+                snapshot.write(VECTOR_RECORD.pack(typecode.encode("ascii"), len(value)))
+                snapshot.write(value.astype("<f8" if typecode == "d" else "<i8").tobytes())
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+        os.replace(temporary, path)
+        sync_directory(path)
+    except BaseException:
+        # Never leave a half-written file next to the snapshot
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
+        raise
+    return len(variables)
+
+def sync_directory(path):
+    """
+    Force the directory entry of a file (a creation or a rename) to disk.
+
+    Does nothing where a directory cannot be opened (Windows).
+
+    Args:
+        path (str): The file whose directory is synced.
+    """
+    try:
+        descriptor = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+def read_snapshot(path):
+    """
+    Read the variables of a snapshot file.
+
+    The file is memory-mapped and the int64/float64 columns are converted in
+    a single pass each, so loading stays fast for very large tables. The
+    values are copied out of the mapping: LOAD assigns every variable of the
+    snapshot, so the table must own them. Readers that only need the packed
+    columns read them in place instead (see `layout` and `bulk.SnapshotColumns`).
+
+    Args:
+        path (str): The file to read.
+
+    Returns:
+        dict: Variable names and their values.
+
+    Raises:
+        ValueError: If the file is not a valid snapshot.
+    """
+    with open(path, "rb") as snapshot:
+        if os.fstat(snapshot.fileno()).st_size < HEADER.size:
+            raise ValueError("Not a SNOL snapshot.")
+        with mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                return decode(view)
+            finally:
+                view.release()
+
+def decode(view):
+    """
+    Decode the contents of a snapshot.
+
+    Args:
+        view (memoryview): The bytes of the snapshot file.
+
+    Returns:
+        dict: Variable names and their values.
+
+    Raises:
+        ValueError: If the bytes are not a valid snapshot.
+    """
+    names, values, vectors = layout(view)
+    np = vector.load_numpy() if vectors else None
+    for typecode, data in vectors:
+        if np is None:
+            raise RuntimeError("Vector variables require NumPy, which is not installed.")
+        if typecode == "d":
+            values.append(np.frombuffer(data, dtype="<f8").astype(np.float64))
+        else:
+            values.append(np.frombuffer(data, dtype="<i8").astype(np.int64))
+    return dict(zip(names, values))
+
+def layout(view):
+    """
+    Locate the contents of a snapshot without copying its vectors.
+
+    Args:
+        view (memoryview): The bytes of the snapshot file.
+
+    Returns:
+        tuple: The variable names; the values of the scalar variables (the first
+            names); and for each vector variable (the last names) its element type
+            ('q' or 'd') and a view of its packed little-endian elements.
+
+    Raises:
+        ValueError: If the bytes are not a valid snapshot.
+    """
+    if len(view) < HEADER.size:
+        raise ValueError("Not a SNOL snapshot.")
+    magic, version, int_count, float_count, bigint_count, vector_count, names_size = HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise ValueError("Not a SNOL snapshot.")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {version}.")
+
+    def section(offset, size):
+        if offset + size > len(view):
+            raise ValueError("Snapshot file is truncated.")
+        return view[offset:offset + size]
+
+    offset = HEADER.size
+    names = bytes(section(offset, names_size)).decode("ascii").split("\n") if names_size else []
+    if len(names) != int_count + float_count + bigint_count + vector_count:
+        raise ValueError("Snapshot name index does not match its columns.")
+    offset += names_size + len(padding(names_size))
+
+    values = unpacked(section(offset, 8 * int_count), "q", int_count)
+    offset += 8 * int_count
+    values += unpacked(section(offset, 8 * float_count), "d", float_count)
+    offset += 8 * float_count
+
+    for _ in range(bigint_count):
+        (size,) = RECORD.unpack(section(offset, RECORD.size))
+        offset += RECORD.size
+        values.append(int.from_bytes(section(offset, size), "little", signed=True))
+        offset += size + len(padding(size))
+
+    vectors = []
+    try:
+        for _ in range(vector_count):
+            typecode, length = VECTOR_RECORD.unpack(section(offset, VECTOR_RECORD.size))
+            offset += VECTOR_RECORD.size
+            vectors.append(("d" if typecode == b"d" else "q", section(offset, 8 * length)))
+            offset += 8 * length
+    except ValueError:
+        # Views left alive by the error would keep the caller from closing its mapping
+        for _, data in vectors:
+            data.release()
+        raise
+
+    return names, values, vectors
\ No newline at end of file
@@ -0,0 +1,166 @@
+# === stats.py ===
+
+import re
+
+from io_handler import COMMAND_NAMES
+
+# Histogram bucket i holds latencies below 2**i microseconds (the last one holds the rest)
+BUCKETS = 32
+
+# Variable names and file paths in error messages are dropped to get the kind of the error
+DETAIL_REGEX = re.compile(r"\[[^\]]*\]")
+
+class LatencyHistogram:
+    """
+    Count and total of a latency, with a power-of-two histogram for percentiles.
+    """
+
+    __slots__ = ("count", "total", "buckets")
+
+    def __init__(self):
+        """Initialize an empty histogram."""
+        self.count = 0
+        self.total = 0.0
+        self.buckets = [0] * BUCKETS
+
+    def record(self, seconds):
+        """
+        Add one measurement.
+
+        Args:
+            seconds (float): The measured latency.
+        """
+        self.count += 1
+        self.total += seconds
+        self.buckets[min(int(seconds * 1e6).bit_length(), BUCKETS - 1)] += 1
+
+    def percentile(self, fraction):
+        """
+        Estimate a percentile as the upper bound of the bucket that holds it.
+
+        Args:
+            fraction (float): The percentile, e.g. 0.99.
+
+        Returns:
+            float: The latency (seconds) below which `fraction` of the measurements fall.
+        """
+        if self.count == 0:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                return (1 << index) / 1e6
+        return (1 << (BUCKETS - 1)) / 1e6
+
+    def snapshot(self):
+        """
+        Return the histogram as plain data.
+
+        Returns:
+            dict: The count, total, mean, p50, p99 (seconds) and the non-empty buckets.
+        """
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(0.50),
+            "p99": self.percentile(0.99),
+            "buckets_us": {1 << index: count for index, count in enumerate(self.buckets) if count},
+        }
+
+class Stats:
+    """
+    Runtime statistics of an interpreter: latency per command type, latency
+    per pipeline stage and error counts by kind.
+
+    Statistics are off unless a `Stats` object is attached to a session
+    (`Interpreter(stats=True)` or `interpreter.stats = Stats()`); when they
+    are off, each instrumented spot costs a single `is None` check.
+    """
+
+    def __init__(self):
+        """Initialize empty statistics."""
+        self.commands = {}
+        self.stages = {}
+        self.errors = {}
+
+    def begin_command(self, text, line_number=None):
+        """
+        Note that a command starts (nothing to do here; see `profiler.Profiler`).
+
+        Args:
+            text (str): The command.
+            line_number (int/None): Its line in the script, if known.
+        """
+
+    def record_command(self, command_type, seconds, error=None):
+        """
+        Record one executed command.
+
+        Args:
+            command_type (int): The code returned by `io_handler.commands()`.
+            seconds (float): The time the command took.
+            error (str/None): The error message written by the command, if it failed.
+        """
+        histogram = self.commands.get(command_type)
+        if histogram is None:
+            histogram = self.commands[command_type] = LatencyHistogram()
+        histogram.record(seconds)
+        if error is not None:
+            kind = DETAIL_REGEX.sub("[]", error).removeprefix("SNOL> ")
+            self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def record_stage(self, stage, seconds):
+        """
+        Record the time spent in one pipeline stage.
+
+        Args:
+            stage (str): The stage, e.g. "compile" or "evaluate".
+            seconds (float): The time spent.
+        """
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages[stage] = LatencyHistogram()
+        histogram.record(seconds)
+
+    def snapshot(self):
+        """
+        Return all statistics as plain data.
+
+        Returns:
+            dict: "commands" (by command name), "stages" and "errors" (by kind).
+        """
+        return {
+            "commands": {COMMAND_NAMES.get(code, str(code)): histogram.snapshot()
+                         for code, histogram in sorted(self.commands.items())},
+            "stages": {stage: histogram.snapshot() for stage, histogram in self.stages.items()},
+            "errors": dict(sorted(self.errors.items(), key=lambda item: -item[1])),
+        }
+
+    def report(self):
+        """
+        Format the statistics for the STATS command.
+
+        Returns:
+            list: The lines of the report.
+        """
+        snapshot = self.snapshot()
+        lines = []
+        for group in ("commands", "stages"):
+            for name, data in snapshot[group].items():
+                lines.append(f"SNOL> [{name}] count={data['count']} total={data['total'] * 1e3:.3f}ms "
+                             f"mean={data['mean'] * 1e6:.1f}us p50<{data['p50'] * 1e6:.0f}us "
+                             f"p99<{data['p99'] * 1e6:.0f}us")
+        for kind, count in snapshot["errors"].items():
+            lines.append(f"SNOL> {count} x {kind}")
+        if not lines:
+            lines.append("SNOL> No commands recorded yet.")
+        return lines
+
+    def reset(self):
+        """Drop every recorded measurement."""
+        self.commands.clear()
+        self.stages.clear()
+        self.errors.clear()
\ No newline at end of file
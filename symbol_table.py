@@ -1,14 +1,54 @@
 # === symbol_table.py ===
 
+import threading
+from array import array
+from collections.abc import Mapping
+
+from io_handler import format_value
+from vector import as_vector
+from result_cache import ResultCache
+from snapshot import write_snapshot, read_snapshot, INT64_MIN, INT64_MAX
+
+# Lock stripes (and shards) of a ConcurrentSymbolTable; a power of two
+STRIPES = 64
+
+# Columns of a CompactSymbolTable: int64 values, float64 values, other values
+# (integers outside 64 bits and vectors)
+INT_COLUMN = 0
+FLOAT_COLUMN = 1
+OBJECT_COLUMN = 2
+
+# Initial slots of the name index of a CompactSymbolTable; a power of two
+INDEX_SLOTS = 8
+
+# Recently used names a CompactSymbolTable keeps in a dictionary, in front of its index
+RECENT_NAMES = 1024
+
 class SymbolTable:
+    __slots__ = ("variables", "versions", "results", "journal", "formulas")
+    
+    # True for tables that threads can share (see `locked`)
+    concurrent = False
+    
     def __init__(self):
         """Initialize the symbol table with an empty dictionary to store variables."""
         self.variables = {}
+        # Incremented on every assignment; used to key the expression results
+        self.versions = {}
+        self.results = ResultCache()
+        # Records every assignment when the table is journaled (see `journal.Journal`)
+        self.journal = None
+        # The formula variables defined with DEF (see `formulas.Formulas`), if any
+        self.formulas = None
     
     def set_variable(self, name, value):
         """
         Set a variable in the symbol table.
         
+        Every assignment (including one that keeps the same value) gives the
+        variable a new version, which invalidates the cached results of the
+        expressions that read it, and marks the formulas that read it dirty.
+        
         Args:
             name (str): The name of the variable.
             value (int/float): The value to assign to the variable.
@@ -16,9 +56,29 @@ class SymbolTable:
         Returns:
             value: The value that was set.
         """
+        if self.journal is not None:
+            self.journal.record(name, value)
         self.variables[name] = value
+        self.versions[name] = self.versions.get(name, 0) + 1
+        if self.formulas is not None:
+            self.formulas.changed(name)
         return value
     
+    def set_vector(self, name, values):
+        """
+        Set a variable to a vector of numbers (requires NumPy).
+        
+        Arithmetic on a vector variable applies to every element at once.
+        
+        Args:
+            name (str): The name of the variable.
+            values (iterable/ndarray): The numbers of the vector, all ints or all floats.
+        
+        Returns:
+            ndarray: The vector that was set.
+        """
+        return self.set_variable(name, as_vector(values))
+    
     def get_variable(self, name):
         """
         Get the value of a variable from the symbol table.
@@ -33,6 +93,41 @@ class SymbolTable:
             return self.variables[name]
         return None
     
+    def lookup(self, names):
+        """
+        Get the values and versions of several variables at once.
+        
+        Args:
+            names (tuple): The names of the variables.
+        
+        Returns:
+            tuple: The list of values and the tuple of versions, in the order of `names`.
+        
+        Raises:
+            KeyError: With the first name that is not defined.
+        """
+        variables = self.variables
+        versions = self.versions
+        try:
+            return [variables[name] for name in names], tuple([versions[name] for name in names])
+        except KeyError:
+            for name in names:
+                if name not in variables:
+                    raise KeyError(name) from None
+            raise
+    
+    def version(self, name):
+        """
+        Get the version of a variable.
+        
+        Args:
+            name (str): The name of the variable.
+        
+        Returns:
+            int: The number of times the variable was set (0 if it never was).
+        """
+        return self.versions.get(name, 0)
+    
     def variable_exists(self, name):
         """
         Check if a variable exists in the symbol table.
@@ -45,11 +140,525 @@ class SymbolTable:
         """
         return name in self.variables
     
-    def print_all(self):
+    def save(self, path):
+        """
+        Write every variable to a binary snapshot file (see `snapshot`).
+        
+        Args:
+            path (str): The file to write.
+        
+        Returns:
+            int: The number of variables saved.
+        """
+        return write_snapshot(path, self.variables)
+    
+    def locked(self, names):
+        """
+        Hold the variables that one command reads and writes, so that its
+        read-evaluate-write cannot interleave with another thread's.
+        
+        A plain table is not meant to be shared between threads: it holds nothing.
+        
+        Args:
+            names (iterable): The variables the command reads and writes.
+        
+        Returns:
+            StripeLock: A context manager.
+        """
+        return NO_LOCK
+    
+    def load(self, path):
+        """
+        Set the variables stored in a snapshot file, as if each one was assigned.
+        
+        Variables that are not in the snapshot keep their values.
+        
+        Args:
+            path (str): The snapshot file to read.
+        
+        Returns:
+            int: The number of variables loaded.
+        
+        Raises:
+            OSError: If the file cannot be read.
+            ValueError: If the file is not a valid snapshot.
+        """
+        loaded = read_snapshot(path)
+        if self.journal is not None:
+            for name, value in loaded.items():
+                self.journal.record(name, value)
+        self.variables.update(loaded)
+        version = self.versions.get
+        self.versions.update({name: version(name, 0) + 1 for name in loaded})
+        if self.formulas is not None:
+            for name in loaded:
+                self.formulas.changed(name)
+        return len(loaded)
+    
+    def print_all(self, write=print):
         """
         Print all variables and their values in the symbol table.
         
         This is useful for debugging or displaying the current state of the symbol table.
+        Lines are produced one at a time, so the output of a large table is
+        never held in memory as a whole.
+        
+        Args:
+            write (callable): Receives each line.
+        """
+        for name, value in self.variables.items():
+            write(f"{name} = {format_value(value)}")
+
+class CompactView(Mapping):
+    """
+    Read-only mapping over one set of columns of a CompactSymbolTable
+    (its values or its versions), so code written for the dictionaries of
+    `SymbolTable` keeps working.
+    """
+    
+    __slots__ = ("table", "columns")
+    
+    def __init__(self, table, columns):
+        """
+        Initialize the view.
+        
+        Args:
+            table (CompactSymbolTable): The table whose names are looked up.
+            columns (tuple): The three columns to read, indexed by column number.
+        """
+        self.table = table
+        self.columns = columns
+    
+    def __getitem__(self, name):
+        number = self.table.find(name)
+        if number == -1:
+            raise KeyError(name)
+        code = self.table.codes[number]
+        return self.columns[code & 3][code >> 2]
+    
+    def __iter__(self):
+        table = self.table
+        return (table.name(number) for number in range(len(table.codes)))
+    
+    def __len__(self):
+        return len(self.table.codes)
+    
+    def __contains__(self, name):
+        return self.table.find(name) != -1
+
+class CompactSymbolTable(SymbolTable):
+    """
+    A symbol table for very large numbers of variables.
+    
+    Values are not kept as Python objects: ints that fit in 64 bits are
+    stored in an `array('q')`, floats in an `array('d')`, and only larger
+    integers and vectors fall back to a list of objects. Names are not kept
+    as objects either: they are stored back to back in one buffer, and an
+    open-addressing hash index in an `array('q')` (as in
+    `shared_table.SharedVariables`) maps a name to its variable number. The
+    slot code (`index << 2 | column`) and the name hash of each variable are
+    held in arrays by variable number; versions are kept in arrays parallel
+    to the value columns. The slot of a variable whose type changes is freed
+    and reused by the next variable of that type. The variable numbers of
+    the last `RECENT_NAMES` names looked up are kept in a dictionary, so a
+    loop over a few variables does not probe the index every time.
+    
+    It has the same interface as `SymbolTable`; `variables` and `versions`
+    are read-only views.
+    """
+    
+    __slots__ = ("index", "mask", "hashes", "codes", "offsets", "names", "recent", "columns", "version_columns",
+                 "free")
+    
+    def __init__(self):
+        """Initialize an empty table."""
+        # The name index: a variable number or -1 per slot, at most half full
+        self.index = array('q', [-1]) * INDEX_SLOTS
+        self.mask = INDEX_SLOTS - 1
+        # By variable number: the hash of its name, its slot code, and where its name starts
+        self.hashes = array('q')
+        self.codes = array('q')
+        self.offsets = array('q', [0])
+        self.names = bytearray()
+        # Name -> variable number of recently used names (numbers never change)
+        self.recent = {}
+        self.columns = (array('q'), array('d'), [])
+        self.version_columns = (array('q'), array('q'), array('q'))
+        # Indexes of the freed slots of each column
+        self.free = ([], [], [])
+        self.results = ResultCache()
+        self.journal = None
+        self.formulas = None
+    
+    @property
+    def variables(self):
+        """CompactView: The values of the variables, by name."""
+        return CompactView(self, self.columns)
+    
+    @property
+    def versions(self):
+        """CompactView: The versions of the variables, by name."""
+        return CompactView(self, self.version_columns)
+    
+    def find(self, name):
+        """
+        Find a variable in the name index.
+        
+        Args:
+            name (str): The variable name.
+        
+        Returns:
+            int: Its variable number, or -1 if it was never set.
         """
+        number = self.recent.get(name)
+        if number is not None:
+            return number
+        name_hash = hash(name)
+        index = self.index
+        hashes = self.hashes
+        mask = self.mask
+        slot = name_hash & mask
+        while True:
+            number = index[slot]
+            if number == -1:
+                return -1
+            if hashes[number] == name_hash:
+                key = name.encode()
+                start = self.offsets[number]
+                end = self.offsets[number + 1]
+                if end - start == len(key) and self.names.startswith(key, start, end):
+                    self.remember(name, number)
+                    return number
+            slot = (slot + 1) & mask
+    
+    def remember(self, name, number):
+        """
+        Keep the variable number of a name in the recent names.
+        
+        Args:
+            name (str): The variable name.
+            number (int): Its variable number.
+        """
+        recent = self.recent
+        if len(recent) >= RECENT_NAMES:
+            recent.clear()
+        recent[name] = number
+    
+    def name(self, number):
+        """
+        Return the name of a variable.
+        
+        Args:
+            number (int): The variable number.
+        
+        Returns:
+            str: The name.
+        """
+        return self.names[self.offsets[number]:self.offsets[number + 1]].decode()
+    
+    def add(self, name):
+        """
+        Add a name to the index (the caller sets its slot code).
+        
+        Args:
+            name (str): A name that is not in the table yet.
+        
+        Returns:
+            int: The variable number of the name.
+        """
+        number = len(self.codes)
+        name_hash = hash(name)
+        self.names += name.encode()
+        self.offsets.append(len(self.names))
+        self.hashes.append(name_hash)
+        self.codes.append(0)
+        self.remember(name, number)
+        if 2 * len(self.codes) > len(self.index):
+            self.rehash(2 * len(self.index))
+            return number
+        index = self.index
+        mask = self.mask
+        slot = name_hash & mask
+        while index[slot] != -1:
+            slot = (slot + 1) & mask
+        index[slot] = number
+        return number
+    
+    def rehash(self, size):
+        """
+        Rebuild the name index with more slots (the stored hashes are reused).
+        
+        Args:
+            size (int): The new number of slots; a power of two.
+        """
+        index = array('q', [-1]) * size
+        mask = size - 1
+        for number, name_hash in enumerate(self.hashes):
+            slot = name_hash & mask
+            while index[slot] != -1:
+                slot = (slot + 1) & mask
+            index[slot] = number
+        self.index = index
+        self.mask = mask
+    
+    def set_variable(self, name, value):
+        if self.journal is not None:
+            self.journal.record(name, value)
+        if self.formulas is not None:
+            self.formulas.changed(name)
+        value_type = type(value)
+        if value_type is float:
+            column = FLOAT_COLUMN
+        elif value_type is int and INT64_MIN <= value <= INT64_MAX:
+            column = INT_COLUMN
+        else:
+            column = OBJECT_COLUMN
+        
+        number = self.find(name)
+        if number != -1:
+            code = self.codes[number]
+            index = code >> 2
+            if code & 3 == column:
+                self.columns[column][index] = value
+                self.version_columns[column][index] += 1
+                return value
+            # The type changed: move the variable to a slot of its new column
+            version = self.version_columns[code & 3][index] + 1
+            self.release(code & 3, index)
+        else:
+            number = self.add(name)
+            version = 1
+        
+        free = self.free[column]
+        if free:
+            index = free.pop()
+            self.columns[column][index] = value
+            self.version_columns[column][index] = version
+        else:
+            index = len(self.columns[column])
+            self.columns[column].append(value)
+            self.version_columns[column].append(version)
+        self.codes[number] = index << 2 | column
+        return value
+    
+    def release(self, column, index):
+        """
+        Free a slot so it can be reused.
+        
+        Args:
+            column (int): The column of the slot.
+            index (int): The index of the slot in its column.
+        """
+        if column == OBJECT_COLUMN:
+            # Drop the reference, so a large value is not kept alive
+            self.columns[column][index] = None
+        self.free[column].append(index)
+    
+    def get_variable(self, name):
+        number = self.find(name)
+        if number == -1:
+            return None
+        code = self.codes[number]
+        return self.columns[code & 3][code >> 2]
+    
+    def lookup(self, names):
+        recent = self.recent
+        codes = self.codes
+        columns = self.columns
+        versions = self.version_columns
+        values = []
+        current = []
+        for name in names:
+            number = recent.get(name)
+            if number is None:
+                number = self.find(name)
+                if number == -1:
+                    raise KeyError(name)
+            code = codes[number]
+            values.append(columns[code & 3][code >> 2])
+            current.append(versions[code & 3][code >> 2])
+        return values, tuple(current)
+    
+    def version(self, name):
+        number = self.find(name)
+        if number == -1:
+            return 0
+        code = self.codes[number]
+        return self.version_columns[code & 3][code >> 2]
+    
+    def variable_exists(self, name):
+        return self.find(name) != -1
+    
+    def load(self, path):
+        loaded = read_snapshot(path)
+        for name, value in loaded.items():
+            self.set_variable(name, value)
+        return len(loaded)
+    
+    def print_all(self, write=print):
+        columns = self.columns
+        for number, code in enumerate(self.codes):
+            write(f"{self.name(number)} = {format_value(columns[code & 3][code >> 2])}")
+
+class StripeLock:
+    """
+    Context manager that holds some lock stripes of a ConcurrentSymbolTable,
+    acquired in stripe order so two commands can never wait for each other.
+    """
+    
+    __slots__ = ("locks",)
+    
+    def __init__(self, locks):
+        """
+        Initialize the context manager.
+        
+        Args:
+            locks (list): The locks to hold, in stripe order.
+        """
+        self.locks = locks
+    
+    def __enter__(self):
+        for lock in self.locks:
+            lock.acquire()
+        return self
+    
+    def __exit__(self, *exc_info):
+        for lock in reversed(self.locks):
+            lock.release()
+        return False
+
+# Holds nothing (the `locked` of tables that are not shared between threads)
+NO_LOCK = StripeLock(())
+
+class ShardedView(Mapping):
+    """
+    Read-only mapping over the values or the versions of a ConcurrentSymbolTable.
+    """
+    
+    __slots__ = ("shards", "mask", "field")
+    
+    def __init__(self, shards, mask, field):
+        """
+        Initialize the view.
+        
+        Args:
+            shards (tuple): The shards of the table.
+            mask (int): Selects the shard of a name's hash.
+            field (int): 0 for the values, 1 for the versions.
+        """
+        self.shards = shards
+        self.mask = mask
+        self.field = field
+    
+    def __getitem__(self, name):
+        return self.shards[hash(name) & self.mask][name][self.field]
+    
+    def __iter__(self):
+        for shard in self.shards:
+            # A copy of the keys, so other threads can keep assigning
+            yield from list(shard)
+    
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
+    
+    def __contains__(self, name):
+        return name in self.shards[hash(name) & self.mask]
+
+class ConcurrentSymbolTable(SymbolTable):
+    """
+    A symbol table that many threads can use at once (each with its own
+    session, e.g. one `Interpreter` per thread).
+    
+    Variables are spread over `stripes` shards by the hash of their name.
+    Each variable is stored as a single (value, version) entry, replaced as a
+    whole, so a read never sees the value of one assignment with the version
+    of another. Reads take no lock. Writes hold the lock of their shard, so
+    version numbers are never lost. A command that reads and writes
+    variables (`x = x + y`) holds the stripes of all of them for the whole
+    read-evaluate-write (`locked`), so two such commands never interleave.
+    
+    Formula variables (DEF) are not synchronized and should be defined by a
+    single thread.
+    """
+    
+    __slots__ = ("shards", "stripes", "mask")
+    
+    concurrent = True
+    
+    def __init__(self, stripes=STRIPES):
+        """
+        Initialize an empty table.
+        
+        Args:
+            stripes (int): Number of shards and locks (rounded up to a power of two).
+        """
+        count = 1
+        while count < stripes:
+            count *= 2
+        self.shards = tuple({} for _ in range(count))
+        # Reentrant: a command holding its stripes assigns through `set_variable`
+        self.stripes = tuple(threading.RLock() for _ in range(count))
+        self.mask = count - 1
+        self.results = ResultCache()
+        self.journal = None
+        self.formulas = None
+    
+    @property
+    def variables(self):
+        """ShardedView: The values of the variables, by name."""
+        return ShardedView(self.shards, self.mask, 0)
+    
+    @property
+    def versions(self):
+        """ShardedView: The versions of the variables, by name."""
+        return ShardedView(self.shards, self.mask, 1)
+    
+    def set_variable(self, name, value):
+        index = hash(name) & self.mask
+        with self.stripes[index]:
+            if self.journal is not None:
+                self.journal.record(name, value)
+            if self.formulas is not None:
+                self.formulas.changed(name)
+            shard = self.shards[index]
+            entry = shard.get(name)
+            shard[name] = (value, entry[1] + 1 if entry is not None else 1)
+        return value
+    
+    def get_variable(self, name):
+        entry = self.shards[hash(name) & self.mask].get(name)
+        return entry[0] if entry is not None else None
+    
+    def lookup(self, names):
+        shards = self.shards
+        mask = self.mask
+        try:
+            entries = [shards[hash(name) & mask][name] for name in names]
+        except KeyError:
+            for name in names:
+                if name not in shards[hash(name) & mask]:
+                    raise KeyError(name) from None
+            raise
+        return [entry[0] for entry in entries], tuple([entry[1] for entry in entries])
+    
+    def version(self, name):
+        entry = self.shards[hash(name) & self.mask].get(name)
+        return entry[1] if entry is not None else 0
+    
+    def variable_exists(self, name):
+        return name in self.shards[hash(name) & self.mask]
+    
+    def load(self, path):
+        loaded = read_snapshot(path)
+        for name, value in loaded.items():
+            self.set_variable(name, value)
+        return len(loaded)
+    
+    def locked(self, names):
+        mask = self.mask
+        stripes = self.stripes
+        return StripeLock([stripes[index] for index in sorted({hash(name) & mask for name in names})])
+    
+    def print_all(self, write=print):
         for name, value in self.variables.items():
-            print(f"{name} = {value}")
\ No newline at end of file
+            write(f"{name} = {format_value(value)}")
\ No newline at end of file
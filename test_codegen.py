@@ -0,0 +1,107 @@
+# === test_codegen.py ===
+
+import random
+import unittest
+
+import codegen
+from benchmark import random_expression
+from evaluator import EvalError, evaluate_compiled
+from interpreter import Interpreter
+from parser import compile_expression
+
+# (expression, variable values) pairs on which the tiers are most likely to differ
+EDGE_CASES = [
+    ("a / b", [1, 0]),                   # Division by zero
+    ("a / b", [1.5, 0.0]),
+    ("a / (b - b)", [4, 9]),
+    ("a % b", [7, 0]),                   # Modulo by zero
+    ("a % b", [7.5, 2.0]),               # Modulo on floats
+    ("a % b", [-7, 2]),
+    ("a + b", [1, 2.5]),                 # Mixed types
+    ("a % b", [7, 2.0]),
+    ("a * b - a", [3, 1.5]),
+    ("a / b", [10 ** 400, 3]),           # Overflow: int too large for a float
+    ("a * b", [1e300, 1e300]),           # Float overflow gives inf, not an error
+    ("a * a * a", [2 ** 70, 0]),         # Big ints do not overflow
+    ("a / b", [7, 2]),                   # Whole and fractional results
+    ("a / b", [6, 3]),
+    ("-a - -b", [5, 2]),
+    ("(a + b) * (a + b) - a % 3", [4, 5]),  # Repeated sub-expression
+]
+
+def same(expected, actual):
+    """Tell whether two results are identical: same type and same value (or error)."""
+    return type(expected) is type(actual) and repr(expected) == repr(actual)
+
+class GeneratedCodeTest(unittest.TestCase):
+    """The Python generated for an expression must behave exactly like `evaluate_compiled`."""
+
+    def check(self, source, values):
+        compiled = compile_expression(source)
+        self.assertIsNone(compiled.error, source)
+        values = values[:len(compiled.names)]
+        expected = evaluate_compiled(compiled, values)
+        actual = codegen.generate(compiled)(values)
+        self.assertTrue(same(expected, actual),
+                        f"{source} with {values}: interpreter {expected!r}, compiled {actual!r}")
+        return actual
+
+    def test_edge_cases(self):
+        for source, values in EDGE_CASES:
+            with self.subTest(source=source, values=values):
+                self.check(source, values)
+
+    def test_errors(self):
+        self.assertEqual(self.check("a / b", [1, 0]), EvalError("Division by zero is not allowed!"))
+        self.assertEqual(self.check("a % b", [7, 0]), EvalError("Modulo by zero is not allowed!"))
+        self.assertEqual(self.check("a % b", [7.5, 2.0]), EvalError("Error! Invalid token in the expression."))
+        self.assertEqual(self.check("a / b", [10 ** 400, 3]), EvalError("Error! Numeric overflow."))
+
+    def test_random_expressions(self):
+        rng = random.Random(0)
+        choices = [0, -1, 2, 7, -12, 2 ** 70, 10 ** 400, 0.0, -1.5, 2.25, 1e300, 3.0]
+        for _ in range(1000):
+            source = random_expression(rng, rng.randint(1, 5), rng.random() < 0.5)
+            compiled = compile_expression(source)
+            if compiled.error is not None:
+                continue
+            for _ in range(10):
+                values = [rng.choice(choices) for _ in compiled.names]
+                with self.subTest(source=source, values=values):
+                    self.check(source, values)
+
+class TieredEvaluationTest(unittest.TestCase):
+    """A command gives the same output before and after its expression is compiled."""
+
+    def run_hot(self, session, line):
+        outputs = []
+        for _ in range(codegen.HOT_THRESHOLD + 2):
+            # The result cache would skip the evaluation
+            session.symbol_table.results.clear()
+            outputs.append(session.execute(line).output)
+        self.assertIsNotNone(compile_expression(line).native, line)
+        return outputs
+
+    def test_tiers_agree(self):
+        for setup, line in ((["a = 7", "b = 0"], "a / b + 1"),
+                            (["a = 7", "b = 0"], "a % b - 1"),
+                            (["a = 7.5", "b = 2.5"], "a / (b - b) - 1.5"),
+                            (["a = 7.5", "b = 2.5"], "a * b - 1.5"),
+                            (["a = 7", "b = 2"], "a / b * 3 + 1")):
+            with self.subTest(line=line):
+                session = Interpreter()
+                session.execute_many(setup)
+                outputs = self.run_hot(session, line)
+                self.assertEqual(set(outputs), {outputs[0]})
+
+    def test_mixed_types_after_compilation(self):
+        session = Interpreter()
+        session.execute_many(["a = 7", "b = 2"])
+        self.run_hot(session, "a * b + 2")
+        # The compiled function was made for ints; a float operand must still be refused
+        session.execute("b = 2.5")
+        self.assertEqual(session.execute("a * b + 2").output,
+                         ("SNOL> Error! Operands must be of the same type in an arithmetic operation!",))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,30 +1,27 @@
 # === tokenizer.py ===
 
 import re
+from functools import partial
+from time import perf_counter
 from symbol_table import SymbolTable
+from lexer import KEYWORDS, tokenize, is_variable_name, operand_list, NAME, KEYWORD, ASSIGN
+from parser import compile_expression
+from evaluator import EvalError, compiled_error_finder, evaluate_vector
+from codegen import evaluate_tiered
+from io_handler import format_value
+import vector
+from session import Session
+from formulas import Formulas
 
 # Global symbol table instance
 symbol_table = SymbolTable()
 
-# Define keywords for the SNOL language
-KEYWORDS = ["BEG", "PRINT", "EXIT!", "HELP"]
+# Default session: the global symbol table, stdin and stdout
+console = Session(symbol_table)
 
-def get_precedence(operator):
-    """
-    Get the precedence of an operator.
-    
-    Args:
-        operator (str): The operator to check.
-    
-    Returns:
-        int: The precedence level (higher value = higher precedence).
-    """
-    if operator == '+' or operator == '-':
-        return 1
-    elif operator == '*' or operator == '/' or operator == '%':
-        return 2
-    else:
-        return -1
+NUMBER_REGEX = re.compile(r"-?\d+(\.\d+)?")
+
+TYPE_ERROR = "Error! Operands must be of the same type in an arithmetic operation!"
 
 def is_operator(character):
     """
@@ -48,7 +45,7 @@ def isVariable(s: str) -> bool:
     Returns:
         bool: True if the string is a valid variable name, False otherwise.
     """
-    return re.fullmatch(r"[a-zA-Z][a-zA-Z0-9]*", s) is not None and s not in KEYWORDS
+    return is_variable_name(s)
 
 def isDigit(s: str) -> bool:
     """
@@ -60,7 +57,7 @@ def isDigit(s: str) -> bool:
     Returns:
         bool: True if the string is a valid number, False otherwise.
     """
-    return re.fullmatch(r"-?\d+(\.\d+)?", s) is not None
+    return NUMBER_REGEX.fullmatch(s) is not None
 
 def isKeyword(s: str) -> bool:
     """
@@ -74,152 +71,121 @@ def isKeyword(s: str) -> bool:
     """
     return s in KEYWORDS
 
-def conversion_helper(infix: str) -> str:
+def postfix_conversion(expr, tokens=None, session=console):
     """
-    Convert an infix expression to postfix notation.
+    Evaluate an infix expression using its cached compiled form.
+    
+    The expression is parsed only the first time it is seen; afterwards only
+    the current values of its variables are fetched from the symbol table.
+    If none of those variables changed since the last evaluation, the cached
+    result is returned without evaluating the expression again. Scalar
+    expressions that are evaluated often are compiled to Python (see `codegen`).
     
     Args:
-        infix (str): The infix expression to convert.
+        expr (str): The infix expression to evaluate.
+        tokens (tuple/None): The already lexed tokens of `expr`, if available.
+        session (Session): The session whose variables are used.
     
     Returns:
-        str: The postfix expression or an error message.
+        int/float/None: The result of the evaluation or None if an error occurs.
     """
-    mystack = []  # Stack to hold operators
-    postfix = []  # List to hold the postfix expression
-    tokens = []   # List to hold tokens from the infix expression
-    number = ""   # Temporary variable to build multi-character tokens
-    i = 0
-
-    while i < len(infix):
-        char = infix[i]
-
-        if char.isspace():
-            # Handle spaces between tokens
-            if number:
-                tokens.append(number)
-                number = ""
-            i += 1
-            continue
-
-        if char == '-' and (i == 0 or infix[i - 1] in '+-*/('):
-            # Handle negative numbers
-            number += char
-            i += 1
-            continue
-
-        if char.isdigit() or char == '.':
-            # Handle numeric tokens
-            number += char
-            i += 1
-            continue
-
-        if char.isalpha():
-            # Handle variable names or keywords
-            while i < len(infix) and (infix[i].isalnum() or infix[i] == '!'):
-                number += infix[i]
-                i += 1
-            continue
-
-        if number:
-            # Add the completed token to the list
-            tokens.append(number)
-            number = ""
-
-        if char in '+-*/()%':
-            # Add operators and parentheses to the token list
-            tokens.append(char)
-
-        i += 1
+    stats = session.stats
+    if stats is not None:
+        start = perf_counter()
+    compiled = compile_expression(expr, tokens)
+    if stats is not None:
+        stats.record_stage("compile", perf_counter() - start)
+    
+    if compiled.error is not None:
+        session.write(f"SNOL> {compiled.error}")
+        return None
 
-    if number:
-        # Add the last token if any
-        tokens.append(number)
+    result = evaluate_expression(compiled, session)
+    if type(result) is EvalError:
+        session.write(f"SNOL> {result.message}")
+        return None
 
-    # Check for keywords in the expression
-    for token in tokens:
-        if isKeyword(token):
-            return "KEYWORD_ERROR"
+    # Don't print the result
+    return result
 
-    for token in tokens:
-        is_valid_number = token.lstrip('-').replace('.', '', 1).isdigit()
+def evaluate_expression(compiled, session=console, cache=True):
+    """
+    Evaluate a valid compiled expression against the variables of a session.
+    
+    Args:
+        compiled (CompiledExpression): The expression, as returned by `compile_expression`.
+        session (Session): The session whose variables are used.
+        cache (bool): False to bypass the result cache, e.g. for `x = x + 1`,
+            whose result can never be looked up again.
+    
+    Returns:
+        int/float/EvalError: The result of the evaluation or an error (nothing is written).
+    """
+    table = session.symbol_table
+    formulas = table.formulas
+    if formulas is not None and formulas.dirty:
+        error = formulas.refresh(compiled.names)
+        if error is not None:
+            return error
+    try:
+        values, versions = table.lookup(compiled.names)
+    except KeyError as error:
+        return EvalError(f"Error! [{error.args[0]}] is not defined!")
 
-        if is_valid_number:
-            # Add numbers directly to the postfix expression
-            postfix.append(token)
-        elif isVariable(token):
-            # Replace variables with their values
-            if symbol_table.variable_exists(token):
-                postfix.append(str(symbol_table.get_variable(token)))
+    key = (compiled.source, versions)
+    result = table.results.get(key) if cache else None
+    if result is None:
+        stats = session.stats
+        if stats is not None:
+            start = perf_counter()
+        value_types = set(map(type, values))
+        if vector.VECTOR_TYPE in value_types:
+            # A vector result is as large as its operands, and assigning a cached one
+            # would make two variables share one array: vector results are not cached
+            cache = False
+            if compiled_error_finder(compiled, values):
+                result = evaluate_vector(compiled, values)
             else:
-                print(f"SNOL> Error! [{token}] is not defined!")
-                return "ERROR"
-        elif token == '(':
-            mystack.append(token)
-        elif token == ')':
-            # Pop operators until the matching '(' is found
-            while mystack and mystack[-1] != '(':
-                postfix.append(mystack.pop())
-            if mystack and mystack[-1] == '(':
-                mystack.pop()
-        elif token in '+-*/%':
-            # Handle operator precedence
-            while mystack and mystack[-1] != '(' and get_precedence(token) <= get_precedence(mystack[-1]):
-                postfix.append(mystack.pop())
-            mystack.append(token)
+                result = EvalError(TYPE_ERROR)
+        elif len(value_types | compiled.literal_types) > 1:
+            result = EvalError(TYPE_ERROR)
         else:
-            continue
-
-    while mystack:
-        # Pop remaining operators
-        postfix.append(mystack.pop())
+            result = evaluate_tiered(compiled, values)
+        if stats is not None:
+            stats.record_stage("evaluate", perf_counter() - start)
+        if cache:
+            table.results.put(key, result)
+    return result
 
-    return ' '.join(postfix)
-
-def postfix_conversion(expr):
+def BEG(input_str, session=console):
     """
-    Convert an infix expression to postfix and evaluate it.
+    Handle the BEG command to initialize a variable with user input.
     
     Args:
-        expr (str): The infix expression to convert.
+        input_str (str): The input string containing the BEG command.
+        session (Session): The session to read the value for and store it in.
     
     Returns:
-        str/None: The result of the evaluation or None if an error occurs.
+        bool: True if the variable was set, False otherwise.
     """
-    from evaluator import error_finder, expression_data_type, evaluate_int_expression, evaluate_float_expression
-    
-    postfix = conversion_helper(expr)
-    
-    if postfix == "ERROR":
-        return None
-    elif postfix == "KEYWORD_ERROR":
-        print("SNOL> Unknown command! Does not match any valid command of the language.")
-        return None
-
-    if not error_finder(postfix):
-        print("SNOL> Error! Operands must be of the same type in an arithmetic operation!")
-        return None
-    else:
-        if expression_data_type(postfix):
-            result = evaluate_int_expression(postfix)
-            if "Error" in result or "INPUT ERROR" in result:
-                print(f"SNOL> {result}")
-                return None
-        else:
-            result = evaluate_float_expression(postfix)
-            if "Error" in result or "INPUT ERROR" in result:
-                print(f"SNOL> {result}")
-                return None
-
-        # Don't print the result
-        return result
+    var_name = begin_input(input_str, session)
+    if var_name is None:
+        return False
+    return store_input(var_name, session.read("Input: "), session)
 
-def BEG(input_str):
+def begin_input(input_str, session=console):
     """
-    Handle the BEG command to initialize a variable with user input.
+    First half of BEG: check the variable name and ask for its value.
+    
+    Callers that cannot block on `session.read` (e.g. the network server)
+    use this and `store_input` instead of `BEG`.
     
     Args:
         input_str (str): The input string containing the BEG command.
-        
+        session (Session): The session to write the prompt to.
+    
+    Returns:
+        str/None: The variable to read, or None if the name is invalid.
     """
     if input_str.startswith("BEG") and len(input_str) > 3 and not input_str[3].isspace():
         var_name = input_str[3:].strip()
@@ -227,93 +193,261 @@ def BEG(input_str):
         var_name = input_str[4:].strip()
         
     if not isVariable(var_name):
-        print(f"SNOL> [{var_name}] is not a valid variable name!")
-        return
+        session.write(f"SNOL> [{var_name}] is not a valid variable name!")
+        return None
     
-    print(f"SNOL> Please enter value for [{var_name}]")
-    value = input("Input: ")
+    session.write(f"SNOL> Please enter value for [{var_name}]")
+    return var_name
+
+def store_input(var_name, value, session=console):
+    """
+    Second half of BEG: store the value entered for a variable.
+    
+    Args:
+        var_name (str): The variable returned by `begin_input`.
+        value (str): The text that was entered.
+        session (Session): The session to store the variable in.
     
+    Returns:
+        bool: True if the variable was set, False otherwise.
+    """
     # Determine if the input is an integer or float
     if isDigit(value):
         if '.' in value:
-            symbol_table.set_variable(var_name, float(value))
+            session.symbol_table.set_variable(var_name, float(value))
         else:
-            symbol_table.set_variable(var_name, int(value))
-    else:
-        print("SNOL> Error! Input must be a number.")
+            session.symbol_table.set_variable(var_name, int(value))
+        return True
+    session.write("SNOL> Error! Input must be a number.")
+    return False
 
-def PRINT(input_str):
+def ingest_values(names, values, session=console):
     """
-    Handle the PRINT command to display a variable or literal.
+    Store a batch of BEG values without prompting for each one.
+    
+    Every value goes through the same validation and int/float inference as
+    a value entered for BEG.
+    
+    Args:
+        names (list): The variables to set.
+        values (list): The text entered for each variable, in the same order.
+        session (Session): The session to store the variables in.
+    
+    Returns:
+        int: The number of variables set.
+    """
+    if len(values) < len(names):
+        session.write(f"SNOL> Error! Only {len(values)} values for {len(names)} variables.")
+    stored = 0
+    for var_name, value in zip(names, values):
+        if not isVariable(var_name):
+            session.write(f"SNOL> [{var_name}] is not a valid variable name!")
+        elif store_input(var_name, value.strip(), session):
+            stored += 1
+    return stored
+
+def PRINT(input_str, session=console):
+    """
+    Handle the PRINT command to display variables or literals (`PRINT a b 3`).
+    
+    Nothing is printed unless every variable is defined.
     
     Args:
         input_str (str): The input string containing the PRINT command.
+        session (Session): The session to read the variables from and print to.
+    
+    Returns:
+        bool: True if something was printed, False on error.
     """
-    value_to_print = input_str[6:].strip()
+    targets = operand_list(tokenize(input_str)[1:])
+    if targets is None:
+        session.write("SNOL> Error! Invalid expression to print.")
+        return False
     
-    if isDigit(value_to_print):
-        print(f"SNOL> {value_to_print}")
-    elif isVariable(value_to_print):
-        if symbol_table.variable_exists(value_to_print):
-            print(f"SNOL> [{value_to_print}] = {symbol_table.get_variable(value_to_print)}")
+    table = session.symbol_table
+    if table.formulas is not None:
+        error = table.formulas.refresh(target.text for target in targets)
+        if error is not None:
+            session.write(f"SNOL> {error.message}")
+            return False
+    lines = []
+    for target in targets:
+        value_to_print = target.text
+        if isDigit(value_to_print):
+            lines.append(f"SNOL> {value_to_print}")
+        elif table.variable_exists(value_to_print):
+            lines.append(f"SNOL> [{value_to_print}] = {format_value(table.get_variable(value_to_print))}")
         else:
-            print(f"SNOL> Error! [{value_to_print}] is not defined!")
-    else:
-        print("SNOL> Error! Invalid expression to print.")
+            session.write(f"SNOL> Error! [{value_to_print}] is not defined!")
+            return False
+    
+    write = session.write
+    for line in lines:
+        write(line)
+    return True
 
-def assignmentOp(input_str):
+def assignmentOp(input_str, session=console):
     """
     Handle assignment operations to assign values to variables.
     
     Args:
         input_str (str): The input string containing the assignment operation.
+        session (Session): The session whose variables are used and assigned.
+    
+    Returns:
+        bool: True if the variable was assigned, False otherwise.
     """
-    parts = input_str.split('=', 1)
-    var_name = parts[0].strip()
-    expression = parts[1].strip()
+    parts = split_assignment(input_str, session)
+    if parts is None:
+        return False
+    var_name, expression, expression_tokens = parts
+    table = session.symbol_table
     
-    if not isVariable(var_name):
-        print(f"SNOL> Error! '{var_name}' is not a valid variable name.")
-        return
+    # No other thread may assign these variables between the evaluation and the store
+    with table.locked([var_name] + [token.text for token in expression_tokens if token.kind == NAME]):
+        # Evaluate the expression
+        value = postfix_conversion(expression, expression_tokens, session)
+        
+        if value is None:
+            return False
+        
+        # Store in symbol table (the value already has its int/float type)
+        table.set_variable(var_name, value)
+    return True
+
+def split_assignment(input_str, session=console):
+    """
+    Split an assignment into its target variable and its expression.
+    
+    Args:
+        input_str (str): The input string containing the assignment operation.
+        session (Session): The session to write errors to.
+    
+    Returns:
+        tuple/None: The variable name, the expression text and its tokens, or
+            None if the assignment is invalid.
+    """
+    tokens = tokenize(input_str)
+    index = next(i for i, token in enumerate(tokens) if token.kind == ASSIGN)
+    target = tokens[:index]
+    expression_tokens = tokens[index + 1:]
+    
+    if len(target) != 1 or target[0].kind != NAME:
+        var_name = input_str[:tokens[index].pos].strip()
+        session.write(f"SNOL> Error! '{var_name}' is not a valid variable name.")
+        return None
     
     # Check if the expression contains keywords
-    if any(keyword in expression for keyword in KEYWORDS):
-        print("SNOL> Unknown command! Does not match any valid command of the language.")
-        return
+    if any(token.kind == KEYWORD for token in expression_tokens):
+        session.write("SNOL> Unknown command! Does not match any valid command of the language.")
+        return None
+    return target[0].text, input_str[tokens[index].pos + 1:], expression_tokens
+
+def DEF(input_str, session=console):
+    """
+    Handle the DEF command to define a formula variable (`DEF total = price * qty`).
     
-    # Evaluate the expression
-    result = postfix_conversion(expression)
+    The formula is evaluated right away, like an assignment; afterwards it is
+    recomputed when it is read after one of its inputs changed (see `formulas`).
     
-    if result is not None:
-        # Convert result to the appropriate type
-        if '.' in result:
-            value = float(result)
-        else:
-            value = int(result)
-        
-        # Store in symbol table
-        symbol_table.set_variable(var_name, value)
+    Args:
+        input_str (str): The input string containing the DEF command.
+        session (Session): The session whose variables are used and assigned.
+    
+    Returns:
+        bool: True if the formula was defined, False otherwise.
+    """
+    parts = split_assignment(input_str.strip()[3:], session)
+    if parts is None:
+        return False
+    var_name, expression, expression_tokens = parts
+    compiled = compile_expression(expression, expression_tokens)
+    if compiled.error is not None:
+        session.write(f"SNOL> {compiled.error}")
+        return False
+    
+    table = session.symbol_table
+    if table.formulas is None:
+        table.formulas = Formulas(table, partial(evaluate_expression, session=session))
+    cycle = table.formulas.cycle(var_name, compiled)
+    if cycle is not None:
+        session.write(f"SNOL> Error! Circular formula: {' -> '.join(f'[{name}]' for name in cycle)}.")
+        return False
+    
+    value = evaluate_expression(compiled, session)
+    if type(value) is EvalError:
+        session.write(f"SNOL> {value.message}")
+        return False
+    table.formulas.define(var_name, compiled, value)
+    return True
 
-def varValidation(input_str):
+def SAVE(input_str, session=console):
+    """
+    Handle the SAVE command to write every variable to a snapshot file.
+    
+    Args:
+        input_str (str): The input string containing the SAVE command.
+        session (Session): The session whose variables are saved.
+    
+    Returns:
+        bool: True if the snapshot was written, False otherwise.
+    """
+    path = input_str.strip()[4:].strip()
+    formulas = session.symbol_table.formulas
+    if formulas is not None:
+        error = formulas.refresh(list(formulas.dirty))
+        if error is not None:
+            session.write(f"SNOL> {error.message}")
+            return False
+    try:
+        count = session.symbol_table.save(path)
+    except (OSError, ValueError) as error:
+        session.write(f"SNOL> Error! Cannot save to [{path}]: {error}")
+        return False
+    session.write(f"SNOL> Saved {count} variables to [{path}].")
+    return True
+
+def LOAD(input_str, session=console):
+    """
+    Handle the LOAD command to restore the variables of a snapshot file.
+    
+    Args:
+        input_str (str): The input string containing the LOAD command.
+        session (Session): The session to store the variables in.
+    
+    Returns:
+        bool: True if the snapshot was loaded, False otherwise.
+    """
+    path = input_str.strip()[4:].strip()
+    try:
+        count = session.symbol_table.load(path)
+    except (OSError, ValueError, RuntimeError) as error:
+        session.write(f"SNOL> Error! Cannot load [{path}]: {error}")
+        return False
+    session.write(f"SNOL> Loaded {count} variables from [{path}].")
+    return True
+
+def varValidation(input_str, session=console):
     """
     Validate if all variables in an expression exist in the symbol table.
     
     Args:
         input_str (str): The input string containing the expression.
+        session (Session): The session whose variables are checked.
     
     Returns:
         bool: True if all variables exist, False otherwise.
     """
+    tokens = tokenize(input_str)
+    
     # Check if the expression contains keywords
-    if any(keyword in input_str for keyword in KEYWORDS):
-        print("SNOL> Unknown command! Does not match any valid command of the language.")
+    if any(token.kind == KEYWORD for token in tokens):
+        session.write("SNOL> Unknown command! Does not match any valid command of the language.")
         return False
     
-    tokens = re.findall(r'[a-zA-Z][a-zA-Z0-9]*', input_str)
-    
     for token in tokens:
-        if isVariable(token) and not symbol_table.variable_exists(token):
-            print(f"SNOL> Error! [{token}] is not defined!")
+        if token.kind == NAME and not session.symbol_table.variable_exists(token.text):
+            session.write(f"SNOL> Error! [{token.text}] is not defined!")
             return False
     
     return True
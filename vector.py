@@ -0,0 +1,89 @@
+# === vector.py ===
+
+import sys
+
+# NumPy is optional: without it, SNOL works with scalar values only. It is
+# imported by `load_numpy` when the first vector is made (importing it takes
+# longer than starting the rest of the interpreter), so read `vector.np` and
+# `vector.VECTOR_TYPE` through the module rather than copying them at import.
+np = None
+
+# The array type that marks a vector value (None until NumPy is loaded)
+VECTOR_TYPE = None
+
+def load_numpy():
+    """
+    Import NumPy, once, and set `np` and `VECTOR_TYPE`.
+
+    Returns:
+        module/None: The numpy module, or None if it is not installed.
+    """
+    global np, VECTOR_TYPE
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return None
+        np = numpy
+        VECTOR_TYPE = numpy.ndarray
+    return np
+
+# A program that already uses NumPy gets vector support without any extra cost
+if "numpy" in sys.modules:
+    load_numpy()
+
+def is_vector(value) -> bool:
+    """
+    Check if a value is a vector (a NumPy array).
+
+    Args:
+        value: The value to check.
+
+    Returns:
+        bool: True if the value is a vector, False otherwise.
+    """
+    return VECTOR_TYPE is not None and type(value) is VECTOR_TYPE
+
+def element_type(value):
+    """
+    Return the SNOL data type of a value: int or float.
+
+    For vectors this is the type of the elements.
+
+    Args:
+        value (int/float/ndarray): The value to check.
+
+    Returns:
+        type: int or float.
+    """
+    if is_vector(value):
+        return float if value.dtype.kind == 'f' else int
+    return type(value)
+
+def as_vector(values):
+    """
+    Convert a sequence of numbers into a vector value.
+
+    Integer data becomes an int64 vector and anything else a float64 vector,
+    so every vector has exactly one SNOL data type.
+
+    Args:
+        values (iterable/ndarray): The numbers to convert.
+
+    Returns:
+        ndarray: The one-dimensional vector.
+
+    Raises:
+        RuntimeError: If NumPy is not installed.
+        ValueError: If the values are not one-dimensional numeric data.
+    """
+    if load_numpy() is None:
+        raise RuntimeError("Vector values require NumPy (pip install numpy).")
+    vector = np.asarray(values)
+    if vector.ndim != 1:
+        raise ValueError("A vector must be one-dimensional.")
+    if vector.dtype.kind in 'iub':
+        return vector.astype(np.int64, copy=False)
+    if vector.dtype.kind == 'f':
+        return vector.astype(np.float64, copy=False)
+    raise ValueError("A vector must contain only numbers.")
\ No newline at end of file